@@ -110,7 +110,7 @@ def connect(username, password):
     login_url = settings.SITE_URL + "/api/accounts/token"
     credentials = {"username": username, "password": password}
     try:
-        response = requests.post(url=login_url, data=credentials, timeout=10)
+        response = http.get_session().post(url=login_url, data=credentials, timeout=10)
         response.raise_for_status()
         json_dict = response.json()
         if "token" in json_dict:
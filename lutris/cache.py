@@ -1,14 +1,20 @@
 """Module for handling the PGA cache"""
 
+import hashlib
 import os
-import shutil
+import re
 from gettext import gettext as _
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 from urllib.parse import urlparse
 
 from lutris import settings
 from lutris.util.log import logger
-from lutris.util.system import merge_folders, path_contains
+from lutris.util.system import copy_file, merge_folders, path_contains, reflink_file
+
+# Directory of the cache where files are stored by checksum, to be shared between installers
+CONTENT_STORE_DIR = ".content"
+
+HEX_DIGEST_RE = re.compile(r"^[0-9a-f]+$")
 
 
 def get_cache_path(create: bool = False) -> str:
@@ -116,5 +122,117 @@ def save_to_cache(source: str, destination: str) -> None:
         # Copy folder recursively
         merge_folders(source, destination)
     else:
-        shutil.copy(source, destination)
+        copy_file(source, destination)
     logger.debug("Cached %s to %s", source, destination)
+
+
+def get_content_store_path() -> str:
+    """Returns the directory where cached files are stored by checksum; it is in the cache
+    path, so that files there can be hard-linked from the directories of each game."""
+    return os.path.join(get_cache_path(), CONTENT_STORE_DIR)
+
+
+def get_content_path(checksum: Optional[str]) -> Optional[str]:
+    """Returns the path of the file with the checksum (type:hash, as found in installers)
+    in the content store, whether the file is there or not. Returns None if the checksum
+    isn't usable."""
+    if not checksum or ":" not in checksum:
+        return None
+    hash_type, digest = checksum.split(":", 1)
+    hash_type = hash_type.strip().lower()
+    digest = digest.strip().lower()
+    if hash_type not in hashlib.algorithms_available or not HEX_DIGEST_RE.match(digest):
+        return None
+    return os.path.join(get_content_store_path(), hash_type, digest[:2], digest)
+
+
+def find_cached_content(checksum: Optional[str]) -> Optional[str]:
+    """Returns the path of the file with the checksum in the content store, or None
+    if the store doesn't have it."""
+    content_path = get_content_path(checksum)
+    if content_path and os.path.isfile(content_path):
+        return content_path
+    return None
+
+
+def is_content_stored(path: str, checksum: Optional[str]) -> bool:
+    """True if the file at path is a link to the stored file with the checksum"""
+    content_path = find_cached_content(checksum)
+    try:
+        return bool(content_path) and os.path.samefile(path, content_path)
+    except OSError:
+        return False
+
+
+def link_content(content_path: str, destination: str) -> bool:
+    """Replace destination with a hard link to a file of the content store, or with a
+    copy-on-write clone of it if hard links aren't possible. Returns False, and leaves
+    destination alone, if neither is."""
+    temp_path = destination + ".link.tmp"
+    try:
+        try:
+            os.link(content_path, temp_path)
+        except OSError:
+            if not reflink_file(content_path, temp_path):
+                return False
+        os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return True
+
+
+def add_to_content_store(path: str, checksum: str) -> Optional[str]:
+    """Add a cached file, whose checksum has been verified, to the content store. If the
+    store has the same content already, the file is replaced with a link to it, so it's
+    only on disk once. Returns the path of the file in the store, or None if it can't be
+    stored, because linking isn't possible."""
+    content_path = get_content_path(checksum)
+    if not content_path or not os.path.isfile(path):
+        return None
+    if os.path.isfile(content_path):
+        if not os.path.samefile(path, content_path) and not link_content(content_path, path):
+            return None
+        return content_path
+    os.makedirs(os.path.dirname(content_path), exist_ok=True)
+    try:
+        os.link(path, content_path)
+    except OSError:
+        # A clone doesn't share the inode, but still shares the blocks
+        if not reflink_file(path, content_path):
+            logger.debug("Unable to link %s into the content store", path)
+            return None
+    logger.debug("Stored %s as %s", path, content_path)
+    return content_path
+
+
+def restore_from_content_store(checksum: Optional[str], destination: str) -> bool:
+    """Place the file with the checksum at destination if the content store has it,
+    so it does not need downloading. The file is linked to the stored one when possible,
+    and copied otherwise. Returns False if the store does not have the file."""
+    content_path = find_cached_content(checksum)
+    if not content_path:
+        return False
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if not link_content(content_path, destination):
+        copy_file(content_path, destination)
+    logger.info("Restored %s from the content store", destination)
+    return True
+
+
+def get_content_store_stats() -> Dict[str, int]:
+    """Returns the number of files in the content store, their total size, and the space
+    saved by sharing them between hard links; the space shared by copy-on-write clones isn't
+    counted, as it can't be told apart from that of copies."""
+    stats = {"files": 0, "size": 0, "saved": 0}
+    for dirpath, _dirnames, filenames in os.walk(get_content_store_path()):
+        for filename in filenames:
+            try:
+                file_stat = os.stat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            stats["files"] += 1
+            stats["size"] += file_stat.st_size
+            # Besides the link in the store, each link would have been a copy of its own
+            stats["saved"] += max(file_stat.st_nlink - 2, 0) * file_stat.st_size
+    return stats
@@ -0,0 +1,164 @@
+"""In-memory catalogue of the games table, indexed for fast lookups"""
+
+import threading
+from collections import defaultdict
+
+from lutris import settings
+from lutris.database import sql
+
+
+def _to_id(value):
+    """Normalize a game ID, which callers pass as int or str"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_key(value):
+    """Normalize a text column value used as an index key"""
+    return str(value) if value is not None else None
+
+
+class GameCatalogue:
+    """Keeps every row of the games table in memory, with indexes by ID, slug,
+    service and service ID, runner and installed state.
+
+    The catalogue is loaded on first use. Writes done through lutris.database.games
+    mark the affected games as changed, and these are re-read from the database
+    before the next lookup, so the catalogue never requires a full reload after
+    the first one. Rows are returned as copies, so callers are free to modify them.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._changed_ids = set()
+        self._by_id = {}
+        self._by_slug = defaultdict(list)
+        self._by_service_id = defaultdict(list)
+        self._by_runner = defaultdict(list)
+        self._installed_by_service = defaultdict(set)
+
+    def invalidate(self):
+        """Drop everything; the catalogue will be reloaded on next use."""
+        with self._lock:
+            self._loaded = False
+            self._changed_ids.clear()
+            self._by_id.clear()
+            self._by_slug.clear()
+            self._by_service_id.clear()
+            self._by_runner.clear()
+            self._installed_by_service.clear()
+
+    def mark_changed(self, game_id):
+        """Flag a game as modified (or deleted) in the database"""
+        game_id = _to_id(game_id)
+        if game_id is not None:
+            with self._lock:
+                if self._loaded:
+                    self._changed_ids.add(game_id)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            for row in sql.db_query(settings.DB_PATH, "select * from games order by id", compact=True):
+                self._add(row)
+            self._loaded = True
+        elif self._changed_ids:
+            changed_ids = sorted(self._changed_ids)
+            self._changed_ids.clear()
+            for game_id in changed_ids:
+                self._remove(game_id)
+            # Stay under SQLite's limit of 999 parameters per query
+            for page in range(0, len(changed_ids), 999):
+                for row in sql.db_select(
+                    settings.DB_PATH, "games", condition=("id", changed_ids[page : page + 999]), compact=True
+                ):
+                    self._add(row)
+
+    @staticmethod
+    def _insert_sorted(game_ids, game_id):
+        game_ids.append(game_id)
+        if len(game_ids) > 1 and game_ids[-2] > game_id:
+            game_ids.sort()
+
+    def _add(self, row):
+        game_id = row["id"]
+        self._by_id[game_id] = row
+        self._insert_sorted(self._by_slug[row["slug"]], game_id)
+        self._insert_sorted(self._by_service_id[(row["service"], _to_key(row["service_id"]))], game_id)
+        self._insert_sorted(self._by_runner[row["runner"]], game_id)
+        if row["installed"]:
+            self._installed_by_service[row["service"]].add(game_id)
+
+    def _remove(self, game_id):
+        row = self._by_id.pop(game_id, None)
+        if not row:
+            return
+        for index, key in (
+            (self._by_slug, row["slug"]),
+            (self._by_service_id, (row["service"], _to_key(row["service_id"]))),
+            (self._by_runner, row["runner"]),
+        ):
+            index[key].remove(game_id)
+            if not index[key]:
+                del index[key]
+        self._installed_by_service[row["service"]].discard(game_id)
+
+    def _get_rows(self, game_ids):
+        return [dict(self._by_id[game_id]) for game_id in game_ids]
+
+    def get_by_id(self, game_id):
+        """Return the game with the given ID, or None"""
+        with self._lock:
+            self._ensure_loaded()
+            row = self._by_id.get(_to_id(game_id))
+            return dict(row) if row else None
+
+    def get_by_slug(self, slug):
+        """Return all games with the given slug"""
+        if slug is None:
+            return []
+        with self._lock:
+            self._ensure_loaded()
+            return self._get_rows(self._by_slug.get(slug, []))
+
+    def get_by_runner(self, runner):
+        """Return all games using the given runner"""
+        if runner is None:
+            return []
+        with self._lock:
+            self._ensure_loaded()
+            return self._get_rows(self._by_runner.get(runner, []))
+
+    def get_by_service_id(self, service, service_id):
+        """Return all games linked to the given game of a service"""
+        if service is None or service_id is None:
+            return []
+        with self._lock:
+            self._ensure_loaded()
+            return self._get_rows(self._by_service_id.get((service, _to_key(service_id)), []))
+
+    def get_installed(self, service=None):
+        """Return all installed games, or the installed games of a service if given"""
+        with self._lock:
+            self._ensure_loaded()
+            if service:
+                game_ids = self._installed_by_service.get(service, ())
+            else:
+                game_ids = set().union(*self._installed_by_service.values())
+            return self._get_rows(sorted(game_ids))
+
+    def get_installed_values(self, field, service=None):
+        """Return the set of the values of a field in the installed games, or in the installed
+        games of a service if given; this copies no rows."""
+        with self._lock:
+            self._ensure_loaded()
+            if service:
+                game_ids = self._installed_by_service.get(service, ())
+            else:
+                game_ids = set().union(*self._installed_by_service.values())
+            return {self._by_id[game_id][field] for game_id in game_ids}
+
+
+CATALOGUE = GameCatalogue()
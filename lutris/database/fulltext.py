@@ -0,0 +1,79 @@
+"""Ranked full-text search over game names, using the FTS5 indexes created by the schema"""
+
+import re
+
+from lutris import settings
+from lutris.database import sql
+from lutris.database.schema import FULL_TEXT_INDEXES
+
+# Relative weight of each indexed column when ranking results, in index order
+COLUMN_WEIGHTS = {
+    "games_fts": (10.0, 5.0),  # name, sortname
+    "service_games_fts": (1.0,),  # name
+}
+
+WORD_RE = re.compile(r"\w+")
+
+
+def get_match_query(text):
+    """Convert free text to an FTS5 query matching the rows that have words starting with
+    each word of the text, or None if the text has no words at all."""
+    words = WORD_RE.findall(text or "")
+    if not words:
+        return None
+    # Quoting makes FTS5 read each word literally, even AND, OR, NOT or NEAR
+    return " ".join('"%s"*' % word for word in words)
+
+
+def has_full_text_index(index_name):
+    """True if the database has the full-text index given; SQLite builds without FTS5 can't have one"""
+    query = "SELECT name FROM sqlite_master WHERE type='table' AND name=?"
+    return bool(sql.db_query(settings.DB_PATH, query, (index_name,)))
+
+
+def _search(table, index_name, text, filters, limit, compact):
+    """Return the rows of table matching the words of text, best matches first"""
+    match_query = get_match_query(text)
+    if not match_query:
+        return []
+    conditions = []
+    params = []
+    for field, value in (filters or {}).items():
+        conditions.append("{0}.{1} = ?".format(table, field))
+        params.append(value)
+
+    if has_full_text_index(index_name):
+        weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS[index_name])
+        query = "SELECT {0}.* FROM {1} JOIN {0} ON {0}.id = {1}.rowid WHERE {1} MATCH ?".format(table, index_name)
+        params.insert(0, match_query)
+        order = " ORDER BY bm25({0}, {1})".format(index_name, weights)
+    else:
+        # Much slower and not ranked, but finds the same rows (and more)
+        columns = FULL_TEXT_INDEXES[index_name][1]
+        word_condition = " OR ".join("{0}.{1} LIKE ?".format(table, column) for column in columns)
+        words = WORD_RE.findall(text)
+        conditions = ["(%s)" % word_condition] * len(words) + conditions
+        params = ["%" + word + "%" for word in words for _column in columns] + params
+        query = "SELECT {0}.* FROM {0} WHERE 1".format(table)
+        order = " ORDER BY {0}.name".format(table)
+
+    for condition in conditions:
+        query += " AND " + condition
+    query += order
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return sql.db_query(settings.DB_PATH, query, tuple(params), compact=compact)
+
+
+def search_games(text, filters=None, limit=None, compact=False):
+    """Return the games whose name or sortname has words starting with each word of
+    text, best matches first. 'filters' maps columns to the values they must have."""
+    return _search("games", "games_fts", text, filters, limit, compact)
+
+
+def search_service_games(text, service=None, limit=None, compact=False):
+    """Return the games of a service (or of all services) whose name has words starting
+    with each word of text, best matches first."""
+    filters = {"service": service} if service else None
+    return _search("service_games", "service_games_fts", text, filters, limit, compact)
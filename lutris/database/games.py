@@ -4,16 +4,23 @@ from itertools import chain
 
 from lutris import settings
 from lutris.database import sql
+from lutris.database.catalogue import CATALOGUE
 from lutris.util.log import logger
 from lutris.util.strings import slugify
 
-_SERVICE_CACHE = {}
-_SERVICE_CACHE_ACCESSED = False  # Keep time of last access to have a self degrading cache
 
-
-def get_games(searches=None, filters=None, excludes=None, sorts=None):
+def get_games(searches=None, filters=None, excludes=None, sorts=None, conditions=None, compact=False):
+    """Query the games table; see sql.filtered_query(). With compact set, read-only
+    sql.Row objects are returned instead of dicts."""
     return sql.filtered_query(
-        settings.DB_PATH, "games", searches=searches, filters=filters, excludes=excludes, sorts=sorts
+        settings.DB_PATH,
+        "games",
+        searches=searches,
+        filters=filters,
+        excludes=excludes,
+        sorts=sorts,
+        conditions=conditions,
+        compact=compact,
     )
 
 
@@ -87,40 +94,36 @@ def get_game_for_service(service, appid):
     if service == "lutris":
         return get_game_by_field(appid, field="slug")
 
-    existing_games = get_games(filters={"service_id": appid, "service": service})
+    existing_games = CATALOGUE.get_by_service_id(service, appid)
     if existing_games:
         return existing_games[0]
 
 
 def get_all_installed_game_for_service(service):
     if service == "lutris":
-        db_games = get_games(filters={"installed": 1})
-        return {g["slug"]: g for g in db_games}
+        return {g["slug"]: g for g in CATALOGUE.get_installed()}
 
-    db_games = get_games(filters={"service": service, "installed": 1})
-    return {g["service_id"]: g for g in db_games}
+    return {g["service_id"]: g for g in CATALOGUE.get_installed(service)}
 
 
 def get_service_games(service):
-    """Return the list of all installed games for a service"""
-    global _SERVICE_CACHE_ACCESSED
-    previous_cache_accessed = _SERVICE_CACHE_ACCESSED or 0
-    _SERVICE_CACHE_ACCESSED = time.time()
-    if service not in _SERVICE_CACHE or _SERVICE_CACHE_ACCESSED - previous_cache_accessed > 1:
-        if service == "lutris":
-            _SERVICE_CACHE[service] = [game["slug"] for game in get_games(filters={"installed": "1"})]
-        else:
-            _SERVICE_CACHE[service] = [
-                game["service_id"] for game in get_games(filters={"service": service, "installed": "1"})
-            ]
-    return _SERVICE_CACHE[service]
+    """Return the set of all installed games for a service; these are
+    slugs for the lutris service, or service IDs for others."""
+    if service == "lutris":
+        return CATALOGUE.get_installed_values("slug")
+    return CATALOGUE.get_installed_values("service_id", service)
 
 
 def get_game_by_field(value, field="slug"):
     """Query a game based on a database field"""
     if field not in ("slug", "installer_slug", "id", "configpath", "name"):
         raise ValueError("Can't query by field '%s'" % field)
-    game_result = sql.db_select(settings.DB_PATH, "games", condition=(field, value))
+    if field == "id":
+        return CATALOGUE.get_by_id(value) or {}
+    if field == "slug":
+        game_result = CATALOGUE.get_by_slug(value)
+    else:
+        game_result = sql.db_select(settings.DB_PATH, "games", condition=(field, value))
     if game_result:
         return game_result[0]
     return {}
@@ -128,12 +131,12 @@ def get_game_by_field(value, field="slug"):
 
 def get_games_by_runner(runner):
     """Return all games using a specific runner"""
-    return sql.db_select(settings.DB_PATH, "games", condition=("runner", runner))
+    return CATALOGUE.get_by_runner(runner)
 
 
 def get_games_by_slug(slug):
     """Return all games using a specific slug"""
-    return sql.db_select(settings.DB_PATH, "games", condition=("slug", slug))
+    return CATALOGUE.get_by_slug(slug)
 
 
 def add_game(**game_data):
@@ -141,7 +144,9 @@ def add_game(**game_data):
     game_data["installed_at"] = int(time.time())
     if "slug" not in game_data:
         game_data["slug"] = slugify(game_data["name"])
-    return sql.db_insert(settings.DB_PATH, "games", game_data)
+    game_id = sql.db_insert(settings.DB_PATH, "games", game_data)
+    CATALOGUE.mark_changed(game_id)
+    return game_id
 
 
 def add_games_bulk(games):
@@ -154,7 +159,10 @@ def add_games_bulk(games):
     Returns:
         list: List of inserted game ids
     """
-    return [sql.db_insert(settings.DB_PATH, "games", game) for game in games]
+    game_ids = sql.db_insert_many(settings.DB_PATH, "games", games)
+    for game_id in game_ids:
+        CATALOGUE.mark_changed(game_id)
+    return game_ids
 
 
 def add_or_update(**params):
@@ -177,11 +185,17 @@ def update_existing(**params):
     game_id = get_matching_game(params)
     if game_id:
         params["id"] = game_id
-        sql.db_update(settings.DB_PATH, "games", params, {"id": game_id})
+        update_game(game_id, **params)
         return game_id
     return None
 
 
+def update_game(game_id, **fields):
+    """Update some fields of the game with the given ID"""
+    sql.db_update(settings.DB_PATH, "games", fields, {"id": game_id})
+    CATALOGUE.mark_changed(game_id)
+
+
 def get_matching_game(params):
     """Tries to match given parameters with an existing game"""
     # Always match by ID if provided
@@ -206,6 +220,7 @@ def get_matching_game(params):
 def delete_game(game_id):
     """Delete a game from the PGA."""
     sql.db_delete(settings.DB_PATH, "games", "id", game_id)
+    CATALOGUE.mark_changed(game_id)
 
 
 def get_used_runners():
@@ -1,5 +1,8 @@
+import sqlite3
+
 from lutris import settings
 from lutris.database import sql
+from lutris.database.catalogue import CATALOGUE
 from lutris.util.log import logger
 
 DATABASE = {
@@ -45,6 +48,9 @@ DATABASE = {
         {"name": "url", "type": "TEXT"},
         {"name": "details", "type": "TEXT"},
         {"name": "lutris_slug", "type": "TEXT"},
+        {"name": "content_hash", "type": "TEXT"},
+        {"name": "release_date", "type": "TEXT"},
+        {"name": "platforms", "type": "TEXT"},
     ],
     "sources": [
         {"name": "id", "type": "INTEGER", "indexed": True},
@@ -65,6 +71,24 @@ DATABASE = {
     ],
 }
 
+# Indexes backing the most frequent queries: name -> (table, columns)
+INDEXES = {
+    "games_service_idx": ("games", ["service", "service_id"]),
+    "games_installed_idx": ("games", ["installed", "service"]),
+    "games_slug_idx": ("games", ["slug"]),
+    "games_runner_idx": ("games", ["runner"]),
+    "games_lastplayed_idx": ("games", ["lastplayed"]),
+    "service_games_service_idx": ("service_games", ["service", "appid"]),
+    "games_categories_game_idx": ("games_categories", ["game_id", "category_id"]),
+    "games_categories_category_idx": ("games_categories", ["category_id", "game_id"]),
+}
+
+# Full-text indexes over game names: name -> (table, columns)
+FULL_TEXT_INDEXES = {
+    "games_fts": ("games", ["name", "sortname"]),
+    "service_games_fts": ("service_games", ["name"]),
+}
+
 
 def get_schema(tablename):
     """
@@ -110,6 +134,46 @@ def create_table(name, schema):
         cursor.execute(query)
 
 
+def create_index(name, table, columns):
+    """Creates an index on a table, unless it already exists"""
+    query = "CREATE INDEX IF NOT EXISTS %s ON %s (%s)" % (name, table, ", ".join(columns))
+    logger.debug("[Query] %s", query)
+    with sql.db_cursor(settings.DB_PATH) as cursor:
+        cursor.execute(query)
+
+
+def create_full_text_index(name, table, columns):
+    """Creates an FTS5 index over the text columns of a table, unless it already exists.
+    The index stores no text itself; triggers keep it in sync with the table."""
+    if sql.db_query(settings.DB_PATH, "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (name,)):
+        return
+    column_list = ", ".join(columns)
+    new_values = ", ".join("new.%s" % column for column in columns)
+    old_values = ", ".join("old.%s" % column for column in columns)
+    delete_old = "INSERT INTO {0}({0}, rowid, {1}) VALUES ('delete', old.id, {2});".format(
+        name, column_list, old_values
+    )
+    insert_new = "INSERT INTO {0}(rowid, {1}) VALUES (new.id, {2});".format(name, column_list, new_values)
+    queries = [
+        "CREATE VIRTUAL TABLE {0} USING fts5({1}, content='{2}', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')".format(name, column_list, table),
+        "CREATE TRIGGER IF NOT EXISTS {0}_insert AFTER INSERT ON {1} BEGIN {2} END".format(name, table, insert_new),
+        "CREATE TRIGGER IF NOT EXISTS {0}_delete AFTER DELETE ON {1} BEGIN {2} END".format(name, table, delete_old),
+        "CREATE TRIGGER IF NOT EXISTS {0}_update AFTER UPDATE OF id, {1} ON {2} BEGIN {3} {4} END".format(
+            name, column_list, table, delete_old, insert_new
+        ),
+        "INSERT INTO {0}({0}) VALUES ('rebuild')".format(name),
+    ]
+    try:
+        with sql.db_cursor(settings.DB_PATH) as cursor:
+            for query in queries:
+                logger.debug("[Query] %s", query)
+                cursor.execute(query)
+    except sqlite3.OperationalError as ex:
+        # SQLite may be built without FTS5; searches will fall back on slower queries
+        logger.warning("Unable to create full-text index %s: %s", name, ex)
+
+
 def migrate(table, schema):
     """Compare a database table with the reference model and make necessary changes
 
@@ -142,3 +206,8 @@ def syncdb():
     for backwards compatibility."""
     for table_name, table_data in DATABASE.items():
         migrate(table_name, table_data)
+    for index_name, (table_name, columns) in INDEXES.items():
+        create_index(index_name, table_name, columns)
+    for index_name, (table_name, columns) in FULL_TEXT_INDEXES.items():
+        create_full_text_index(index_name, table_name, columns)
+    CATALOGUE.invalidate()
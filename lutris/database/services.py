@@ -5,16 +5,36 @@ from lutris.util.log import logger
 
 class ServiceGameCollection:
     @classmethod
-    def get_service_games(cls, searches=None, filters=None, excludes=None, sorts=None):
+    def get_service_games(cls, searches=None, filters=None, excludes=None, sorts=None, compact=False):
         return sql.filtered_query(
-            settings.DB_PATH, "service_games", searches=searches, filters=filters, excludes=excludes, sorts=sorts
+            settings.DB_PATH,
+            "service_games",
+            searches=searches,
+            filters=filters,
+            excludes=excludes,
+            sorts=sorts,
+            compact=compact,
         )
 
     @classmethod
-    def get_for_service(cls, service):
+    def get_for_service(cls, service, compact=False):
         if not service:
             raise ValueError("No service provided")
-        return sql.filtered_query(settings.DB_PATH, "service_games", filters={"service": service})
+        return sql.filtered_query(settings.DB_PATH, "service_games", filters={"service": service}, compact=compact)
+
+    @classmethod
+    def get_details_values(cls, service, json_paths):
+        """Return, for each game of a service having details, a tuple of its slug followed
+        by the values at json_paths in its details; SQLite extracts them, so the details
+        are not parsed in Python. Raises sqlite3.OperationalError if SQLite lacks JSON support."""
+        if not service:
+            raise ValueError("No service provided")
+        columns = "".join(", CASE WHEN json_valid(details) THEN json_extract(details, ?) END" for _path in json_paths)
+        query = "SELECT slug{0} FROM service_games WHERE service=? AND details IS NOT NULL AND details != ''".format(
+            columns
+        )
+        with sql.db_cursor(settings.DB_PATH) as cursor:
+            return sql.cursor_execute(cursor, query, tuple(json_paths) + (service,)).fetchall()
 
     @classmethod
     def get_game(cls, service, appid):
@@ -1,36 +1,158 @@
+import os
 import sqlite3
 import threading
+from collections.abc import Mapping
 
-# Prevent multiple access to the database (SQLite limitation)
-DB_LOCK = threading.RLock()
+# Number of compiled statements kept around by each connection
+STATEMENT_CACHE_SIZE = 256
+
+# Seconds a connection waits for a lock held by another connection
+BUSY_TIMEOUT = 5
+
+
+def _get_file_id(db_path):
+    """Return an identifier of the file behind db_path, or None if it doesn't exist"""
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+class ConnectionPool:
+    """Keeps one open SQLite connection per thread and database file.
+
+    SQLite connections can't be shared between threads, but opening one for every
+    query is expensive, so each thread gets its own persistent connection. The
+    database runs in WAL mode so readers don't block each other or the writer.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def _connections(self):
+        try:
+            return self._local.connections
+        except AttributeError:
+            self._local.connections = {}
+            return self._local.connections
+
+    @staticmethod
+    def connect(db_path):
+        """Open a new connection to db_path, configured for the pool"""
+        connection = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.OperationalError:
+            # Some file systems (network shares mostly) don't support WAL
+            pass
+        return connection
+
+    def acquire(self, db_path):
+        """Return the connection of the current thread for db_path.
+        Each call must be balanced by a call to release()."""
+        entry = self._connections.get(db_path)
+        if entry and not entry["depth"]:
+            # The database file may have been deleted or replaced since the connection
+            # was opened; we don't want to keep writing to an unlinked file.
+            if db_path != ":memory:" and entry["file_id"] != _get_file_id(db_path):
+                entry["connection"].close()
+                entry = None
+        if not entry:
+            connection = self.connect(db_path)
+            entry = {"connection": connection, "file_id": _get_file_id(db_path), "depth": 0}
+            self._connections[db_path] = entry
+        entry["depth"] += 1
+        return entry["connection"]
+
+    def release(self, db_path, commit=True):
+        """Release a connection obtained with acquire(). Once the outermost user releases it,
+        the transaction is committed, or rolled back if commit is False."""
+        entry = self._connections[db_path]
+        entry["depth"] -= 1
+        if entry["depth"]:
+            return
+        if commit:
+            entry["connection"].commit()
+        else:
+            entry["connection"].rollback()
+
+    def close(self):
+        """Close all connections opened by the current thread"""
+        for entry in self._connections.values():
+            entry["connection"].close()
+        self._connections.clear()
+
+
+POOL = ConnectionPool()
+
+
+class Row(Mapping):
+    """Read-only database row that can be used like a dict. Rows returned by the
+    same query share their column index, so they are much lighter than dicts on
+    large result sets. Convert them with dict() when a mutable copy is needed."""
+
+    __slots__ = ("_columns", "_values")
+
+    def __init__(self, columns, values):
+        self._columns = columns  # column name -> index, shared between rows
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._columns[key]]
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def __repr__(self):
+        return "Row(%s)" % dict(self)
+
+
+def fetch_rows(cursor, compact=False):
+    """Return the rows of an executed cursor as dicts, or as Row objects if compact is set"""
+    rows = cursor.fetchall()
+    column_names = [column[0] for column in cursor.description]
+    if compact:
+        columns = {column: index for index, column in enumerate(column_names)}
+        return [Row(columns, row) for row in rows]
+    return [dict(zip(column_names, row)) for row in rows]
+
+
+def close_connections():
+    """Close the database connections held by the current thread"""
+    POOL.close()
 
 
 class db_cursor(object):
+    """Context manager providing a cursor on a pooled connection. Everything executed
+    inside the outermost block is committed in a single transaction on exit."""
+
     def __init__(self, db_path):
         self.db_path = db_path
         self.db_conn = None
 
     def __enter__(self):
-        self.db_conn = sqlite3.connect(self.db_path)
+        self.db_conn = POOL.acquire(self.db_path)
         cursor = self.db_conn.cursor()
         return cursor
 
     def __exit__(self, _type, value, traceback):
-        self.db_conn.commit()
-        self.db_conn.close()
+        POOL.release(self.db_path, commit=_type is None)
+        self.db_conn = None
 
 
 def cursor_execute(cursor, query, params=None):
-    """Execute a SQL query, run it in a lock block"""
+    """Execute a SQL query; concurrent writers wait up to BUSY_TIMEOUT seconds for each other"""
     params = params or ()
-    lock = DB_LOCK.acquire(timeout=5)  # pylint: disable=consider-using-with
-    if not lock:
-        raise RuntimeError(f"Database is busy. Not executing {query}")
-
-    try:
-        return cursor.execute(query, params)
-    finally:
-        DB_LOCK.release()
+    return cursor.execute(query, params)
 
 
 def db_insert(db_path, table, fields):
@@ -47,6 +169,97 @@ def db_insert(db_path, table, fields):
     return inserted_id
 
 
+def db_insert_many(db_path, table, rows):
+    """Insert a list of rows in a single transaction. The dicts must have
+    an identical set of keys. Returns the list of inserted ids."""
+    if not rows:
+        return []
+    columns = list(rows[0].keys())
+    placeholders = ", ".join("?" * len(columns))
+    with db_cursor(db_path) as cursor:
+        cursor.executemany(
+            "insert into {0}({1}) values ({2})".format(table, ", ".join(columns), placeholders),
+            [tuple(row[column] for column in columns) for row in rows],
+        )
+        last_id = cursor.execute("select last_insert_rowid()").fetchone()[0]
+    if "id" in columns:
+        return [row["id"] for row in rows]
+    # The transaction holds the write lock, so the generated ids are consecutive
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+def db_upsert_many(db_path, table, rows, key_fields):
+    """Insert a list of rows, or update the existing rows that have the same values
+    for the fields in `key_fields`, all in a single transaction. The dicts must
+    have an identical set of keys, including the key fields. If several rows share
+    the same key, the last one wins."""
+    unique_rows = {tuple(row[field] for field in key_fields): row for row in rows}
+    if not unique_rows:
+        return
+    columns = list(next(iter(unique_rows.values())).keys())
+    key_condition = " AND ".join("%s=?" % field for field in key_fields)
+    update_query = "UPDATE {0} SET {1} WHERE {2}".format(table, "=?, ".join(columns) + "=?", key_condition)
+    insert_query = "INSERT INTO {0}({1}) SELECT {2} WHERE NOT EXISTS (SELECT 1 FROM {0} WHERE {3})".format(
+        table, ", ".join(columns), ", ".join("?" * len(columns)), key_condition
+    )
+    params = [tuple(row[column] for column in columns) + key for key, row in unique_rows.items()]
+    with db_cursor(db_path) as cursor:
+        # Rows updated here already exist and are skipped by the insert
+        cursor.executemany(update_query, params)
+        cursor.executemany(insert_query, params)
+
+
+def db_sync(db_path, table, rows, key_fields, conditions, hash_field):
+    """Make the rows of `table` matching `conditions` identical to `rows`, in a single
+    transaction. Rows are matched by the fields in `key_fields`, and compared by their
+    `hash_field`, which must change whenever their content does: new rows are inserted,
+    changed rows updated, and stored rows missing from `rows` deleted. Unchanged rows
+    are not written at all. Returns the number of rows inserted, updated and deleted."""
+
+    def get_key(values):
+        # Keys are compared as text, since numbers given for TEXT columns are stored as text
+        return tuple(str(value) for value in values)
+
+    unique_rows = {get_key(row[field] for field in key_fields): row for row in rows}
+    condition_field = " AND ".join("%s=?" % field for field in conditions) or "1"
+    select_query = "SELECT id, {0}, {1} FROM {2} WHERE {3}".format(
+        ", ".join(key_fields), hash_field, table, condition_field
+    )
+    with db_cursor(db_path) as cursor:
+        stored_hashes = {}
+        deleted_ids = []
+        for row in cursor_execute(cursor, select_query, tuple(conditions.values())).fetchall():
+            row_id, key, row_hash = row[0], get_key(row[1:-1]), row[-1]
+            # Duplicate rows and rows no longer there are removed
+            if key in stored_hashes or key not in unique_rows:
+                deleted_ids.append((row_id,))
+            else:
+                stored_hashes[key] = (row_id, row_hash)
+        inserted_rows = []
+        updated_rows = []
+        for key, row in unique_rows.items():
+            if key not in stored_hashes:
+                inserted_rows.append(row)
+            elif stored_hashes[key][1] != row[hash_field]:
+                updated_rows.append((stored_hashes[key][0], row))
+
+        if deleted_ids:
+            cursor.executemany("DELETE FROM {0} WHERE id=?".format(table), deleted_ids)
+        if updated_rows:
+            columns = list(updated_rows[0][1].keys())
+            cursor.executemany(
+                "UPDATE {0} SET {1} WHERE id=?".format(table, "=?, ".join(columns) + "=?"),
+                [tuple(row[column] for column in columns) + (row_id,) for row_id, row in updated_rows],
+            )
+        if inserted_rows:
+            columns = list(inserted_rows[0].keys())
+            cursor.executemany(
+                "INSERT INTO {0}({1}) VALUES ({2})".format(table, ", ".join(columns), ", ".join("?" * len(columns))),
+                [tuple(row[column] for column in columns) for row in inserted_rows],
+            )
+    return len(inserted_rows), len(updated_rows), len(deleted_ids)
+
+
 def db_update(db_path, table, updated_fields, conditions):
     """Update `table` with the values given in the dict `values` on the
     condition given with the `row` tuple.
@@ -68,7 +281,7 @@ def db_delete(db_path, table, field, value):
         cursor_execute(cursor, "delete from {0} where {1}=?".format(table, field), (value,))
 
 
-def db_select(db_path, table, fields=None, condition=None):
+def db_select(db_path, table, fields=None, condition=None, compact=False):
     if fields:
         columns = ", ".join(fields)
     else:
@@ -91,29 +304,13 @@ def db_select(db_path, table, fields=None, condition=None):
             query = query.format(columns, table)
             params = ()
         cursor_execute(cursor, query, params)
-        rows = cursor.fetchall()
-        column_names = [column[0] for column in cursor.description]
-    results = []
-    for row in rows:
-        row_data = {}
-        for index, column in enumerate(column_names):
-            row_data[column] = row[index]
-        results.append(row_data)
-    return results
-
-
-def db_query(db_path, query, params=()):
+        return fetch_rows(cursor, compact)
+
+
+def db_query(db_path, query, params=(), compact=False):
     with db_cursor(db_path) as cursor:
         cursor_execute(cursor, query, params)
-        rows = cursor.fetchall()
-        column_names = [column[0] for column in cursor.description]
-    results = []
-    for row in rows:
-        row_data = {}
-        for index, column in enumerate(column_names):
-            row_data[column] = row[index]
-        results.append(row_data)
-    return results
+        return fetch_rows(cursor, compact)
 
 
 def add_field(db_path, tablename, field):
@@ -126,7 +323,11 @@ def add_field(db_path, tablename, field):
         cursor.execute(query)
 
 
-def filtered_query(db_path, table, searches=None, filters=None, excludes=None, sorts=None):
+def filtered_query(
+    db_path, table, searches=None, filters=None, excludes=None, sorts=None, conditions=None, compact=False
+):
+    """Select rows of a table; 'conditions' is a list of (clause, params) tuples
+    with additional SQL conditions that the rows must also satisfy."""
     query = "select * from %s" % table
     params = []
     sql_filters = []
@@ -141,10 +342,13 @@ def filtered_query(db_path, table, searches=None, filters=None, excludes=None, s
         if excludes[field]:
             sql_filters.append("%s IS NOT ?" % field)
             params.append(excludes[field])
+    for clause, clause_params in conditions or []:
+        sql_filters.append("(%s)" % clause)
+        params.extend(clause_params)
     if sql_filters:
         query += " WHERE " + " AND ".join(sql_filters)
     if sorts:
         query += " ORDER BY %s" % ", ".join(["%s %s" % (sort[0], sort[1]) for sort in sorts])
     else:
         query += " ORDER BY slug ASC"
-    return db_query(db_path, query, tuple(params))
+    return db_query(db_path, query, tuple(params), compact=compact)
@@ -17,7 +17,6 @@ from lutris import settings
 from lutris.config import LutrisConfig
 from lutris.database import categories as categories_db
 from lutris.database import games as games_db
-from lutris.database import sql
 from lutris.exception_backstops import watch_game_errors
 from lutris.exceptions import GameConfigError, InvalidGameMoveError, MissingExecutableError
 from lutris.gui.widgets import NotificationSource
@@ -417,7 +416,7 @@ class Game:
         Params:
             delete_files (bool): Delete the game files
         """
-        sql.db_update(settings.DB_PATH, "games", {"installed": 0, "runner": ""}, {"id": self.id})
+        games_db.update_game(self.id, installed=0, runner="")
         if self.config:
             self.config.remove()
         xdgshortcuts.remove_launcher(self.slug, self.id, desktop=True, menu=True)
@@ -38,6 +38,7 @@ from gi.repository import Gio, GLib, Gtk
 from lutris.version import VERSION, HASH, MESSAGE
 from lutris import settings
 from lutris.api import get_runners, parse_installer_url
+from lutris.cache import get_content_store_stats
 from lutris.database import games as games_db
 from lutris.database.services import ServiceGameCollection
 from lutris.exception_backstops import init_exception_backstops
@@ -48,6 +49,7 @@ from lutris.gui.dialogs.issue import IssueReportWindow
 from lutris.gui.installerwindow import INSTALLATION_COMPLETED, INSTALLATION_FAILED, InstallationKind, InstallerWindow
 from lutris.gui.widgets.status_icon import LutrisStatusIcon
 from lutris.installer import get_installers
+from lutris.installer.metrics import read_reports as read_install_reports
 from lutris.migrations import migrate
 from lutris.monitored_command import exec_command
 from lutris.runners import InvalidRunnerError, RunnerInstallationError, get_runner_names, import_runner
@@ -60,6 +62,7 @@ from lutris.util.log import file_handler, logger
 from lutris.util.savesync import save_check, show_save_stats, upload_save
 from lutris.util.steam.appmanifest import AppManifest, get_appmanifests
 from lutris.util.steam.config import get_steamapps_dirs
+from lutris.util.strings import human_size
 
 from .lutriswindow import LutrisWindow
 
@@ -238,6 +241,22 @@ class LutrisApplication(Gtk.Application):
             _("List all games for provided service in database"),
             None,
         )
+        self.add_main_option(
+            "cache-stats",
+            0,
+            GLib.OptionFlags.NONE,
+            GLib.OptionArg.NONE,
+            _("Show the disk space saved by sharing identical files in the installer cache"),
+            None,
+        )
+        self.add_main_option(
+            "install-report",
+            0,
+            GLib.OptionFlags.NONE,
+            GLib.OptionArg.NONE,
+            _("Show how long each installer command took in the last installs"),
+            None,
+        )
         self.add_main_option(
             "install-runner",
             ord("r"),
@@ -539,6 +558,14 @@ class LutrisApplication(Gtk.Application):
             self.print_steam_folders(command_line)
             return 0
 
+        if options.contains("cache-stats"):
+            self.print_cache_stats(command_line, as_json=options.contains("json"))
+            return 0
+
+        if options.contains("install-report"):
+            self.print_install_report(command_line, as_json=options.contains("json"))
+            return 0
+
         # List Runners
         if options.contains("list-runners"):
             self.print_runners()
@@ -953,6 +980,47 @@ class LutrisApplication(Gtk.Application):
             for path in steamapps_paths:
                 self._print(command_line, path)
 
+    def print_cache_stats(self, command_line, as_json=False):
+        stats = get_content_store_stats()
+        if as_json:
+            self._print(command_line, json.dumps(stats, indent=2))
+            return
+        self._print(command_line, _("Shared files: %s") % stats["files"])
+        self._print(command_line, _("Size: %s") % human_size(stats["size"]))
+        self._print(command_line, _("Space saved: %s") % human_size(stats["saved"]))
+
+    def print_install_report(self, command_line, as_json=False):
+        reports = read_install_reports()
+        if as_json:
+            self._print(command_line, json.dumps(reports, indent=2))
+            return
+        for report in reports:
+            self._print(
+                command_line,
+                "%s (%s): %0.1fs, CPU %0.1fs, %s copied, %s extracted"
+                % (
+                    report["game_slug"],
+                    report["installer_slug"],
+                    report["commands_wall_time"],
+                    report["cpu_time"],
+                    human_size(report["bytes_copied"]),
+                    human_size(report["bytes_extracted"]),
+                ),
+            )
+            for command in report["commands"]:
+                self._print(
+                    command_line,
+                    "  {:>3} {:<24} {:>8.1f}s  CPU {:>7.1f}s  {:>10} copied  {:>10} extracted{}".format(
+                        command["index"],
+                        command["command"],
+                        command["wall_time"],
+                        command["cpu_time"],
+                        human_size(command["bytes_copied"]),
+                        human_size(command["bytes_extracted"]),
+                        "" if command["status"] == "completed" else "  (%s)" % command["status"],
+                    ),
+                )
+
     def print_runners(self):
         runner_names = get_runner_names()
         sorted_names = sorted(runner_names, key=lambda x: x.lower())
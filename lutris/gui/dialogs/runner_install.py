@@ -397,7 +397,11 @@ class RunnerInstallDialog(ModelessDialog):
 
     def progress_pulse(self, row) -> bool:
         runner = row.runner
-        row.install_progress.pulse()
+        extract_progress = runner.get("extract_progress")
+        if extract_progress is None:
+            row.install_progress.pulse()
+        else:
+            row.install_progress.set_fraction(extract_progress)
         return not runner["is_installed"]
 
     def on_runner_downloaded(self, row):
@@ -414,7 +418,11 @@ class RunnerInstallDialog(ModelessDialog):
     @staticmethod
     def extract(src, dst, row):
         """Extract a runner archive to a destination"""
-        extract_archive(src, dst)
+
+        def on_progress(fraction):
+            row.runner["extract_progress"] = fraction
+
+        extract_archive(src, dst, progress_callback=on_progress)
         return src, row
 
     def on_extracted(self, row_info, error):
@@ -426,6 +434,7 @@ class RunnerInstallDialog(ModelessDialog):
         runner = row.runner
         os.remove(src)
         runner["progress"] = 0
+        runner.pop("extract_progress", None)
         runner["is_installed"] = True
         self.installing.pop(runner["version"])
         row.install_progress.set_text = ""
@@ -12,12 +12,13 @@ from lutris.gui.dialogs import QuestionDialog
 from lutris.gui.widgets.gi_composites import GtkTemplate
 from lutris.gui.widgets.utils import get_required_main_window, get_widget_children
 from lutris.util import datapath
+from lutris.util.disk_size import get_disk_size
 from lutris.util.jobs import AsyncCall
 from lutris.util.library_sync import LibrarySyncer
 from lutris.util.log import logger
 from lutris.util.path_cache import remove_from_path_cache
 from lutris.util.strings import get_natural_sort_key, gtk_safe, human_size
-from lutris.util.system import get_disk_size, is_removeable
+from lutris.util.system import is_removeable
 
 
 @GtkTemplate(ui=os.path.join(datapath.get(), "ui", "uninstall-dialog.ui"))
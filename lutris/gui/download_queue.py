@@ -1,5 +1,6 @@
 # pylint: disable=no-member
 import os
+from gettext import gettext as _
 from typing import Any, Callable, Dict, Iterable, List, Optional, Set
 
 from gi.repository import GObject, Gtk  # type: ignore
@@ -7,8 +8,10 @@ from gi.repository import GObject, Gtk  # type: ignore
 from lutris.gui.widgets.gi_composites import GtkTemplate
 from lutris.gui.widgets.progress_box import ProgressBox
 from lutris.util import datapath
+from lutris.util.download_scheduler import DOWNLOAD_SCHEDULER
 from lutris.util.jobs import AsyncCall
 from lutris.util.log import logger
+from lutris.util.strings import human_size
 
 
 @GtkTemplate(ui=os.path.join(datapath.get(), "ui", "download-queue.ui"))
@@ -61,6 +64,7 @@ class DownloadQueue(Gtk.ScrolledWindow):
 
         def check_progress():
             progress_info = progress_function()
+            self.update_throughput()
 
             if progress_info.has_ended:
                 self.remove_progress_box(progress_function)
@@ -85,6 +89,15 @@ class DownloadQueue(Gtk.ScrolledWindow):
         self.revealer.set_reveal_child(True)
         return progress_box
 
+    def update_throughput(self) -> None:
+        """Show the combined speed of all downloads in the tooltip of the queue."""
+        tooltip = _("{speed}/s, {active} downloads running, {waiting} waiting").format(
+            speed=human_size(DOWNLOAD_SCHEDULER.get_throughput()),
+            active=DOWNLOAD_SCHEDULER.active_count,
+            waiting=DOWNLOAD_SCHEDULER.waiting_count,
+        )
+        self.set_tooltip_text(tooltip)
+
     def remove_progress_box(self, progress_function: ProgressBox.ProgressFunction) -> None:
         """Removes and destroys the progress box created for the progress_function given,
         if any is present."""
@@ -7,10 +7,9 @@ from lutris.util.log import logger
 class InstallerFilesBox(Gtk.ListBox):
     """List box presenting all files needed for an installer"""
 
-    max_downloads = 3
-
     __gsignals__ = {
         "files-ready": (GObject.SIGNAL_RUN_LAST, None, (bool,)),
+        "file-available": (GObject.SIGNAL_RUN_LAST, None, (object,)),
         "files-available": (GObject.SIGNAL_RUN_LAST, None, ()),
     }
 
@@ -20,7 +19,6 @@ class InstallerFilesBox(Gtk.ListBox):
         self.ready_files = set()
         self.available_files = set()
         self.installer_files_boxes = {}
-        self._file_queue = []
 
     def load_installer(self, installer):
         self.stop_all()
@@ -29,7 +27,6 @@ class InstallerFilesBox(Gtk.ListBox):
         self.available_files.clear()
         self.ready_files.clear()
         self.installer_files_boxes.clear()
-        self._file_queue.clear()
 
         for child in self.get_children():
             child.destroy()
@@ -47,32 +44,23 @@ class InstallerFilesBox(Gtk.ListBox):
         self.check_files_ready()
 
     def start_all(self):
-        """Iterates through installer files while keeping the number
-        of simultaneously downloaded files down to a maximum number"""
+        """Starts gathering all installer files at once; the download scheduler
+        decides how many of them are actually downloaded simultaneously."""
 
         if len(self.available_files) == len(self.installer.files):
             logger.info("All files remain available")
             self.emit("files-available")
             return
 
-        started_downloads = 0
         for file_id, file_entry in self.installer_files_boxes.items():
             if file_id not in self.available_files:
-                if file_entry.provider == "download":
-                    started_downloads += 1
-                    if started_downloads <= self.max_downloads:
-                        file_entry.start()
-                    else:
-                        self._file_queue.append(file_id)
-                else:
-                    file_entry.start()
+                file_entry.start()
 
     def stop_all(self):
         """Stops all ongoing files gathering.
         Iterates through installer files, and call the "stop" command
         if they've been started and not available yet.
         """
-        self._file_queue.clear()
         for file_id, file_box in self.installer_files_boxes.items():
             if file_box.started and file_id not in self.available_files and file_box.stop_func is not None:
                 file_box.stop_func()
@@ -107,9 +95,7 @@ class InstallerFilesBox(Gtk.ListBox):
         file_id = widget.installer_file.id
         logger.debug("%s is available", file_id)
         self.available_files.add(file_id)
-        if self._file_queue:
-            next_file_id = self._file_queue.pop()
-            self.installer_files_boxes[next_file_id].start()
+        self.emit("file-available", widget.installer_file)
         if len(self.available_files) == len(self.installer.files):
             logger.info("All files available")
             self.emit("files-available")
@@ -120,3 +106,12 @@ class InstallerFilesBox(Gtk.ListBox):
         for installer_file in self.installer.files:
             files.update(installer_file.get_dest_files_by_id())
         return files
+
+    def get_pending_files(self):
+        """Return the files not available yet, as a mapping of their IDs to
+        the local files each one will provide once it is."""
+        return {
+            installer_file.id: installer_file.get_dest_files_by_id()
+            for installer_file in self.installer.files
+            if installer_file.id not in self.available_files
+        }
@@ -154,6 +154,7 @@ class InstallerWindow(ModelessDialog, DialogInstallUIDelegate, ScriptInterpreter
         self.installer_files_box = InstallerFilesBox()
         self.installer_files_box.connect("files-available", self.on_files_available)
         self.installer_files_box.connect("files-ready", self.on_files_ready)
+        self.installer_files_box.connect("file-available", self.on_file_available)
 
         self.log_buffer = Gtk.TextBuffer()
         self.error_details_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6, no_show_all=True)
@@ -688,7 +689,9 @@ class InstallerWindow(ModelessDialog, DialogInstallUIDelegate, ScriptInterpreter
 
     def present_downloading_files_page(self):
         def on_exit_page():
-            self.installer_files_box.stop_all()
+            # Once the installer commands run, downloads continue behind other pages
+            if not self.install_in_progress:
+                self.installer_files_box.stop_all()
 
         self.set_status(_("Downloading game data"))
         self.stack.present_page("installer_files")
@@ -708,20 +711,41 @@ class InstallerWindow(ModelessDialog, DialogInstallUIDelegate, ScriptInterpreter
             self.stack.jump_to_page(self.present_downloading_files_page)
         except PermissionError as ex:
             raise ScriptingError(_("Unable to get files: %s") % ex) from ex
+        # Commands that don't need the files still downloading can run in the meantime
+        GLib.idle_add(self.launch_installer_commands)
+
+    def on_file_available(self, _widget, installer_file):
+        """A file is available; the install may have been waiting for it"""
+        if self.install_in_progress:
+            self.interpreter.file_available(installer_file)
 
     def on_files_available(self, widget):
         """All files are available, continue the install"""
+        if self.install_in_progress:
+            logger.info("All files are available")
+            if self.stack.get_visible_child_name() == "installer_files":
+                self.load_spinner_page(_("Installing game data"))
+            return
+
         logger.info("All files are available, continuing install")
-        self.interpreter.game_files = widget.get_game_files()
         # Idle-add here to ensure that the launch occurs after
         # on_files_confirmed(), since they can race when no actual
         # download is required.
         GLib.idle_add(self.launch_installer_commands)
 
     def launch_installer_commands(self):
+        if self.install_in_progress:
+            return  # launched already, while the files were downloading
+
         logger.info("Launching installer commands")
         self.install_in_progress = True
-        self.load_spinner_page(_("Installing game data"))
+        if self.interpreter.installer.files:
+            self.interpreter.game_files = self.installer_files_box.get_game_files()
+            self.interpreter.pending_files = self.installer_files_box.get_pending_files()
+        if self.interpreter.pending_files:
+            self.display_cancel_button()  # keep showing the downloads meanwhile
+        else:
+            self.load_spinner_page(_("Installing game data"))
         self.stack.discard_navigation()  # once we really start installing, no going back!
         self.interpreter.installer.install_extras()
         self.interpreter.launch_installer_commands()
@@ -53,7 +53,7 @@ from lutris.gui.widgets.gi_composites import GtkTemplate
 from lutris.gui.widgets.sidebar import LutrisSidebar, SidebarRow
 from lutris.gui.widgets.utils import has_stock_icon, load_icon_theme, open_uri
 from lutris.runtime import ComponentUpdater, RuntimeUpdater
-from lutris.search import GameSearch
+from lutris.search import GameSearch, SearchResultCache
 from lutris.search_predicate import NotPredicate
 from lutris.services.base import SERVICE_GAMES_LOADED, SERVICE_LOGIN, SERVICE_LOGOUT
 from lutris.services.lutris import LutrisService, sync_media
@@ -122,6 +122,7 @@ class LutrisWindow(Gtk.ApplicationWindow, DialogLaunchUIDelegate, DialogInstallU
         self.search_timer_task = COMPLETED_IDLE_TASK
         self.filters = self.load_filters()
         self.game_search = None
+        self.search_result_cache = None
         self.set_service(self.filters.get("service"))
         self.icon_type = self.load_icon_type()
         self.game_store = GameStore(self.service, self.service_media)
@@ -574,20 +575,22 @@ class LutrisWindow(Gtk.ApplicationWindow, DialogLaunchUIDelegate, DialogInstallU
         games = self.filter_games(games)
         return sorted(games, key=lambda game: max(game["installed_at"] or 0, game["lastplayed"] or 0), reverse=True)
 
-    def get_game_search(self):
-        """Returns a game-search object for the current view settings and search text; this object
-        is cached so that we need not re-parse the search if it has not changed."""
+    def get_game_search(self, service=None):
+        """Returns a game-search object for the search text, over the games of the library, or of the
+        service given; this object is cached so that we need not re-parse the search (or search the
+        full-text index again) if it has not changed."""
         text = self.filters.get("text") or ""
-        if self.game_search is None or self.game_search.service != self.service or self.game_search.text != text:
-            self.game_search = GameSearch(text, self.service)
+        if self.game_search is None or self.game_search.service != service or self.game_search.text != text:
+            self.game_search = GameSearch(text, service, full_text=True)
         return self.game_search
 
-    def filter_games(self, games, searches: Iterable[GameSearch] = None):
+    def filter_games(self, games, searches: Iterable[GameSearch] = None, service=None):
         """Filters a list of games according to the 'installed' and 'text' filters, if those are
-        set. But if not, can just return games unchanged."""
+        set. But if not, can just return games unchanged. The games are those of the service
+        given, if any, else those of the library."""
 
         if searches is None:
-            search = self.get_game_search()
+            search = self.get_game_search(service)
 
             if self.filters.get("installed") and not search.has_component("installed"):
                 search = search.with_predicate(search.get_installed_predicate(installed=True))
@@ -641,15 +644,18 @@ class LutrisWindow(Gtk.ApplicationWindow, DialogLaunchUIDelegate, DialogInstallU
             game["year"] = self.service.get_game_release_year(game)
 
         if service_id == "lutris":
-            lutris_games = {g["slug"]: g for g in games_db.get_games()}
+            lutris_games = {g["slug"]: g for g in games_db.get_games(compact=True)}
         else:
-            lutris_games = {g["service_id"]: g for g in games_db.get_games(filters={"service": self.service.id})}
+            lutris_games = {
+                g["service_id"]: g for g in games_db.get_games(filters={"service": self.service.id}, compact=True)
+            }
 
         return self.filter_games(
             [
                 self.combine_games(game, lutris_games.get(game["appid"]))
                 for game in self.apply_view_sort(service_games, lambda game: lutris_games.get(game["appid"]) or game)
-            ]
+            ],
+            service=self.service,
         )
 
     def get_games_from_filters(self):
@@ -672,7 +678,7 @@ class LutrisWindow(Gtk.ApplicationWindow, DialogLaunchUIDelegate, DialogInstallU
 
             if saved_search_found:
                 try:
-                    searches.append(GameSearch(saved_search_found.search, service=None))
+                    searches.append(GameSearch(saved_search_found.search, service=None, full_text=True))
                     category = "all"
                 except InvalidSearchTermError:
                     pass
@@ -683,11 +689,37 @@ class LutrisWindow(Gtk.ApplicationWindow, DialogLaunchUIDelegate, DialogInstallU
         )
         category_game_ids = categories_db.get_game_ids_for_categories(included, excluded)
 
+        # Let the database do as much of the searching as it can
+        conditions = []
+        remaining_searches = []
+        for search in searches:
+            condition, remaining_search = search.split_sql()
+            if condition:
+                conditions.append(condition)
+            remaining_searches.append(remaining_search)
+
         filters = self.get_sql_filters()
-        games = games_db.get_games(filters=filters)
-        games = self.filter_games([game for game in games if game["id"] in category_game_ids], searches=searches)
+        games = self.get_search_result_cache(filters, conditions, category_game_ids).filter(remaining_searches)
         return self.apply_view_sort(games)
 
+    def get_search_result_cache(self, filters, conditions, category_game_ids):
+        """Return the cache of search results over the games selected by the filters, SQL
+        conditions and categories given. While typing, these usually stay the same, so
+        the database need not be queried again, and each search can start from the
+        results of the one before."""
+        cache_key = (
+            tuple(sorted(filters.items())),
+            tuple((clause, tuple(params)) for clause, params in conditions),
+            frozenset(category_game_ids),
+        )
+        if self.search_result_cache and self.search_result_cache[0] == cache_key:
+            return self.search_result_cache[1]
+
+        games = games_db.get_games(filters=filters, conditions=conditions)
+        search_result_cache = SearchResultCache([game for game in games if game["id"] in category_game_ids])
+        self.search_result_cache = cache_key, search_result_cache
+        return search_result_cache
+
     def get_sql_filters(self):
         """Return the current filters for the view"""
         sql_filters = {}
@@ -698,8 +730,8 @@ class LutrisWindow(Gtk.ApplicationWindow, DialogLaunchUIDelegate, DialogInstallU
         if self.filters.get("installed") and not self.get_game_search().has_component("installed"):
             sql_filters["installed"] = "1"
 
-        # We omit the "text" search here because SQLite does a fairly literal
-        # search, which is accent sensitive. We'll do better with self.filter_games()
+        # We omit the "text" search here; it goes through the full-text index instead,
+        # which is not accent sensitive, when the search is applied.
         return sql_filters
 
     def get_service_media(self, icon_type):
@@ -772,7 +804,16 @@ class LutrisWindow(Gtk.ApplicationWindow, DialogLaunchUIDelegate, DialogInstallU
         self.update_missing_games_sidebar_row()
         self.update_store()
 
-    def update_store(self) -> None:
+    def update_store_for_search(self) -> None:
+        """Updates the store after the search text changes; since nothing else has,
+        the search results we already have are still good."""
+        self.update_store(keep_search_results=True)
+
+    def update_store(self, keep_search_results: bool = False) -> None:
+        if not keep_search_results:
+            self.search_result_cache = None
+            self.game_search = None  # may hold full-text results from before the change
+
         service_id = self.filters.get("service")
         service = self.service
         service_media = self.service_media
@@ -1194,7 +1235,7 @@ class LutrisWindow(Gtk.ApplicationWindow, DialogLaunchUIDelegate, DialogInstallU
         """Callback for the search input keypresses"""
         self.search_timer_task.unschedule()
         self.filters["text"] = entry.get_text().strip()
-        self.search_timer_task = schedule_at_idle(self.update_store, delay_seconds=0.5)
+        self.search_timer_task = schedule_at_idle(self.update_store_for_search, delay_seconds=0.5)
 
     @GtkTemplate.Callback
     def on_search_entry_key_press(self, widget, event):
@@ -1352,6 +1393,8 @@ class LutrisWindow(Gtk.ApplicationWindow, DialogLaunchUIDelegate, DialogInstallU
         """Updates an individual entry in the view when a game is updated"""
         add_to_path_cache(game)
         self.update_action_state()
+        self.search_result_cache = None  # may hold the old state of the game
+        self.game_search = None  # may hold full-text results for the old name
 
         if self.service:
             db_game = self.service.get_service_db_game(game)
@@ -4,30 +4,42 @@ import concurrent.futures
 
 from lutris.gui.widgets.utils import MEDIA_CACHE_INVALIDATED
 from lutris.util import system
+from lutris.util.download_scheduler import DOWNLOAD_SCHEDULER
 from lutris.util.log import logger
 
 
 def download_media(media_urls, service_media):
     """Download a list of media files concurrently.
 
-    Limits the number of simultaneous downloads to avoid API throttling.
+    The DOWNLOAD_SCHEDULER limits the number of simultaneous downloads to avoid API
+    throttling, and lets more urgent downloads go first.
     """
-    icons = {}
-    num_workers = 5
+    return download_all_media([(service_media, media_urls)])[service_media]
+
+
+def download_all_media(media_downloads):
+    """Download the media files of several media types through a single pool; takes
+    a list of (service_media, media_urls) and returns the paths downloaded for each
+    service_media, by slug. The downloads start in the order given."""
+    icons = {service_media: {} for service_media, _media_urls in media_downloads}
+    num_workers = DOWNLOAD_SCHEDULER.max_downloads
     with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
         future_downloads = {
-            executor.submit(service_media.download, slug, url): slug for slug, url in media_urls.items() if url
+            executor.submit(service_media.download, slug, url): (service_media, slug)
+            for service_media, media_urls in media_downloads
+            for slug, url in media_urls.items()
+            if url
         }
         for future in concurrent.futures.as_completed(future_downloads):
-            slug = future_downloads[future]
+            service_media, slug = future_downloads[future]
             try:
                 path = future.result()
             except Exception as ex:  # pylint: disable=broad-except
                 logger.exception("%r failed: %s", slug, ex)
                 path = None
             if system.path_exists(path):
-                icons[slug] = path
+                icons[service_media][slug] = path
 
-    if icons:
+    if any(icons.values()):
         MEDIA_CACHE_INVALIDATED.fire()
     return icons
@@ -1,14 +1,15 @@
 """Store object for a list of games"""
 
 # pylint: disable=not-an-iterable
-import time
+from collections import defaultdict
 from typing import Set, Union
 
 from gi.repository import GLib, GObject, Gtk
 
 from lutris import settings
 from lutris.database import sql
-from lutris.database.games import get_all_installed_game_for_service, get_games
+from lutris.database.catalogue import CATALOGUE
+from lutris.database.games import get_all_installed_game_for_service
 from lutris.gui.views.store_item import StoreItem
 from lutris.util.strings import gtk_safe
 
@@ -74,9 +75,10 @@ class GameStore(GObject.Object):
         super().__init__()
         self.service = service
         self.service_media = service_media
-        self._installed_games = []
-        self._installed_games_accessed = False
         self._icon_updates = {}
+        # ListStore iters stay valid as long as their row exists, so we index them
+        self._iters_by_id = {}
+        self._iters_by_slug = defaultdict(list)
 
         self.store = Gtk.ListStore(
             str,
@@ -99,31 +101,38 @@ class GameStore(GObject.Object):
 
     @property
     def installed_game_slugs(self):
-        previous_access = self._installed_games_accessed or 0
-        self._installed_games_accessed = time.time()
-        if self._installed_games_accessed - previous_access > 1:
-            self._installed_games = [g["slug"] for g in get_games(filters={"installed": "1"})]
-        return self._installed_games
+        return [g["slug"] for g in CATALOGUE.get_installed()]
 
     def get_row_by_slug(self, slug):
-        for model_row in self.store:
-            if model_row[COL_SLUG] == slug:
-                return model_row
+        iters = self._iters_by_slug.get(slug)
+        if iters:
+            return self.store[iters[0]]
 
     def get_row_by_id(self, _id):
         if not _id:
             return
-        for model_row in self.store:
-            try:
-                if model_row[COL_ID] == str(_id):
-                    return model_row
-            except TypeError:
-                return
+        row_iter = self._iters_by_id.get(str(_id))
+        if row_iter:
+            return self.store[row_iter]
+
+    def _index_row(self, row_iter, _id, slug):
+        self._iters_by_id.setdefault(_id, row_iter)
+        self._iters_by_slug[slug].append(row_iter)
+
+    def _unindex_row(self, row_iter, _id, slug):
+        if _id in self._iters_by_id and self.store.get_path(self._iters_by_id[_id]) == self.store.get_path(row_iter):
+            del self._iters_by_id[_id]
+        iters = self._iters_by_slug.get(slug, [])
+        path = self.store.get_path(row_iter)
+        iters[:] = [i for i in iters if self.store.get_path(i) != path]
+        if not iters:
+            self._iters_by_slug.pop(slug, None)
 
     def remove_game(self, _id):
         """Remove a game from the view."""
         row = self.get_row_by_id(_id)
         if row:
+            self._unindex_row(row.iter, row[COL_ID], row[COL_SLUG])
             self.store.remove(row.iter)
 
     def update(self, db_game: dict) -> Union[Set[int], None]:
@@ -157,6 +166,10 @@ class GameStore(GObject.Object):
         new_values[COL_PLAYTIME] = store_item.playtime
         new_values[COL_PLAYTIME_TEXT] = store_item.playtime_text
 
+        if row[COL_ID] != new_values[COL_ID] or row[COL_SLUG] != new_values[COL_SLUG]:
+            self._unindex_row(row.iter, row[COL_ID], row[COL_SLUG])
+            self._index_row(row.iter, new_values[COL_ID], new_values[COL_SLUG])
+
         changed_indices = set()
         for idx, value in new_values.items():
             if row[idx] != value:
@@ -170,7 +183,7 @@ class GameStore(GObject.Object):
         self.add_item(store_item)
 
     def add_item(self, store_item):
-        self.store.append(
+        row_iter = self.store.append(
             (
                 store_item.id,
                 store_item.slug,
@@ -190,6 +203,7 @@ class GameStore(GObject.Object):
                 store_item.playtime_text,
             )
         )
+        self._index_row(row_iter, str(store_item.id), store_item.slug)
 
     def add_preloaded_games(self, db_games, service_id):
         """Add games to the store, but preload their installed-game data
@@ -14,11 +14,12 @@ gi.require_version("PangoCairo", "1.0")
 import cairo
 from gi.repository import Gdk, GObject, Gtk, Pango, PangoCairo
 
+from lutris.gui.widgets.surface_loader import SURFACE_LOADER
 from lutris.gui.widgets.utils import (
     MEDIA_CACHE_INVALIDATED,
+    get_cached_scaled_surface_by_path,
     get_default_icon_path,
     get_runtime_icon_path,
-    get_scaled_surface_by_path,
     get_surface_size,
 )
 from lutris.services.service_media import resolve_media_path
@@ -26,6 +27,9 @@ from lutris.util.path_cache import MISSING_GAMES
 
 _MEDIA_CACHE_GENERATION_NUMBER = 0
 
+# Returned in place of a surface that is still being loaded
+SURFACE_LOADING = object()
+
 
 class GridViewCellRendererText(Gtk.CellRendererText):
     """CellRendererText adjusted for grid view display, removes extra padding
@@ -116,6 +120,9 @@ class GridViewCellRendererImage(Gtk.CellRenderer):
         self.cached_surfaces_old = {}
         self.cached_surfaces_loaded = 0
         self.cached_surface_generation = 0
+        self.requested_surfaces = {}  # key -> scroll position when the surface was requested
+        self.draw_pass = 0
+        self.drawn_since_cycle = False
         self.badge_size = 0, 0
         self.badge_alpha = 0.6
         self.badge_fore_color = 1, 1, 1
@@ -225,7 +232,13 @@ class GridViewCellRendererImage(Gtk.CellRenderer):
         alpha = 1 if self.is_installed else 100 / 255
 
         if media_width > 0 and media_height > 0 and path:
-            surface = self._get_cached_surface_by_path(widget, path, size=(media_width, media_height))
+            surface = self._get_cached_surface_by_path(
+                widget, path, size=(media_width, media_height), cell_area=cell_area
+            )
+            if surface is SURFACE_LOADING:
+                self.render_placeholder(cr, cell_area, media_width, media_height)
+                schedule_at_idle(self.cycle_cache)
+                return
             if not surface:
                 # The default icon needs to be scaled to fill the cell space.
                 path = get_default_icon_path((media_width, media_height))
@@ -354,6 +367,19 @@ class GridViewCellRendererImage(Gtk.CellRenderer):
         media_area.width, media_area.height = width, height
         return media_area
 
+    def render_placeholder(self, cr, cell_area, media_width, media_height):
+        """Renders a faint box where media that is still loading will appear."""
+        cr.save()
+        cr.set_source_rgba(*self.badge_back_color, 0.1)
+        cr.rectangle(
+            round(cell_area.x + (cell_area.width - media_width) / 2),
+            round(cell_area.y + cell_area.height - media_height),
+            media_width,
+            media_height,
+        )
+        cr.fill()
+        cr.restore()
+
     def render_media(self, cr, widget, surface, x, y):
         """Renders the media itself, given the surface containing it
         and the position."""
@@ -488,6 +514,8 @@ class GridViewCellRendererImage(Gtk.CellRenderer):
         """Discards all cached surfaces; used when some properties are changed."""
         self.cached_surfaces_old.clear()
         self.cached_surfaces_new.clear()
+        SURFACE_LOADER.cancel(self.requested_surfaces)
+        self.requested_surfaces.clear()
 
     def cycle_cache(self) -> None:
         """Is the key cache size control trick. When called, the surfaces cached or used
@@ -499,21 +527,33 @@ class GridViewCellRendererImage(Gtk.CellRenderer):
 
         We skip clearing anything if no surfaces have been loaded; this happens if drawing was
         serviced entirely from cache. GTK may have redrawn just one image or something, so
-        let's not disturb the cache for that."""
+        let's not disturb the cache for that.
+
+        This also cancels the loading of surfaces for cells that have been scrolled
+        far out of view since they were requested."""
+        if self.drawn_since_cycle:
+            self.drawn_since_cycle = False
+            self.draw_pass += 1
+            self._cancel_scrolled_away_requests()
+
         if self.cached_surfaces_loaded > 0:
             self.cached_surfaces_old = self.cached_surfaces_new
             self.cached_surfaces_new = {}
             self.cached_surfaces_loaded = 0
 
-    def _get_cached_surface_by_path(self, widget, path, size, preserve_aspect_ratio=True):
+    def _get_cached_surface_by_path(self, widget, path, size, preserve_aspect_ratio=True, cell_area=None):
         """This obtains the scaled surface to rander for a given media path; this is cached
         in this render, but we'll clear that cache when the media generation number is changed,
         or certain properties are. We also age surfaces from the cache at idle time after
-        rendering."""
+        rendering.
+
+        If you pass the cell_area, a surface not in the cache is loaded on a worker thread,
+        and this returns SURFACE_LOADING until it is ready; the widget is then redrawn."""
         if self.cached_surface_generation != _MEDIA_CACHE_GENERATION_NUMBER:
             self.cached_surface_generation = _MEDIA_CACHE_GENERATION_NUMBER
             self.clear_cache()
 
+        self.drawn_since_cycle = True
         key = widget, path, size, preserve_aspect_ratio
 
         if key in self.cached_surfaces_new:
@@ -522,7 +562,15 @@ class GridViewCellRendererImage(Gtk.CellRenderer):
         if key in self.cached_surfaces_old:
             surface = self.cached_surfaces_old[key]
         else:
-            surface = self._get_surface_by_path(widget, path, size, preserve_aspect_ratio)
+            if cell_area:
+                found, surface = SURFACE_LOADER.take(key)
+                self.requested_surfaces.pop(key, None)
+                if not found:
+                    self._request_surface(key, cell_area)
+                    return SURFACE_LOADING
+            else:
+                scale_factor = widget.get_scale_factor() if widget else 1
+                surface = self._get_surface_by_path(scale_factor, path, size, preserve_aspect_ratio)
             if surface:
                 # We cache missing surfaces too, but only a successful load trigger
                 # cache cycling
@@ -531,11 +579,50 @@ class GridViewCellRendererImage(Gtk.CellRenderer):
         self.cached_surfaces_new[key] = surface
         return surface
 
-    def _get_surface_by_path(self, widget, path, size, preserve_aspect_ratio=True):
-        cell_size = size
+    def _request_surface(self, key, cell_area):
+        """Asks the worker threads to load the surface for a key. The cells drawn in the latest
+        pass are loaded first, from the top down, since these are the ones in view."""
+        widget, path, size, preserve_aspect_ratio = key
         scale_factor = widget.get_scale_factor() if widget else 1
+
+        def load():
+            return self._get_surface_by_path(scale_factor, path, size, preserve_aspect_ratio)
+
+        priority = -self.draw_pass, cell_area.y, cell_area.x
+        self.requested_surfaces[key] = self._get_scroll_position(widget)
+        SURFACE_LOADER.request(key, load, priority, self._on_surfaces_loaded)
+
+    @staticmethod
+    def _get_scroll_position(widget):
+        """Returns the vertical scroll position and the page size of a scrollable widget."""
+        adjustment = widget.get_vadjustment() if isinstance(widget, Gtk.Scrollable) else None
+        if adjustment:
+            return adjustment.get_value(), adjustment.get_page_size()
+        return 0, 0
+
+    def _cancel_scrolled_away_requests(self):
+        """Cancels loading the surfaces requested while their widget was scrolled more than
+        a page away from where it is now; those cells are out of view, and will be requested
+        again if they scroll back in."""
+        scrolled_away = []
+        for key, (requested_position, page_size) in self.requested_surfaces.items():
+            position, _page_size = self._get_scroll_position(key[0])
+            if abs(position - requested_position) > page_size:
+                scrolled_away.append(key)
+        for key in scrolled_away:
+            del self.requested_surfaces[key]
+        SURFACE_LOADER.cancel(scrolled_away)
+
+    def _on_surfaces_loaded(self, keys):
+        """Redraws the widgets whose surfaces have finished loading; they are
+        in the loader until the cells using them are drawn again."""
+        for widget in set(key[0] for key in keys if key in self.requested_surfaces):
+            widget.queue_draw()
+
+    def _get_surface_by_path(self, scale_factor, path, size, preserve_aspect_ratio=True):
+        cell_size = size
         try:
-            return get_scaled_surface_by_path(
+            return get_cached_scaled_surface_by_path(
                 path, cell_size, scale_factor, preserve_aspect_ratio=preserve_aspect_ratio
             )
         except Exception as ex:
@@ -13,6 +13,9 @@ from lutris.util.strings import gtk_safe, human_size
 # Same reason as Downloader
 get_time = time.monotonic
 
+# Large installer files are downloaded over this many connections at once
+DOWNLOAD_CONNECTIONS = 4
+
 
 class DownloadCollectionProgressBox(Gtk.Box):
     """Progress bar used to monitor a collection of files download."""
@@ -119,16 +122,22 @@ class DownloadCollectionProgressBox(Gtk.Box):
             self.start()
             return
 
-        # Use a temporary file to avoid problems with partially downloaded files
-        tmp_path = file.dest_file + ".tmp"
-        file.tmp_file = tmp_path
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        # Use a temporary file to avoid problems with partially downloaded files; if an
+        # earlier attempt left one, the downloader resumes it.
+        file.tmp_file = file.dest_file + ".tmp"
 
         self.update_download_file_label(file.filename)
         if not self.downloader:
             try:
-                self.downloader = Downloader(file.url, file.tmp_file, referer=file.referer, overwrite=True)
+                self.downloader = Downloader(
+                    file.url,
+                    file.tmp_file,
+                    referer=file.referer,
+                    overwrite=True,
+                    resume=True,
+                    connections=DOWNLOAD_CONNECTIONS,
+                    hash_type=file.hash_type,
+                )
             except RuntimeError as ex:
                 display_error(ex, parent=self.get_toplevel())
                 self.emit("cancel")
@@ -199,6 +208,7 @@ class DownloadCollectionProgressBox(Gtk.Box):
             self.num_files_downloaded += 1
             self.current_size += self.downloader.downloaded_size
             os.rename(self._file_download.tmp_file, self._file_download.dest_file)
+            self._file_download.remember_download_checksum(self.downloader)
             # set file to None to get next one
             self._file_download = None
             self.downloader = None
@@ -30,6 +30,7 @@ class DownloadProgressBox(Gtk.Box):
         title: Optional[str] = None,
         cancelable: bool = True,
         downloader: Optional[Downloader] = None,
+        hash_type: Optional[str] = None,
     ) -> None:
         super().__init__(orientation=Gtk.Orientation.VERTICAL)
 
@@ -39,6 +40,7 @@ class DownloadProgressBox(Gtk.Box):
         self.dest = dest
         self.temp = temp or (dest + ".tmp")
         self.referer = referer
+        self.hash_type = hash_type
 
         if not title:
             parsed_url = urlparse(url)
@@ -82,7 +84,9 @@ class DownloadProgressBox(Gtk.Box):
     @property
     def downloader(self) -> Downloader:
         if not self._downloader:
-            self._downloader = Downloader(self.url, self.temp, referer=self.referer, overwrite=True)
+            self._downloader = Downloader(
+                self.url, self.temp, referer=self.referer, overwrite=True, resume=True, hash_type=self.hash_type
+            )
         return self._downloader
 
     def cancel_download(self):
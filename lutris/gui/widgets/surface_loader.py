@@ -0,0 +1,116 @@
+"""Loads media surfaces on background threads, so the main thread need not wait while
+images are decoded and scaled."""
+
+import heapq
+import itertools
+import os
+import threading
+
+from lutris.util.jobs import schedule_at_idle
+from lutris.util.log import logger
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class SurfaceLoader:
+    """A bounded pool of worker threads that run load functions, most urgent first.
+
+    Each request has a key identifying what it loads, and a priority; lower priorities
+    are loaded first. Once loaded, the result waits until collected with take(), and the
+    callback given with the request is called at idle time on the main thread, with the keys
+    loaded, so it can redraw. Requests that haven't started yet can be cancelled.
+
+    Worker threads are started as needed, and exit when there's nothing left to load."""
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._queue = []  # heap of (priority, serial number, key)
+        self._serials = itertools.count()
+        self._requests = {}  # key -> (priority, load function, callback), for requests not started
+        self._loading = set()
+        self._results = {}  # key -> result, until taken
+        self._loaded = {}  # callback -> keys loaded, until the callback is called
+        self._worker_count = 0
+
+    def request(self, key, load, priority, callback):
+        """Queues load() to run on a worker thread, unless it is queued, running or done
+        already; a queued request can be made more urgent by requesting it again."""
+        with self._lock:
+            if key in self._results or key in self._loading:
+                return
+            queued = self._requests.get(key)
+            if queued and queued[0] <= priority:
+                return
+            self._requests[key] = priority, load, callback
+            heapq.heappush(self._queue, (priority, next(self._serials), key))
+            if self._worker_count < self.max_workers:
+                self._worker_count += 1
+                threading.Thread(target=self._work, daemon=True).start()
+
+    def take(self, key):
+        """Returns a tuple of True and the result for the key, if it has been loaded; the
+        result is then forgotten. If not, this returns a tuple of False and None."""
+        with self._lock:
+            if key in self._results:
+                return True, self._results.pop(key)
+            return False, None
+
+    def is_requested(self, key):
+        """True if the key is queued, loading, or loaded but not taken."""
+        with self._lock:
+            return key in self._requests or key in self._loading or key in self._results
+
+    def cancel(self, keys):
+        """Forgets the requests for the keys given; those that are loading already are
+        completed, but their results are discarded."""
+        with self._lock:
+            for key in keys:
+                self._requests.pop(key, None)
+                self._results.pop(key, None)
+                self._loading.discard(key)
+
+    def _next_request(self):
+        """Pops the most urgent request still wanted from the queue; returns None if
+        there is none, in which case the worker calling this must exit."""
+        with self._lock:
+            while self._queue:
+                priority, _serial, key = heapq.heappop(self._queue)
+                request = self._requests.get(key)
+                # Skip entries superseded by a more urgent request, or cancelled
+                if request and request[0] == priority:
+                    del self._requests[key]
+                    self._loading.add(key)
+                    return key, request[1], request[2]
+            self._worker_count -= 1
+            return None
+
+    def _work(self):
+        while True:
+            request = self._next_request()
+            if not request:
+                return
+            key, load, callback = request
+            try:
+                result = load()
+            except Exception as ex:  # pylint: disable=broad-except
+                logger.exception("Unable to load %s: %s", key, ex)
+                result = None
+            with self._lock:
+                if key not in self._loading:
+                    continue  # cancelled while loading
+                self._loading.discard(key)
+                self._results[key] = result
+                if not self._loaded:
+                    schedule_at_idle(self._notify_loaded)
+                self._loaded.setdefault(callback, []).append(key)
+
+    def _notify_loaded(self):
+        with self._lock:
+            loaded = self._loaded
+            self._loaded = {}
+        for callback, keys in loaded.items():
+            callback(keys)
+
+
+SURFACE_LOADER = SurfaceLoader()
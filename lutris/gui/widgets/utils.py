@@ -1,7 +1,9 @@
 """Various utilities using the GObject framework"""
 
 import array
+import hashlib
 import os
+import threading
 from typing import TYPE_CHECKING, Iterable, List, Optional, TypeVar, cast
 
 import cairo
@@ -159,6 +161,71 @@ def get_scaled_surface_by_path(path, size, device_scale, preserve_aspect_ratio=T
     return surface
 
 
+def get_thumbnail_path(path, size, device_scale, preserve_aspect_ratio=True):
+    """Returns the path of the cached thumbnail of the image at 'path', scaled as
+    get_scaled_surface_by_path() would, or None if there's no file at the path.
+
+    Each image gets a directory named after a hash of its path, and the thumbnail's file
+    name records the image's modification time and size, so a replaced image gets new
+    thumbnails."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+
+    path_hash = hashlib.sha1(os.path.abspath(path).encode("utf-8", "surrogateescape")).hexdigest()
+    filename = "%s-%s-%sx%s@%s%s.png" % (
+        stat.st_mtime_ns,
+        stat.st_size,
+        size[0],
+        size[1],
+        device_scale,
+        "" if preserve_aspect_ratio else "-stretched",
+    )
+    return os.path.join(settings.THUMBNAIL_CACHE_DIR, path_hash[:2], path_hash, filename)
+
+
+def save_thumbnail(surface, thumbnail_path):
+    """Writes a surface to the thumbnail cache, and removes the thumbnails made from
+    older versions of the same image."""
+    directory, filename = os.path.split(thumbnail_path)
+    image_version = filename.split("-", 2)[:2]
+    temp_path = "%s.%s-%s.tmp" % (thumbnail_path, os.getpid(), threading.get_ident())
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for existing_filename in os.listdir(directory):
+            if existing_filename.split("-", 2)[:2] != image_version:
+                os.remove(os.path.join(directory, existing_filename))
+        surface.write_to_png(temp_path)
+        os.replace(temp_path, thumbnail_path)
+    except (OSError, cairo.Error) as ex:  # pylint: disable=no-member
+        logger.warning("Unable to save thumbnail %s: %s", thumbnail_path, ex)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def get_cached_scaled_surface_by_path(path, size, device_scale, preserve_aspect_ratio=True):
+    """Returns the same surface as get_scaled_surface_by_path(), but reads it from the
+    thumbnail cache if it can. This avoids decoding and scaling the full-size image, which
+    is much slower than reading a small PNG. Newly scaled images are added to the cache."""
+    thumbnail_path = get_thumbnail_path(path, size, device_scale, preserve_aspect_ratio)
+    if not thumbnail_path:
+        return None
+
+    if os.path.isfile(thumbnail_path):
+        try:
+            surface = cairo.ImageSurface.create_from_png(thumbnail_path)  # pylint:disable=no-member
+            surface.set_device_scale(device_scale, device_scale)
+            return surface
+        except (OSError, MemoryError, cairo.Error) as ex:  # pylint: disable=no-member
+            logger.warning("Unable to read thumbnail %s: %s", thumbnail_path, ex)
+
+    surface = get_scaled_surface_by_path(path, size, device_scale, preserve_aspect_ratio)
+    if surface:
+        save_thumbnail(surface, thumbnail_path)
+    return surface
+
+
 def get_default_icon_path(size):
     """Returns the path to the default icon for the size given; it's
     a Lutris icon for a square size, and a gradient for other sizes."""
@@ -1,5 +1,6 @@
 """Commands for installer scripts"""
 
+import functools
 import glob
 import json
 import multiprocessing
@@ -201,7 +202,10 @@ class CommandsMixin:
             merge_single = "nomerge" not in data
             extractor = data.get("format")
             logger.debug("extracting file %s to %s", filename, dest_path)
-            self._killable_process(extract.extract_archive, filename, dest_path, merge_single, extractor)
+            extracted_size = self._killable_process(
+                extract.extract_archive_with_size, filename, dest_path, merge_single, extractor
+            )
+            self.metrics.add_bytes_extracted(extracted_size)
         logger.debug("Extract done")
 
     def input_menu(self, data):
@@ -286,11 +290,12 @@ class CommandsMixin:
             # can be used as executable. Skip copying if the source is the same
             # as destination.
             if os.path.dirname(src) != dst:
-                self._killable_process(shutil.copy, src, dst)
+                self._killable_process(system.copy_file, src, dst)
+                self.metrics.add_bytes_copied(os.path.getsize(src))
             if params["src"] in self.game_files.keys():
                 self.game_files[params["src"]] = os.path.join(dst, os.path.basename(src))
             return
-        self._killable_process(system.merge_folders, src, dst)
+        self.metrics.add_bytes_copied(self._killable_process(system.merge_folders, src, dst))
 
     def copy(self, params):
         """Alias for merge"""
@@ -319,10 +324,12 @@ class CommandsMixin:
                 return
         try:
             if is_file_in_custom_cache(src):
-                action = shutil.copy
+                self._killable_process(system.copy_file, src, dst)
+                self.metrics.add_bytes_copied(os.path.getsize(src))
             else:
-                action = shutil.move
-            self._killable_process(action, src, dst)
+                # Moving between file systems copies, but it can do so in the kernel too
+                copy_function = functools.partial(system.copy_file, preserve_metadata=True)
+                self._killable_process(shutil.move, src, dst, copy_function=copy_function)
         except shutil.Error as err:
             raise ScriptingError(_("Can't move {src} \nto destination {dst}").format(src=src, dst=dst)) from err
 
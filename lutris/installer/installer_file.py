@@ -5,7 +5,15 @@ from gettext import gettext as _
 from typing import Optional
 from urllib.parse import urlparse
 
-from lutris.cache import get_url_cache_path, has_valid_custom_cache_path, save_to_cache
+from lutris.cache import (
+    add_to_content_store,
+    find_cached_content,
+    get_url_cache_path,
+    has_valid_custom_cache_path,
+    is_content_stored,
+    restore_from_content_store,
+    save_to_cache,
+)
 from lutris.gui.widgets.download_progress_box import DownloadProgressBox
 from lutris.installer.errors import ScriptingError
 from lutris.util import system
@@ -23,6 +31,7 @@ class InstallerFile:
         self._file_meta = file_meta
         self._dest_file_override = None  # Used to override the destination
         self._dest_file_found = None  # Lazy storage for the resolved destination file
+        self._download_checksum = None  # (hash type, checksum, file signature) computed while downloading
         if isinstance(self._file_meta, dict):
             self._downloader = self._file_meta.get("downloader")
         else:
@@ -38,6 +47,7 @@ class InstallerFile:
         file._dest_file_override = self._dest_file_override
         file._dest_file_found = self._dest_file_found
         file._downloader = self._downloader
+        file._download_checksum = self._download_checksum
         return file
 
     @property
@@ -96,6 +106,13 @@ class InstallerFile:
         if isinstance(self._file_meta, dict):
             return self._file_meta.get("checksum")
 
+    @property
+    def hash_type(self) -> Optional[str]:
+        """The type of the checksum of the file, if it has one"""
+        if self.checksum and ":" in self.checksum:
+            return self.checksum.split(":", 1)[0]
+        return None
+
     @property
     def dest_file(self):
         def find_dest_file():
@@ -231,11 +248,50 @@ class InstallerFile:
         anwe will create directories to contain the cached file."""
         if not self.is_dest_file_overridden:
             get_url_cache_path(self.url, self.id, self.game_slug, prepare=True)
+            if self.uses_pga_cache() and not system.path_exists(self.dest_file):
+                # Another installer may have cached the same file
+                restore_from_content_store(self.checksum, self.dest_file)
 
     def create_download_progress_box(self):
-        return DownloadProgressBox(
-            url=self.url, dest=self.dest_file, temp=self.download_file, referer=self.referer, downloader=self.downloader
+        download_progress = DownloadProgressBox(
+            url=self.url,
+            dest=self.dest_file,
+            temp=self.download_file,
+            referer=self.referer,
+            downloader=self.downloader,
+            hash_type=self.hash_type,
+        )
+        # Connected first, so this runs before the handlers checking the hash
+        download_progress.connect(
+            "complete", lambda _widget, _data: self.remember_download_checksum(download_progress.downloader)
         )
+        return download_progress
+
+    @staticmethod
+    def _get_file_signature(path):
+        """Return what identifies the content of a file cheaply, or None if it's missing"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def remember_download_checksum(self, downloader):
+        """Keep the checksum the downloader computed while the file arrived, so check_hash()
+        doesn't have to read the whole file again. Call this once the file is at dest_file."""
+        if downloader.hash_type and downloader.checksum:
+            signature = self._get_file_signature(self.dest_file)
+            self._download_checksum = (downloader.hash_type, downloader.checksum, signature)
+
+    def _get_download_checksum(self, hash_type):
+        """Return the checksum computed while downloading, if it's of the type given
+        and the file hasn't changed since."""
+        if not self._download_checksum:
+            return None
+        download_hash_type, checksum, signature = self._download_checksum
+        if download_hash_type != hash_type or signature != self._get_file_signature(self.dest_file):
+            return None
+        return checksum
 
     def check_hash(self):
         """Checks the checksum of `file` and compare it to `value`
@@ -254,8 +310,10 @@ class InstallerFile:
                 _("Invalid checksum, expected format (type:hash) "), faulty_data=self.checksum
             ) from err
 
-        logger.info("Checking hash %s for %s", hash_type, self.dest_file)
-        calculated_hash = system.get_file_checksum(self.dest_file, hash_type)
+        calculated_hash = self._get_download_checksum(hash_type)
+        if not calculated_hash:
+            logger.info("Checking hash %s for %s", hash_type, self.dest_file)
+            calculated_hash = system.get_file_checksum(self.dest_file, hash_type)
         if calculated_hash != expected_hash:
             raise ScriptingError(
                 hash_type.capitalize() + _(" checksum mismatch "), faulty_data=f"{expected_hash} != {calculated_hash}"
@@ -285,12 +343,20 @@ class InstallerFile:
 
     def is_ready(self, provider):
         """Is the file already present at the destination (if applicable)?"""
+        if provider == "pga" and self.is_in_content_store:
+            return True  # prepare() will put it there
         return provider not in ("user", "pga") or system.path_exists(self.dest_file)
 
+    @property
+    def is_in_content_store(self):
+        """Is the file in the content store of the PGA cache, shared by the installers
+        of all games, though not necessarily at dest_file?"""
+        return not self.is_dest_file_overridden and self.uses_pga_cache() and bool(find_cached_content(self.checksum))
+
     @property
     def is_cached(self):
         """Is the file available in the local PGA cache?"""
-        return self.uses_pga_cache() and system.path_exists(self.dest_file)
+        return self.uses_pga_cache() and (system.path_exists(self.dest_file) or self.is_in_content_store)
 
     def save_to_cache(self):
         """Copy the file into the PGA cache."""
@@ -305,6 +371,27 @@ class InstallerFile:
             return
 
         save_to_cache(self.dest_file, cache_path)
+        self.add_to_content_store(os.path.join(cache_path, os.path.basename(self.dest_file)))
+
+    def add_to_content_store(self, cached_file):
+        """Share a cached copy of the file with the installers of other games, if it has
+        the checksum the installer expects. A file just downloaded was verified already;
+        others are verified now."""
+        if not self.checksum or not os.path.isfile(cached_file) or is_content_stored(cached_file, self.checksum):
+            return
+        hash_type, expected_hash = self.checksum.split(":", 1)
+        calculated_hash = None
+        if os.path.samefile(cached_file, self.dest_file):
+            calculated_hash = self._get_download_checksum(hash_type)
+        try:
+            calculated_hash = calculated_hash or system.get_file_checksum(cached_file, hash_type)
+        except ValueError as ex:
+            logger.warning("Unable to check %s: %s", cached_file, ex)
+            return
+        if calculated_hash != expected_hash:
+            logger.warning("%s does not match its checksum, not sharing it", cached_file)
+            return
+        add_to_content_store(cached_file, self.checksum)
 
     def remove_previous(self):
         """Remove file at already at destination, prior to starting the download."""
@@ -1,6 +1,7 @@
 """Install a game by following its install script."""
 
 import os
+import re
 from gettext import gettext as _
 
 from gi.repository import GObject
@@ -14,6 +15,7 @@ from lutris.installer import AUTO_EXE_PREFIX
 from lutris.installer.commands import CommandsMixin
 from lutris.installer.errors import MissingGameDependencyError, ScriptingError
 from lutris.installer.installer import LutrisInstaller
+from lutris.installer.metrics import InstallMetrics
 from lutris.runners import NonInstallableRunnerError, RunnerInstallationError, steam, wine
 from lutris.services.lutris import download_lutris_media
 from lutris.util import system
@@ -22,6 +24,24 @@ from lutris.util.jobs import AsyncCall
 from lutris.util.log import logger
 from lutris.util.strings import unpack_dependencies
 
+# Words in command parameters that may be the ID of an installer file
+FILE_REFERENCE_RE = re.compile(r"[\w-]+")
+
+# Commands that use all the installer files, without naming them
+COMMANDS_USING_ALL_FILES = ("autosetup_amazon",)
+
+
+def _iter_strings(params):
+    """Yield every string in command parameters, however nested"""
+    if isinstance(params, dict):
+        for value in params.values():
+            yield from _iter_strings(value)
+    elif isinstance(params, (list, tuple)):
+        for value in params:
+            yield from _iter_strings(value)
+    elif params is not None:
+        yield str(params)
+
 
 class ScriptInterpreter(GObject.Object, CommandsMixin):
     """Control the execution of an installer"""
@@ -73,6 +93,10 @@ class ScriptInterpreter(GObject.Object, CommandsMixin):
         # Or a list of IDs of extras to be downloaded during the install
         self.game_disc = None
         self.game_files = {}
+        # Files still being downloaded while the commands run, as a mapping of their
+        # IDs to the local files they provide; commands needing them wait for them.
+        self.pending_files = {}
+        self.waiting_for_files = False
         self.cancelled = False
         self.abort_current_task = None
         self.user_inputs = []
@@ -80,6 +104,7 @@ class ScriptInterpreter(GObject.Object, CommandsMixin):
         self.runners_to_install = []
         self.current_resolution = DISPLAY_MANAGER.get_current_resolution()
         self.installer = LutrisInstaller(installer, self, service=self.service, appid=_appid)
+        self.metrics = InstallMetrics(self.installer.game_slug, self.installer.slug)
 
         if not self.installer.script:
             raise ScriptingError(_("This installer doesn't have a 'script' section"))
@@ -300,18 +325,23 @@ class ScriptInterpreter(GObject.Object, CommandsMixin):
         if result == "STOP" or self.cancelled:
             return
 
+        self.metrics.finish_command(exception)
         try:
             commands = self.installer.script.get("installer", [])
             if exception:
                 logger.error("Last install command failed, show error")
+                self.metrics.save_report()
                 self.interpreter_ui_delegate.report_error(exception)
             elif self.current_command < len(commands):
                 try:
                     command = commands[self.current_command]
                 except KeyError as err:
                     raise ScriptingError(_("Installer commands are not formatted correctly")) from err
-                self.current_command += 1
+                if self._wait_for_files(self.get_pending_dependencies(command)):
+                    return
                 method, params = self._map_command(command)
+                self.metrics.start_command(self.current_command, self._get_command_label(command))
+                self.current_command += 1
                 if isinstance(params, dict):
                     status_text = params.pop("description", None)
                 else:
@@ -335,7 +365,7 @@ class ScriptInterpreter(GObject.Object, CommandsMixin):
                     AsyncCall(dispatch, self._iter_commands)
                 else:
                     AsyncCall(method, self._iter_commands, params)
-            else:
+            elif not self._wait_for_files(set(self.pending_files)):
                 logger.debug("Commands %d out of %s completed", self.current_command, len(commands))
                 self._finish_install()
         except Exception as ex:
@@ -343,6 +373,51 @@ class ScriptInterpreter(GObject.Object, CommandsMixin):
             logger.exception("Error during installation: %s", ex)
             self.interpreter_ui_delegate.report_error(ex)
 
+    def _wait_for_files(self, file_ids):
+        """Return True, and suspend the commands until file_available() is called,
+        if any of the files given are still pending."""
+        if not file_ids:
+            return False
+        logger.info("Waiting for %s to be available", ", ".join(sorted(file_ids)))
+        self.interpreter_ui_delegate.report_status(_("Waiting for the game files to download"))
+        self.waiting_for_files = True
+        return True
+
+    def file_available(self, installer_file):
+        """Called when a pending file is available; resumes the commands if they were waiting"""
+        self.game_files.update(installer_file.get_dest_files_by_id())
+        self.pending_files.pop(installer_file.id, None)
+        if self.waiting_for_files and not self.cancelled:
+            self.waiting_for_files = False
+            self._iter_commands()
+
+    def get_pending_dependencies(self, command_data):
+        """Return the IDs of the pending files a command may use; these are the files it
+        refers to by ID or by path, or all of them for commands working on every file."""
+        if not self.pending_files:
+            return set()
+        command_name, command_params = self._get_command_name_and_params(command_data)
+        values = list(_iter_strings(command_params))
+        if command_name in COMMANDS_USING_ALL_FILES or any("$CACHE" in value for value in values):
+            return set(self.pending_files)
+        # IDs can have dashes, which substitute() reads as underscores; both sides are
+        # compared that way
+        words = {word.replace("-", "_") for value in values for word in FILE_REFERENCE_RE.findall(value)}
+        dependencies = set()
+        for file_id, dest_files in self.pending_files.items():
+            for dest_id, path in dest_files.items():
+                referenced = file_id.replace("-", "_") in words or dest_id.replace("-", "_") in words
+                if referenced or (path and any(path in value for value in values)):
+                    dependencies.add(file_id)
+        return dependencies
+
+    def _get_command_label(self, command_data):
+        """Return the name of a command for reports; tasks include the name of the task"""
+        command_name, command_params = self._get_command_name_and_params(command_data)
+        if command_name == "task" and isinstance(command_params, dict) and command_params.get("name"):
+            return "task:%s" % command_params["name"]
+        return command_name
+
     @staticmethod
     def _get_command_name_and_params(command_data):
         if isinstance(command_data, dict):
@@ -380,6 +455,7 @@ class ScriptInterpreter(GObject.Object, CommandsMixin):
         else:
             status = self.installer.script.get("install_complete_text") or _("Installation completed!")
         AsyncCall(download_lutris_media, None, self.installer.game_slug)
+        self.metrics.save_report()
         self.interpreter_ui_delegate.report_finished(game_id, status)
 
     def cleanup(self):
@@ -0,0 +1,110 @@
+"""Measures of the installer commands, to find out which steps make installs slow"""
+
+import json
+import os
+import resource
+import time
+
+from lutris import settings
+from lutris.util.log import logger
+
+INSTALL_METRICS_PATH = os.path.join(settings.CACHE_DIR, "install-metrics.json")
+
+# Reports of the installs older than this many are dropped
+MAX_REPORTS = 50
+
+
+def get_children_cpu_time():
+    """Return the CPU time used by the child processes that have exited so far"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class InstallMetrics:
+    """Records, for each installer command run, its wall time, the CPU time of the
+    processes it ran and the bytes it copied or extracted.
+
+    The CPU time is that of the child processes that exited while the command ran,
+    like the processes doing extractions; processes left running, like wineserver,
+    are not counted. Commands waiting for the user, like input menus, include that
+    time in their wall time."""
+
+    def __init__(self, game_slug, installer_slug=None):
+        self.game_slug = game_slug
+        self.installer_slug = installer_slug
+        self.started_at = time.time()
+        self.commands = []
+        self.current = None  # The entry of the command running, if any
+        self._start_time = 0.0
+        self._start_cpu_time = 0.0
+
+    def start_command(self, index, name):
+        self.finish_command()
+        self.current = {
+            "index": index,
+            "command": name,
+            "wall_time": 0.0,
+            "cpu_time": 0.0,
+            "bytes_copied": 0,
+            "bytes_extracted": 0,
+            "status": "running",
+        }
+        self._start_time = time.monotonic()
+        self._start_cpu_time = get_children_cpu_time()
+
+    def finish_command(self, error=None):
+        """Complete the measures of the command running, if any"""
+        if not self.current:
+            return
+        self.current["wall_time"] = round(time.monotonic() - self._start_time, 3)
+        self.current["cpu_time"] = round(get_children_cpu_time() - self._start_cpu_time, 3)
+        self.current["status"] = "failed" if error else "completed"
+        self.commands.append(self.current)
+        self.current = None
+
+    def add_bytes_copied(self, byte_count):
+        if self.current and byte_count:
+            self.current["bytes_copied"] += byte_count
+
+    def add_bytes_extracted(self, byte_count):
+        if self.current and byte_count:
+            self.current["bytes_extracted"] += byte_count
+
+    def get_report(self):
+        """Return the measures of the install so far, as a dict that can be saved as JSON"""
+        commands = list(self.commands)
+        return {
+            "game_slug": self.game_slug,
+            "installer_slug": self.installer_slug,
+            "started_at": round(self.started_at),
+            "wall_time": round(time.time() - self.started_at, 3),
+            "commands_wall_time": round(sum(command["wall_time"] for command in commands), 3),
+            "cpu_time": round(sum(command["cpu_time"] for command in commands), 3),
+            "bytes_copied": sum(command["bytes_copied"] for command in commands),
+            "bytes_extracted": sum(command["bytes_extracted"] for command in commands),
+            "commands": commands,
+        }
+
+    def save_report(self):
+        """Log the report as JSON, and add it to the reports of the last installs"""
+        self.finish_command()
+        report = self.get_report()
+        logger.info("Installer commands report: %s", json.dumps(report))
+        reports = read_reports()
+        reports.append(report)
+        try:
+            with open(INSTALL_METRICS_PATH, "w", encoding="utf-8") as metrics_file:
+                json.dump(reports[-MAX_REPORTS:], metrics_file, indent=2)
+        except OSError as ex:
+            logger.warning("Unable to save the installer commands report: %s", ex)
+        return report
+
+
+def read_reports():
+    """Return the reports of the last installs, oldest first"""
+    try:
+        with open(INSTALL_METRICS_PATH, encoding="utf-8") as metrics_file:
+            reports = json.load(metrics_file)
+    except (OSError, json.JSONDecodeError):
+        return []
+    return reports if isinstance(reports, list) else []
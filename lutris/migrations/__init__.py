@@ -1,6 +1,7 @@
 import importlib
 
 from lutris import settings
+from lutris.database.catalogue import CATALOGUE
 from lutris.util.log import logger
 
 MIGRATION_VERSION = 16  # Never decrease this number
@@ -39,5 +40,7 @@ def migrate():
             logger.info("Running migration: %s", migration_name)
             migration = get_migration_module(migration_name)
             migration.migrate()
+    # Migrations may have written to the games table directly
+    CATALOGUE.invalidate()
 
     settings.write_setting("migration_version", MIGRATION_VERSION)
@@ -12,6 +12,7 @@ from lutris.config import LutrisConfig
 from lutris.exceptions import GameConfigError, MissingBiosError, MissingGameExecutableError, UnspecifiedVersionError
 from lutris.runners.runner import Runner
 from lutris.util import system
+from lutris.util.http import get_session
 from lutris.util.libretro import RetroConfig
 from lutris.util.log import logger
 from lutris.util.retroarch.firmware import get_firmware, scan_firmware_directory
@@ -31,7 +32,9 @@ def get_libretro_cores():
     # Get core identifiers from info dir
     info_path = os.path.join(RETROARCH_DIR, "info")
     if not os.path.exists(info_path):
-        req = requests.get("http://buildbot.libretro.com/assets/frontend/info.zip", allow_redirects=True, timeout=5)
+        req = get_session().get(
+            "http://buildbot.libretro.com/assets/frontend/info.zip", allow_redirects=True, timeout=5
+        )
         if req.status_code == requests.codes.ok:  # pylint: disable=no-member
             with open(os.path.join(RETROARCH_DIR, "info.zip"), "wb") as info_zip:
                 info_zip.write(req.content)
@@ -24,7 +24,7 @@ def write_mame_xml(force=False):
     logger.info("Writing full game list from MAME to %s", MAME_XML_PATH)
     mame_inst = mame()
     mame_inst.write_xml_list()
-    if system.get_disk_size(MAME_XML_PATH) == 0:
+    if not system.path_exists(MAME_XML_PATH, exclude_empty=True):
         logger.warning("MAME did not write anything to %s", MAME_XML_PATH)
         return False
     return True
@@ -1,8 +1,11 @@
 import copy
+import json
+import threading
 import time
-from typing import Any, Callable, Optional, Set
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, List, Optional, Set, Tuple
 
-from lutris.database import games
+from lutris.database import fulltext, games
 from lutris.database.categories import (
     get_game_ids_for_categories,
     get_uncategorized_game_ids,
@@ -15,11 +18,13 @@ from lutris.search_predicate import (
     TRUE_PREDICATE,
     AndPredicate,
     FlagPredicate,
+    FullTextPredicate,
     FunctionPredicate,
     MatchPredicate,
     NotPredicate,
     OrPredicate,
     SearchPredicate,
+    SQLCondition,
     TextPredicate,
 )
 from lutris.services import SERVICES
@@ -54,7 +59,7 @@ class BaseSearch:
 
     @property
     def is_empty(self) -> bool:
-        return not self.text and not self.predicate
+        return (not self.text and not self.predicate) or self.predicate is TRUE_PREDICATE
 
     def matches(self, candidate: Any) -> bool:
         return self.get_predicate().accept(candidate)
@@ -162,6 +167,20 @@ class BaseSearch:
 
         return None
 
+    def split_sql(self) -> Tuple[Optional[SQLCondition], "BaseSearch"]:
+        """Splits the search into a SQL condition, for the parts that can be translated,
+        and a search for the remaining parts that must be tested in Python. The condition
+        is None if nothing could be translated."""
+        condition, remainder = self.get_predicate().split_sql()
+        remaining_search = copy.copy(self)
+        remaining_search.predicate = remainder
+        return condition, remaining_search
+
+    def narrows(self, other: "BaseSearch") -> bool:
+        """True if everything this search matches is also matched by 'other', as when this
+        search's text just extends the text of 'other'."""
+        return self.get_predicate().narrows(other.get_predicate())
+
     def with_predicate(self, predicate: SearchPredicate):
         old_predicate = self.get_predicate()  # force generation of predicate
         new_search = copy.copy(self)
@@ -200,6 +219,44 @@ class BaseSearch:
         return f'"{text}"'
 
 
+class SearchResultCache:
+    """Remembers which candidates matched recent searches over a fixed list of candidates.
+
+    A search that narrows an earlier one, like one typed by extending the earlier text,
+    is tested only against the results of that earlier search, and a search that was
+    already done, like one reached by deleting what was just typed, costs nothing.
+    The candidates must not change; make a new cache when they do."""
+
+    def __init__(self, candidates: List[Any], max_searches: int = 32) -> None:
+        self.candidates = candidates
+        self.max_searches = max_searches
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[Hashable, Tuple[SearchPredicate, List[Any]]]" = OrderedDict()
+
+    def filter(self, searches: Iterable[BaseSearch]) -> List[Any]:
+        """Returns the candidates that all the searches given match, in their original order.
+        The list returned is shared with the cache, and must not be modified."""
+        predicate = AndPredicate([search.get_predicate() for search in searches]).simplify()
+        key = predicate.get_key()
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key][1]
+
+            narrowest = self.candidates
+            for earlier_predicate, earlier_results in self._results.values():
+                if len(earlier_results) < len(narrowest) and predicate.narrows(earlier_predicate):
+                    narrowest = earlier_results
+
+        results = [candidate for candidate in narrowest if predicate.accept(candidate)]
+
+        with self._lock:
+            self._results[key] = (predicate, results)
+            while len(self._results) > self.max_searches:
+                self._results.popitem(last=False)
+        return results
+
+
 class GameSearch(BaseSearch):
     """A search for games, which applies to the games database dictionaries, not the Game objects."""
 
@@ -220,13 +277,48 @@ class GameSearch(BaseSearch):
         ]
     )
 
-    def __init__(self, text: str, service=None) -> None:
+    def __init__(self, text: str, service=None, full_text: bool = False) -> None:
+        """If full_text is set, text is looked up in the full-text index of the games, or of
+        the service's games, so the candidates must be rows of that table."""
         self.service = service
+        self.full_text = full_text
         super().__init__(text)
 
     def get_candidate_text(self, candidate: Any) -> str:
         return candidate["name"]
 
+    def get_text_predicate(self, text: str) -> SearchPredicate:
+        if not self.full_text:
+            return super().get_text_predicate(text)
+        if self.service:
+            service_id = self.service.id
+
+            def search_function(search_text):
+                return [row["id"] for row in fulltext.search_service_games(search_text, service_id, compact=True)]
+
+        else:
+
+            def search_function(search_text):
+                return [row["id"] for row in fulltext.search_games(search_text, compact=True)]
+
+        return FullTextPredicate(text, self.get_candidate_text, search_function)
+
+    def get_sql(self, clause: str, *params: Any) -> Optional[SQLCondition]:
+        """Returns a SQL condition on the games table, or None for searches of a service,
+        whose candidates are not rows of the games table."""
+        if self.service:
+            return None
+        return clause, list(params)
+
+    def get_value_list_sql(self, column: str, values: Iterable[Any]) -> Optional[SQLCondition]:
+        """Returns a SQL condition testing that column has one of the values given."""
+        return self.get_sql(f"IFNULL({column} IN (SELECT value FROM json_each(?)), 0)", json.dumps(list(values)))
+
+    @staticmethod
+    def get_matching_values(column: str, values: Iterable[Any], match_function: Callable) -> List[Any]:
+        """Returns the values for which a game having that value in column would match."""
+        return [value for value in values if match_function({column: value})]
+
     def get_part_predicate(self, name: str, tokens: TokenReader) -> SearchPredicate:
         if name == "category":
             category = tokens.get_cleaned_token() or ""
@@ -284,7 +376,7 @@ class GameSearch(BaseSearch):
         def get_game_playtime(db_game):
             return db_game.get("playtime")
 
-        return self.get_duration_predicate(get_game_playtime, tokens, tag="playtime")
+        return self.get_duration_predicate(get_game_playtime, tokens, tag="playtime", sql_value=("playtime", []))
 
     def get_lastplayed_predicate(self, tokens: TokenReader) -> SearchPredicate:
         now = time.time()
@@ -295,9 +387,23 @@ class GameSearch(BaseSearch):
                 return (now - lastplayed) / (60 * 60)
             return None
 
-        return self.get_duration_predicate(get_game_lastplayed_duration_ago, tokens, tag="lastplayed")
+        return self.get_duration_predicate(
+            get_game_lastplayed_duration_ago,
+            tokens,
+            tag="lastplayed",
+            sql_value=("CASE WHEN lastplayed THEN (? - lastplayed) / 3600.0 END", [now]),
+        )
+
+    def get_duration_predicate(
+        self,
+        value_function: Callable,
+        tokens: TokenReader,
+        tag: str,
+        sql_value: Optional[SQLCondition] = None,
+    ) -> SearchPredicate:
+        """Returns a predicate comparing a duration in hours; sql_value is the SQL expression
+        computing the same value as value_function, if there is one."""
 
-    def get_duration_predicate(self, value_function: Callable, tokens: TokenReader, tag: str) -> SearchPredicate:
         def match_greater_playtime(db_game):
             game_playtime = value_function(db_game)
             return game_playtime and game_playtime > duration
@@ -337,22 +443,39 @@ class GameSearch(BaseSearch):
         except ValueError as ex:
             raise InvalidSearchTermError(f"'{duration_text}' is not a valid playtime.") from ex
 
+        sql = None
+        if sql_value and operator in ("<", ">"):
+            # Exact matches round the duration in ways we leave to Python
+            expression, expression_params = sql_value
+            sql = self.get_sql(
+                f"IFNULL({expression}, 0) != 0 AND {expression} {operator} ?",
+                *expression_params,
+                *expression_params,
+                duration,
+            )
+
         text = f"{tag}:{operator}{get_formatted_playtime(duration)}"
-        return FunctionPredicate(matcher, text)
+        return FunctionPredicate(matcher, text, sql=sql)
 
     def get_directory_predicate(self, directory: str) -> SearchPredicate:
         return TextPredicate(directory, lambda c: c.get("directory"), tag="directory")
 
     def get_installed_predicate(self, installed: Optional[bool]) -> SearchPredicate:
         if self.service:
+            installed_appids = games.get_service_games(self.service.id)
 
             def is_installed(db_game):
                 appid = db_game.get("appid")
-                return bool(appid and appid in games.get_service_games(self.service.id))
+                return bool(appid and appid in installed_appids)
 
             return FlagPredicate(installed, is_installed, tag="installed")
 
-        return FlagPredicate(installed, lambda db_game: bool(db_game["installed"]), tag="installed")
+        return FlagPredicate(
+            installed,
+            lambda db_game: bool(db_game["installed"]),
+            tag="installed",
+            sql=self.get_sql("IFNULL(installed, 0) != 0"),
+        )
 
     def get_categorized_predicate(self, categorized: Optional[bool]) -> SearchPredicate:
         uncategorized_ids = get_uncategorized_game_ids()
@@ -360,7 +483,9 @@ class GameSearch(BaseSearch):
         def is_categorized(db_game):
             return db_game["id"] not in uncategorized_ids
 
-        return FlagPredicate(categorized, is_categorized, tag="categorized")
+        uncategorized_sql = self.get_value_list_sql("id", sorted(uncategorized_ids))
+        sql = ("NOT (%s)" % uncategorized_sql[0], uncategorized_sql[1]) if uncategorized_sql else None
+        return FlagPredicate(categorized, is_categorized, tag="categorized", sql=sql)
 
     def get_category_predicate(self, category: str) -> SearchPredicate:
         names = normalized_category_names(category, subname_allowed=True)
@@ -371,7 +496,13 @@ class GameSearch(BaseSearch):
             return game_id in category_game_ids
 
         text = f"category:{self.quote_token(category)}"
-        return MatchPredicate(match_category, text=text, tag="category", value=category)
+        return MatchPredicate(
+            match_category,
+            text=text,
+            tag="category",
+            value=category,
+            sql=self.get_value_list_sql("id", sorted(category_game_ids)),
+        )
 
     def get_category_flag_predicate(self, category: str, tag: str, in_category: Optional[bool] = True) -> FlagPredicate:
         names = normalized_category_names(category, subname_allowed=True)
@@ -381,7 +512,9 @@ class GameSearch(BaseSearch):
             game_id = db_game["id"]
             return game_id in category_game_ids
 
-        return FlagPredicate(in_category, is_in_category, tag=tag)
+        return FlagPredicate(
+            in_category, is_in_category, tag=tag, sql=self.get_value_list_sql("id", sorted(category_game_ids))
+        )
 
     def get_service_predicate(self, service_name: str) -> SearchPredicate:
         service_name = service_name.casefold()
@@ -415,8 +548,15 @@ class GameSearch(BaseSearch):
             runner_human_name = get_runner_human_name(game_runner)
             return runner_name in runner_human_name.casefold()
 
+        sql = None
+        if not self.service:
+            # Matching involves the runners' human names, so we find the matching runners
+            # among those in use, and have the database look for those.
+            matching_runners = self.get_matching_values("runner", games.get_used_runners(), match_runner)
+            sql = self.get_value_list_sql("runner", matching_runners)
+
         text = f"runner:{self.quote_token(runner_name)}"
-        return MatchPredicate(match_runner, text=text, tag="runner", value=runner_name)
+        return MatchPredicate(match_runner, text=text, tag="runner", value=runner_name, sql=sql)
 
     def get_platform_predicate(self, platform: str) -> SearchPredicate:
         folded_platform = platform.casefold()
@@ -431,8 +571,14 @@ class GameSearch(BaseSearch):
                 return any(matches)
             return False
 
+        sql = None
+        if not self.service:
+            used_platforms = games.get_used_platforms()
+            matching_platforms = self.get_matching_values("platform", used_platforms, match_platform)
+            sql = self.get_value_list_sql("platform", matching_platforms)
+
         text = f"platform:{self.quote_token(platform)}"
-        return MatchPredicate(match_platform, text=text, tag="platform", value=platform)
+        return MatchPredicate(match_platform, text=text, tag="platform", value=platform, sql=sql)
 
 
 class RunnerSearch(BaseSearch):
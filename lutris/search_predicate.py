@@ -1,10 +1,16 @@
+import re
 from abc import ABC, abstractmethod
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
 
 from lutris.util.strings import strip_accents
 
 FLAG_TEXTS: Dict[str, Optional[bool]] = {"true": True, "yes": True, "false": False, "no": False}
 
+# A SQL boolean expression and its parameters; the expression must never evaluate to NULL
+SQLCondition = Tuple[str, List[Any]]
+
+WORD_RE = re.compile(r"\w+")
+
 
 def format_flag(flag: Optional[bool]) -> str:
     return "yes" if flag else "no"
@@ -55,6 +61,43 @@ class SearchPredicate(ABC):
         predicate; this may be in parentheses where __str__ would not be."""
         return str(self)
 
+    def get_sql(self) -> Optional[SQLCondition]:
+        """Returns a SQL condition that selects the same rows this predicate accepts,
+        or None if this predicate can't be translated to SQL."""
+        return None
+
+    def split_sql(self) -> Tuple[Optional[SQLCondition], "SearchPredicate"]:
+        """Splits this predicate into a SQL condition and a remaining predicate
+        to test in Python; a candidate matches if it satisfies both. Either may be
+        None or TRUE_PREDICATE if there's nothing to test there."""
+        condition = self.get_sql()
+        if condition:
+            return condition, TRUE_PREDICATE
+        return None, self
+
+    def get_key(self) -> Hashable:
+        """Returns a key that is equal for predicates written the same way, apart from
+        the case or accents of text or the order of terms; such predicates match the same
+        candidates."""
+        return type(self).__name__, str(self)
+
+    def narrows(self, other: "SearchPredicate") -> bool:
+        """True if every candidate this predicate accepts is also accepted by 'other', so that
+        the candidates matching this predicate can be found among those matching 'other'. This
+        can return False when it can't tell."""
+        if other is TRUE_PREDICATE or other is self:
+            return True
+        if isinstance(other, AndPredicate):
+            return all(self.narrows(c) for c in other.components)
+        if isinstance(other, OrPredicate) and any(self.narrows(c) for c in other.components):
+            return True
+        return self.narrows_component(other)
+
+    def narrows_component(self, other: "SearchPredicate") -> bool:
+        """Implements narrows() for an 'other' that is not an AND or OR of other predicates;
+        by default a predicate narrows only one that is just like it."""
+        return type(self) is type(other) and str(self) == str(other)
+
     @abstractmethod
     def __str__(self) -> str:
         pass
@@ -63,13 +106,17 @@ class SearchPredicate(ABC):
 class FunctionPredicate(SearchPredicate):
     """This is a generate predicate that wraps a function to perform the test."""
 
-    def __init__(self, predicate: Callable[[Any], bool], text: str) -> None:
+    def __init__(self, predicate: Callable[[Any], bool], text: str, sql: Optional[SQLCondition] = None) -> None:
         self.predicate = predicate
         self.text = text
+        self.sql = sql
 
     def accept(self, candidate: Any) -> bool:
         return self.predicate(candidate)
 
+    def get_sql(self) -> Optional[SQLCondition]:
+        return self.sql
+
     def __str__(self):
         return self.text
 
@@ -79,8 +126,15 @@ class MatchPredicate(FunctionPredicate):
     a function to do the test, but the object records the tag and value explicitly for editing
     purposes."""
 
-    def __init__(self, predicate: Callable[[Any], bool], text: str, tag: str, value: str) -> None:
-        super().__init__(predicate, text)
+    def __init__(
+        self,
+        predicate: Callable[[Any], bool],
+        text: str,
+        tag: str,
+        value: str,
+        sql: Optional[SQLCondition] = None,
+    ) -> None:
+        super().__init__(predicate, text, sql=sql)
         self.tag = tag
         self.value = value
 
@@ -98,16 +152,33 @@ class FlagPredicate(SearchPredicate):
     """This is a predicate to match a boolean property. This odd setting is useful to override
     the default filtering Lutris provides, like filtering out hidden games."""
 
-    def __init__(self, flag: Optional[bool], flag_function: Callable[[Any], bool], tag: str):
+    def __init__(
+        self,
+        flag: Optional[bool],
+        flag_function: Callable[[Any], bool],
+        tag: str,
+        sql: Optional[SQLCondition] = None,
+    ):
         self.flag = flag
         self.flag_function = flag_function
         self.tag = tag
+        self.sql = sql  # condition for the flag being set
 
     def accept(self, candidate: Any) -> bool:
         if self.flag is None:
             return True
         return self.flag == self.flag_function(candidate)
 
+    def get_sql(self) -> Optional[SQLCondition]:
+        if self.flag is None:
+            return "1", []
+        if not self.sql:
+            return None
+        if self.flag:
+            return self.sql
+        clause, params = self.sql
+        return f"NOT ({clause})", params
+
     def without_flag(self, tag: str) -> "SearchPredicate":
         return TRUE_PREDICATE if self.tag == tag else self
 
@@ -139,12 +210,49 @@ class TextPredicate(SearchPredicate):
         candidate_text = strip_accents(candidate_text).casefold()
         return bool(candidate_text and self.stripped_text in candidate_text)
 
+    def get_key(self) -> Hashable:
+        return type(self).__name__, self.tag, self.stripped_text
+
+    def narrows_component(self, other: SearchPredicate) -> bool:
+        # Text containing "quake" surely contains "qua" too
+        if isinstance(other, TextPredicate):
+            return self.tag == other.tag and other.stripped_text in self.stripped_text
+        return False
+
     def __str__(self):
         if self.tag:
             return f"{self.tag}:{self.match_text}"
         return self.match_text
 
 
+class FullTextPredicate(TextPredicate):
+    """This is a text predicate that accepts the candidates a full-text search of the
+    database finds; 'search_function' does the search and returns the IDs of the rows
+    found. Each word of the text must start a word of the candidate's name."""
+
+    def __init__(self, match_text: str, text_function: Callable[[Any], Optional[str]], search_function: Callable):
+        super().__init__(match_text, text_function, tag="")
+        self.search_function = search_function
+        self.words = WORD_RE.findall(match_text.casefold())
+        self._matching_ids: Optional[FrozenSet[Any]] = None
+
+    def accept(self, candidate: Any) -> bool:
+        # The search is done once, when first needed
+        if self._matching_ids is None:
+            self._matching_ids = frozenset(self.search_function(self.match_text))
+        return candidate.get("id") in self._matching_ids
+
+    def get_key(self) -> Hashable:
+        # Without a full-text index, the search can be sensitive to accents
+        return type(self).__name__, self.match_text.casefold()
+
+    def narrows_component(self, other: SearchPredicate) -> bool:
+        # A word starting with "quake" surely starts with "qua" too
+        if isinstance(other, FullTextPredicate):
+            return all(any(word.startswith(other_word) for word in self.words) for other_word in other.words)
+        return False
+
+
 class NotPredicate(SearchPredicate):
     """This predicate reverses the effect of another, and also 'hides' it from
     editing methods."""
@@ -155,6 +263,16 @@ class NotPredicate(SearchPredicate):
     def accept(self, candidate: Any) -> bool:
         return not self.to_negate.accept(candidate)
 
+    def get_sql(self) -> Optional[SQLCondition]:
+        condition = self.to_negate.get_sql()
+        if not condition:
+            return None
+        clause, params = condition
+        return f"NOT ({clause})", params
+
+    def get_key(self) -> Hashable:
+        return type(self).__name__, self.to_negate.get_key()
+
     def to_child_text(self) -> str:
         return f"(-{self.to_negate.to_child_text()})"
 
@@ -175,6 +293,34 @@ class AndPredicate(SearchPredicate):
                 return False
         return True
 
+    def get_sql(self) -> Optional[SQLCondition]:
+        condition, remainder = self.split_sql()
+        if remainder != TRUE_PREDICATE:
+            return None
+        return condition or ("1", [])
+
+    def split_sql(self) -> Tuple[Optional[SQLCondition], "SearchPredicate"]:
+        clauses = []
+        params: List[Any] = []
+        remaining = []
+        for c in self.components:
+            condition, remainder = c.split_sql()
+            if condition:
+                clauses.append(f"({condition[0]})")
+                params += condition[1]
+            if remainder != TRUE_PREDICATE:
+                remaining.append(remainder)
+        sql = (" AND ".join(clauses), params) if clauses else None
+        if not remaining:
+            return sql, TRUE_PREDICATE
+        return sql, remaining[0] if len(remaining) == 1 else AndPredicate(remaining)
+
+    def get_key(self) -> Hashable:
+        return type(self).__name__, frozenset(c.get_key() for c in self.components)
+
+    def narrows_component(self, other: SearchPredicate) -> bool:
+        return any(c.narrows(other) for c in self.components)
+
     def simplify(self) -> "SearchPredicate":
         simplified = []
         for c in self.components:
@@ -245,6 +391,25 @@ class OrPredicate(SearchPredicate):
                 return True
         return False
 
+    def get_sql(self) -> Optional[SQLCondition]:
+        if not self.components:
+            return "0", []
+        clauses = []
+        params: List[Any] = []
+        for c in self.components:
+            condition = c.get_sql()
+            if not condition:
+                return None
+            clauses.append(f"({condition[0]})")
+            params += condition[1]
+        return " OR ".join(clauses), params
+
+    def get_key(self) -> Hashable:
+        return type(self).__name__, frozenset(c.get_key() for c in self.components)
+
+    def narrows_component(self, other: SearchPredicate) -> bool:
+        return all(c.narrows(other) for c in self.components)
+
     def simplify(self) -> "SearchPredicate":
         simplified = []
         for c in self.components:
@@ -270,6 +435,9 @@ class TruePredicate(SearchPredicate):
     def accept(self, candidate: Any) -> bool:
         return True
 
+    def get_sql(self) -> Optional[SQLCondition]:
+        return "1", []
+
     def __str__(self):
         return ""
 
@@ -12,15 +12,16 @@ from lutris import api, settings
 from lutris.api import get_game_installers
 from lutris.config import write_game_config
 from lutris.database import sql
-from lutris.database.games import add_game, get_game_by_field, get_game_for_service, get_games
+from lutris.database.games import add_game, get_game_by_field, get_game_for_service, get_games, update_game
 from lutris.database.services import ServiceGameCollection
 from lutris.game import GAME_UPDATED, Game
 from lutris.gui.dialogs import NoticeDialog
 from lutris.gui.dialogs.webconnect_dialog import WebConnectDialog
-from lutris.gui.views.media_loader import download_media
+from lutris.gui.views.media_loader import download_all_media
 from lutris.gui.widgets import NotificationSource
 from lutris.gui.widgets.utils import BANNER_SIZE, ICON_SIZE
-from lutris.services.service_media import ServiceMedia
+from lutris.services.service_game import sync_service_library
+from lutris.services.service_media import ServiceMedia, get_media_urls
 from lutris.util import system
 from lutris.util.busy import BusyAsyncCall
 from lutris.util.cookies import WebkitCookieJar
@@ -143,8 +144,10 @@ class BaseService:
             try:
                 self.is_loading = True
 
-                self.wipe_game_cache()
-                self.load()
+                self.delete_cached_library()
+                # The stored games are replaced once the whole library is loaded
+                with sync_service_library(self.id):
+                    self.load()
                 self.load_icons()
                 self.add_installed_games()
                 logger.debug("'%s' games reloaded", self.name)
@@ -171,15 +174,19 @@ class BaseService:
         service_medias = [media_type() for media_type in all_medias.values()]
 
         # Download icons
-        for service_media in service_medias:
-            media_urls = service_media.get_media_urls()
-            download_media(media_urls, service_media)
+        media_urls = get_media_urls(service_medias)
+        download_all_media([(service_media, media_urls[service_media]) for service_media in service_medias])
 
         # Process icons
         for service_media in service_medias:
             service_media.render()
 
+    def delete_cached_library(self):
+        """Delete the copy of the library the service may keep, so it is fetched again"""
+
     def wipe_game_cache(self):
+        """Wipe the game cache, allowing it to be reloaded"""
+        self.delete_cached_library()
         logger.debug("Deleting games from service-games for %s", self.id)
         sql.db_delete(settings.DB_PATH, "service_games", "service", self.id)
 
@@ -238,12 +245,7 @@ class BaseService:
         )
         for game in unmatched_lutris_games:
             logger.debug("Updating unmatched game %s", game)
-            sql.db_update(
-                settings.DB_PATH,
-                "games",
-                {"service": self.id, "service_id": service_game["appid"]},
-                conditions={"id": game["id"]},
-            )
+            update_game(game["id"], service=self.id, service_id=service_game["appid"])
 
     def match_games(self):
         """Matching of service games to lutris games"""
@@ -488,15 +490,13 @@ class OnlineService(BaseService):
             return False
         return all(system.path_exists(path) for path in self.credential_files)
 
-    def wipe_game_cache(self):
-        """Wipe the game cache, allowing it to be reloaded"""
+    def delete_cached_library(self):
         if self.cache_path:
             logger.debug("Deleting %s cache %s", self.id, self.cache_path)
             if os.path.isdir(self.cache_path):
                 shutil.rmtree(self.cache_path)
             elif system.path_exists(self.cache_path):
                 os.remove(self.cache_path)
-        super().wipe_game_cache()
 
     def logout(self):
         """Disconnect from the service by removing all credentials"""
@@ -6,14 +6,13 @@ from gettext import gettext as _
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-import requests
-
 from lutris import settings
 from lutris.exceptions import MissingExecutableError
 from lutris.services.base import BaseService
 from lutris.services.service_game import ServiceGame
 from lutris.services.service_media import ServiceMedia
 from lutris.util import system
+from lutris.util.http import get_session
 from lutris.util.log import logger
 from lutris.util.strings import slugify
 
@@ -67,12 +66,10 @@ class FlathubService(BaseService):
     runner = "flatpak"
     game_class = FlathubGame
 
-    def wipe_game_cache(self):
-        """Wipe the game cache, allowing it to be reloaded"""
+    def delete_cached_library(self):
         if system.path_exists(self.cache_path):
             logger.debug("Deleting %s cache %s", self.id, self.cache_path)
             os.remove(self.cache_path)
-        super().wipe_game_cache()
 
     def get_flatpak_cmd(self):
         flatpak_abspath = shutil.which("flatpak")
@@ -85,7 +82,7 @@ class FlathubService(BaseService):
 
     def load(self):
         """Load the available games from Flathub"""
-        response = requests.get(self.api_url, timeout=5)
+        response = get_session().get(self.api_url, timeout=5)
         response.raise_for_status()
         json = response.json()
         entries = json.get("hits") or []
@@ -20,14 +20,18 @@ from lutris.runners import get_runner_human_name
 from lutris.services.base import SERVICE_LOGIN, OnlineService
 from lutris.services.service_game import ServiceGame
 from lutris.services.service_media import ServiceMedia
-from lutris.util import i18n, system
-from lutris.util.http import HTTPError, Request, UnauthorizedAccessError
+from lutris.util import i18n
+from lutris.util.http import HTTPError, Request, UnauthorizedAccessError, fetch_pages
+from lutris.util.http_cache import RESPONSE_CACHE, get_cache_ttl
 from lutris.util.log import logger
 from lutris.util.strings import human_size, slugify
 
 if typing.TYPE_CHECKING:
     from lutris.installer.installer import LutrisInstaller
 
+# Times a GOG request is retried when rate limited or when the server fails
+API_RETRIES = 3
+
 
 class GogSmallBanner(ServiceMedia):
     """Small size game logo"""
@@ -71,6 +75,24 @@ class GOGGame(ServiceGame):
         service_game.details = json.dumps(gog_game)
         return service_game
 
+    @staticmethod
+    def get_platforms(details: Dict[str, Any]) -> List[str]:
+        works_on = details.get("worksOn")
+        if works_on is not None:
+            return [name for name, works in works_on.items() if works]
+        return []
+
+    @staticmethod
+    def get_release_date(details: Dict[str, Any]) -> str:
+        release_date = details.get("releaseDate")
+        if release_date is not None:
+            date = release_date.get("date")
+            # GoG stores unknown release dates as a negative date
+            if date is not None and isinstance(date, str) and date[0] != "-":
+                # Return as YYYY-MM-DD
+                return date[:10]
+        return ""
+
 
 class GOGService(OnlineService):
     """Service class for GOG"""
@@ -93,6 +115,7 @@ class GOGService(OnlineService):
     login_success_url = "https://www.gog.com/on_login_success"
     cookies_path = os.path.join(settings.CACHE_DIR, ".gog.auth")
     token_path = os.path.join(settings.CACHE_DIR, ".gog.token")
+    # The library is kept in the API response cache now; older versions stored it there
     cache_path = os.path.join(settings.CACHE_DIR, "gog-library.json")
 
     runner_to_os_dict = {"wine": "windows", "linux": "linux"}
@@ -147,11 +170,19 @@ class GOGService(OnlineService):
             logger.error("User not connected to GOG")
             return []
         games = [GOGGame.new_from_gog_game(game) for game in self.get_library()]
-        for game in games:
-            game.save()
+        GOGGame.save_all(games)
         self.match_games()
         return games
 
+    def delete_cached_library(self) -> None:
+        super().delete_cached_library()
+        # Unchanged pages won't be sent again, thanks to conditional requests
+        RESPONSE_CACHE.expire(self.get_cache_scope())
+
+    def logout(self) -> None:
+        RESPONSE_CACHE.clear(self.get_cache_scope())
+        super().logout()
+
     def login_callback(self, url) -> None:
         return self.request_token(url)
 
@@ -215,25 +246,37 @@ class GOGService(OnlineService):
         token_modified = token_stat.st_mtime
         return time.time() - token_modified
 
-    def make_request(self, url: str) -> Any:
-        """Send a cookie authenticated HTTP request to GOG"""
-        request = Request(url, cookies=self.load_cookies())
-        request.get()
-        if request.content.startswith(b"<"):
+    def get_cache_scope(self) -> str:
+        """Return the scope of the cached responses of GOG: the account logged in"""
+        try:
+            return "gog:%s" % self.load_token().get("user_id", "")
+        except AuthenticationError:
+            return "gog"
+
+    @staticmethod
+    def _check_response(content: bytes) -> None:
+        if content.startswith(b"<"):
             raise AuthenticationError("Token expired, please log in again")
-        return request.json
 
-    def make_api_request(self, url: str) -> Any:
-        """Send a token authenticated request to GOG"""
+    def make_request(self, url: str, ttl: int = 0) -> Any:
+        """Send a cookie authenticated HTTP request to GOG; the response is cached for
+        ttl seconds, if given"""
+        request = Request(url, cookies=self.load_cookies(), retries=API_RETRIES)
+        content = RESPONSE_CACHE.get(request, self.get_cache_scope(), ttl, validate=self._check_response)
+        return json.loads(content) if content else {}
+
+    def make_api_request(self, url: str, ttl: int = 0) -> Any:
+        """Send a token authenticated request to GOG; the response is cached for
+        ttl seconds, if given"""
         token = self.load_token()
 
         if self.get_token_age() > 2600:
             self.request_token(refresh_token=token["refresh_token"])
             token = self.load_token()
         headers = {"Authorization": "Bearer " + token["access_token"]}
-        request = Request(url, headers=headers, cookies=self.load_cookies())
-        request.get()
-        return request.json
+        request = Request(url, headers=headers, cookies=self.load_cookies(), retries=API_RETRIES)
+        content = RESPONSE_CACHE.get(request, self.get_cache_scope(), ttl)
+        return json.loads(content) if content else {}
 
     def get_user_data(self) -> dict:
         """Return GOG profile information"""
@@ -242,21 +285,12 @@ class GOGService(OnlineService):
 
     def get_library(self) -> List[dict]:
         """Return the user's library of GOG games"""
-        if system.path_exists(self.cache_path):
-            logger.debug("Returning cached GOG library")
-            with open(self.cache_path, "r", encoding="utf-8") as gog_cache:
-                return json.load(gog_cache)
-
-        total_pages = 1
+        first_page = self.get_products_page(page=1)
+        # The other pages can be fetched all at once, now that we know how many there are
+        other_pages = fetch_pages(self.get_products_page, first_page=2, last_page=first_page["totalPages"])
         games = []
-        page = 1
-        while page <= total_pages:
-            products_response = self.get_products_page(page=page)
-            page += 1
-            total_pages = products_response["totalPages"]
+        for products_response in [first_page] + other_pages:
             games += products_response["products"]
-        with open(self.cache_path, "w", encoding="utf-8") as gog_cache:
-            json.dump(games, gog_cache)
         return games
 
     def get_service_game(self, gog_game: dict) -> GOGGame:
@@ -272,7 +306,7 @@ class GOGService(OnlineService):
         if search:
             params["search"] = search
         url = self.embed_url + "/account/getFilteredProducts?" + urlencode(params)
-        return self.make_request(url)
+        return self.make_request(url, ttl=get_cache_ttl("library"))
 
     def get_game_dlcs(self, product_id: str) -> List[dict]:
         """Return the list of DLC products for a game"""
@@ -280,7 +314,7 @@ class GOGService(OnlineService):
         if not game_details["dlcs"]:
             return []
         all_products_url = game_details["dlcs"]["expanded_all_products_url"]
-        return self.make_api_request(all_products_url)
+        return self.make_api_request(all_products_url, ttl=get_cache_ttl("details"))
 
     def get_game_details(self, product_id: str) -> dict:
         """Return game information for a given game"""
@@ -288,7 +322,7 @@ class GOGService(OnlineService):
             raise ValueError("Missing product ID")
         logger.info("Getting game details for %s", product_id)
         url = "{}/products/{}?expand=downloads&locale={}".format(self.api_url, product_id, self.locale)
-        return self.make_api_request(url)
+        return self.make_api_request(url, ttl=get_cache_ttl("details"))
 
     def get_download_info(self, downlink: str) -> List[dict]:
         """Return file download information, a list of dict containing the 'url' and
@@ -747,21 +781,7 @@ class GOGService(OnlineService):
         return patch_installers
 
     def get_game_platforms(self, db_game: dict) -> List[str]:
-        details = db_game.get("details")
-        if details:
-            worksOn = json.loads(details).get("worksOn")
-            if worksOn is not None:
-                return [name for name, works in worksOn.items() if works]
-        return []
+        return GOGGame.get_row_platforms(db_game)
 
     def get_game_release_date(self, db_game: dict):
-        details = db_game.get("details")
-        if details:
-            release_date = json.loads(details).get("releaseDate")
-            if release_date is not None:
-                date = release_date.get("date")
-                # GoG stores unknown release dates as a negative date
-                if date is not None and isinstance(date, str) and date[0] != "-":
-                    # Return as YYYY-MM-DD
-                    return date[:10]
-        return ""
+        return GOGGame.get_row_release_date(db_game)
@@ -126,8 +126,7 @@ class HumbleBundleService(OnlineService):
                 continue
             humble_games.append(HumbleBundleGame.new_from_humble_game(game))
             seen.add(game["human_name"])
-        for game in humble_games:
-            game.save()
+        HumbleBundleGame.save_all(humble_games)
         return humble_games
 
     def make_api_request(self, url):
@@ -1,6 +1,7 @@
 """itch.io service"""
 
 import datetime
+import hashlib
 import json
 import os
 from gettext import gettext as _
@@ -21,10 +22,17 @@ from lutris.services.service_game import ServiceGame
 from lutris.services.service_media import ServiceMedia
 from lutris.util import linux
 from lutris.util.downloader import Downloader
-from lutris.util.http import HTTPError, Request, UnauthorizedAccessError
+from lutris.util.http import HTTPError, Request, UnauthorizedAccessError, fetch_pages
+from lutris.util.http_cache import RESPONSE_CACHE, get_cache_ttl
 from lutris.util.log import logger
 from lutris.util.strings import slugify
 
+# Times an itch.io request is retried when rate limited or when the server fails
+API_RETRIES = 3
+
+# Basic security; I'm pretty sure itch.io will block us before that tho
+MAX_PAGES = 65507
+
 
 class ItchIoCover(ServiceMedia):
     """itch.io game cover"""
@@ -75,6 +83,23 @@ class ItchIoGame(ServiceGame):
         service_game.details = json.dumps(igame)
         return service_game
 
+    @staticmethod
+    def get_platforms(details: Dict[str, Any]) -> List[str]:
+        runners = ItchIoService._get_detail_runners(details, fix_missing_platforms=False)
+        return [ItchIoService.platforms_by_runner[r] for r in runners]
+
+    @staticmethod
+    def get_release_date(details: Dict[str, Any]) -> str:
+        # Game Release
+        release_date = details.get("created_at")
+        if release_date is None:
+            # Last Update Release
+            release_date = details.get("published_at")
+        if release_date is not None and isinstance(release_date, str):
+            # Return as YYYY-MM-DD
+            return release_date[:10]
+        return ""
+
 
 class ItchIoService(OnlineService):
     """Service class for itch.io"""
@@ -197,24 +222,29 @@ class ItchIoService(OnlineService):
         for game in library:
             if game["title"] in seen:
                 continue
-            _game = ItchIoGame.new(game)
-            games.append(_game)
-            _game.save()
+            games.append(ItchIoGame.new(game))
             seen.add(game["title"])
+        ItchIoGame.save_all(games)
         return games
 
-    def make_api_request(self, path, query=None):
-        """Make API request"""
+    def get_cache_scope(self):
+        """Return the scope of the cached responses of itch.io: the API key in use"""
+        api_key = self.load_api_key() or ""
+        return "itchio:%s" % hashlib.sha1(api_key.encode("utf-8")).hexdigest()
+
+    def logout(self):
+        RESPONSE_CACHE.clear(self.get_cache_scope())
+        super().logout()
+
+    def make_api_request(self, path, query=None, ttl=0):
+        """Make API request; the response is cached for ttl seconds, if given"""
         url = "{}/{}".format(self.api_url, path)
         if query is not None and isinstance(query, dict):
             url += "?{}".format(urlencode(query, quote_via=quote_plus))
         try:
-            request = Request(
-                url,
-                headers=self.get_headers(),
-            )
-            request.get()
-            return request.json
+            request = Request(url, headers=self.get_headers(), retries=API_RETRIES)
+            content = RESPONSE_CACHE.get(request, self.get_cache_scope(), ttl)
+            return json.loads(content) if content else {}
         except UnauthorizedAccessError:
             # We aren't logged in, so we'll log out! This allows you to
             # log in again.
@@ -243,14 +273,14 @@ class ItchIoService(OnlineService):
 
     def fetch_game(self, game_id):
         """Do API request to get game info"""
-        return self.make_api_request(f"games/{game_id}")
+        return self.make_api_request(f"games/{game_id}", ttl=get_cache_ttl("details"))
 
     def fetch_uploads(self, game_id, dl_key):
         """Do API request to get downloadables of a game."""
         query = None
         if dl_key is not None:
             query = {"download_key_id": dl_key}
-        return self.make_api_request(f"games/{game_id}/uploads", query)
+        return self.make_api_request(f"games/{game_id}/uploads", query, ttl=get_cache_ttl("details"))
 
     def fetch_upload(self, upload, dl_key):
         """Do API request to get downloadable of a game"""
@@ -287,6 +317,13 @@ class ItchIoService(OnlineService):
             with open(key_path, "w", encoding="utf-8") as cache_file:
                 json.dump(game, cache_file)
 
+    @staticmethod
+    def _is_last_page(response, items_key):
+        """Return whether a page of results is the last one; the API doesn't say how
+        many pages there are, but the last one is not full."""
+        items = response[items_key]
+        return not isinstance(items, list) or len(items) != int(response["per_page"])
+
     def get_owned_games(self, force_load=False):
         """Get all owned library keys from itch.io"""
         owned_keys = []
@@ -297,20 +334,14 @@ class ItchIoService(OnlineService):
                 owned_keys = json.load(key_file)
             fresh_data = False
         else:
-            query = {"page": 1}
-            # Basic security; I'm pretty sure itch.io will block us before that tho
-            safety = 65507
-            while safety:
-                response = self.fetch_owned_keys(query)
+            responses = fetch_pages(
+                lambda page: self.fetch_owned_keys({"page": page}),
+                last_page=MAX_PAGES,
+                is_last_page=lambda response: self._is_last_page(response, "owned_keys"),
+            )
+            for response in responses:
                 if isinstance(response["owned_keys"], list):
                     owned_keys += response["owned_keys"]
-                    if len(response["owned_keys"]) == int(response["per_page"]):
-                        query["page"] += 1
-                    else:
-                        break
-                else:
-                    break
-                safety -= 1
 
             os.makedirs(os.path.join(self.cache_path, "profile/"), exist_ok=True)
             with open(self.key_cache_file, "w", encoding="utf-8") as key_file:
@@ -358,20 +389,16 @@ class ItchIoService(OnlineService):
             else:
                 # get the list of games in that collection
                 collection["games"] = []
-                query = {"page": 1}
-                # Basic security; I'm pretty sure itch.io will block us before that tho
-                safety = 65507
-                while safety:
-                    response = self.fetch_collection_games(collection["id"], query)
+                responses = fetch_pages(
+                    lambda page, collection_id=collection["id"]: self.fetch_collection_games(
+                        collection_id, {"page": page}
+                    ),
+                    last_page=MAX_PAGES,
+                    is_last_page=lambda response: self._is_last_page(response, "collection_games"),
+                )
+                for response in responses:
                     if isinstance(response["collection_games"], list):
                         collection["games"] += response["collection_games"]
-                        if len(response["collection_games"]) == int(response["per_page"]):
-                            query["page"] += 1
-                        else:
-                            break
-                    else:
-                        break
-                    safety -= 1
 
                 # filter out bad data for safety
                 collection["games"] = [
@@ -592,10 +619,7 @@ class ItchIoService(OnlineService):
         return runners[0] if runners else ""
 
     def get_game_platforms(self, db_game: dict) -> List[str]:
-        details = json.loads(db_game["details"])
-
-        runners = self._get_detail_runners(details, fix_missing_platforms=False)
-        return [self.platforms_by_runner[r] for r in runners]
+        return ItchIoGame.get_row_platforms(db_game)
 
     def _check_update_with_db(self, db_game, key, upload=None):
         stamp = 0
@@ -841,18 +865,7 @@ class ItchIoService(OnlineService):
         return weight
 
     def get_game_release_date(self, db_game: dict):
-        details = db_game.get("details")
-        if details:
-            details = json.loads(details)
-            # Game Release
-            release_date = details.get("created_at")
-            if release_date is None:
-                # Last Update Release
-                release_date = details.get("published_at")
-            if release_date is not None and isinstance(release_date, str):
-                # Return as YYYY-MM-DD
-                return release_date[:10]
-        return ""
+        return ItchIoGame.get_row_release_date(db_game)
 
     def _rfc3999_to_timestamp(self, _s):
         # Python does ootb not fully comply with RFC3999; Cut after seconds
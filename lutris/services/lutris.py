@@ -11,7 +11,7 @@ from lutris.database.games import get_games
 from lutris.database.services import ServiceGameCollection
 from lutris.game import Game
 from lutris.gui import dialogs
-from lutris.gui.views.media_loader import download_media
+from lutris.gui.views.media_loader import download_all_media
 from lutris.services.base import (
     SERVICE_LOGIN,
     LutrisBanner,
@@ -41,6 +41,13 @@ class LutrisGame(ServiceGame):
         service_game.details = json.dumps(api_payload)
         return service_game
 
+    @staticmethod
+    def get_platforms(details: Dict[str, Any]) -> List[str]:
+        platforms = details.get("platforms")
+        if platforms is not None:
+            return [p.get("name") for p in platforms]
+        return []
+
 
 class LutrisService(OnlineService):
     """Service for Lutris games"""
@@ -153,12 +160,7 @@ class LutrisService(OnlineService):
         return ""
 
     def get_game_platforms(self, db_game: dict) -> List[str]:
-        details = db_game.get("details")
-        if details:
-            platforms = json.loads(details).get("platforms")
-            if platforms is not None:
-                return [p.get("name") for p in platforms]
-        return []
+        return LutrisGame.get_row_platforms(db_game)
 
     def get_service_db_game(self, game: Game):
         if game.service == self.id and game.slug:
@@ -176,17 +178,13 @@ def download_lutris_media(slug):
         logger.debug("Unable to load %s: %s", slug, ex)
         return
     response_data = response.json
-    icon_url = _get_response_game_icon(response_data)
-    if icon_url:
-        download_media({slug: icon_url}, LutrisIcon())
-
-    banner_url = _get_response_game_banner(response_data)
-    if banner_url:
-        download_media({slug: banner_url}, LutrisBanner())
-
-    coverart_url = _get_response_game_coverart(response_data)
-    if coverart_url:
-        download_media({slug: coverart_url}, LutrisCoverart())
+    download_all_media(
+        [
+            (LutrisIcon(), {slug: _get_response_game_icon(response_data)}),
+            (LutrisBanner(), {slug: _get_response_game_banner(response_data)}),
+            (LutrisCoverart(), {slug: _get_response_game_coverart(response_data)}),
+        ]
+    )
 
 
 def sync_media(slugs: Iterable[str] = None) -> Dict[str, int]:
@@ -242,9 +240,7 @@ def sync_media(slugs: Iterable[str] = None) -> Dict[str, int]:
         if game["slug"] not in covers_available and _get_response_game_coverart(game)
     }
     logger.debug("Syncing %s banners, %s icons and %s covers", len(banner_urls), len(icon_urls), len(coverart_urls))
-    download_media(banner_urls, LutrisBanner())
-    download_media(icon_urls, LutrisIcon())
-    download_media(coverart_urls, LutrisCoverart())
+    download_all_media([(LutrisBanner(), banner_urls), (LutrisIcon(), icon_urls), (LutrisCoverart(), coverart_urls)])
     return {
         "banners": len(banner_urls),
         "icons": len(icon_urls),
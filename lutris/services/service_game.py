@@ -1,9 +1,41 @@
 """Service game module"""
 
+import hashlib
+import json
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
 from lutris import settings
 from lutris.database import sql
 from lutris.database.services import ServiceGameCollection
 from lutris.services.service_media import ServiceMedia
+from lutris.util.log import logger
+
+# Games saved while a service's library is synced, by service; per thread
+_library_syncs = threading.local()
+
+
+@contextmanager
+def sync_service_library(service):
+    """Collect the games of `service` saved in the block instead of writing them, then
+    make the stored games of the service match them in a single transaction. Only the
+    games added, changed or removed since the last time are written, and the library
+    is never seen empty in between. Nothing is written if the block raises."""
+    syncs = _library_syncs.__dict__.setdefault("games", {})
+    if service in syncs:
+        raise RuntimeError("The library of %s is already being synced" % service)
+    syncs[service] = {}
+    try:
+        yield
+        rows = list(syncs[service].values())
+    finally:
+        del syncs[service]
+    inserted, updated, deleted = sql.db_sync(
+        settings.DB_PATH, "service_games", rows, ("service", "appid"), {"service": service}, "content_hash"
+    )
+    logger.debug("Synced %s games: %s added, %s changed, %s removed", service, inserted, updated, deleted)
 
 
 class ServiceGame:
@@ -24,9 +56,47 @@ class ServiceGame:
         self.icon = None  # Game icon
         self.details = None  # Additional details for the game
 
-    def save(self):
-        """Save this game to database"""
-        game_data = {
+    @staticmethod
+    def get_platforms(details: Dict[str, Any]) -> List[str]:
+        """Return the names of the platforms the game runs on, from its details"""
+        return []
+
+    @staticmethod
+    def get_release_date(details: Dict[str, Any]) -> str:
+        """Return the release date of the game as YYYY-MM-DD, from its details, or an empty string"""
+        return ""
+
+    @classmethod
+    def get_row_platforms(cls, db_game: Mapping) -> List[str]:
+        """Return the platforms of a service_games row. Rows saved by older versions
+        lack the platforms column, and their details have to be parsed instead."""
+        platforms = db_game.get("platforms")
+        if platforms is not None:
+            return json.loads(platforms)
+        details = db_game.get("details")
+        return cls.get_platforms(json.loads(details)) if details else []
+
+    @classmethod
+    def get_row_release_date(cls, db_game: Mapping) -> str:
+        """Return the release date of a service_games row, like get_row_platforms()"""
+        release_date = db_game.get("release_date")
+        if release_date is not None:
+            return release_date
+        details = db_game.get("details")
+        return cls.get_release_date(json.loads(details)) if details else ""
+
+    def get_db_fields(self):
+        """Return the row stored in the service_games table for this game. The fields
+        most used out of the details are stored in columns of their own, so that they
+        needn't be parsed out of the details every time."""
+        if self.details is None or isinstance(self.details, str):
+            details_json = self.details
+        else:
+            details_json = json.dumps(self.details)
+        details = json.loads(details_json) if details_json else None
+        if not isinstance(details, dict):
+            details = {}
+        fields = {
             "service": self.service,
             "appid": self.appid,
             "name": self.name,
@@ -34,10 +104,38 @@ class ServiceGame:
             "lutris_slug": self.lutris_slug,
             "icon": self.icon,
             "logo": self.logo,
-            "details": str(self.details),
+            "details": details_json,
+            "release_date": self.get_release_date(details),
+            "platforms": json.dumps(self.get_platforms(details)),
         }
+        # Lets library syncs skip the games that haven't changed
+        fields["content_hash"] = hashlib.sha1(repr(tuple(fields.values())).encode("utf-8")).hexdigest()
+        return fields
+
+    @staticmethod
+    def _collect(game_data):
+        """Hand a game over to the sync of its service's library, if there is one
+        in progress on this thread; returns whether it did."""
+        syncs = getattr(_library_syncs, "games", None)
+        if not syncs or game_data["service"] not in syncs:
+            return False
+        syncs[game_data["service"]][str(game_data["appid"])] = game_data
+        return True
+
+    def save(self):
+        """Save this game to database"""
+        game_data = self.get_db_fields()
+        if self._collect(game_data):
+            return
         existing_game = ServiceGameCollection.get_game(self.service, self.appid)
         if existing_game:
             sql.db_update(settings.DB_PATH, "service_games", game_data, {"id": existing_game["id"]})
         else:
             sql.db_insert(settings.DB_PATH, "service_games", game_data)
+
+    @staticmethod
+    def save_all(games):
+        """Save a list of games to the database in a single transaction"""
+        rows = [game.get_db_fields() for game in games]
+        rows = [row for row in rows if not ServiceGame._collect(row)]
+        sql.db_upsert_many(settings.DB_PATH, "service_games", rows, ("service", "appid"))
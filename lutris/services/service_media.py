@@ -1,11 +1,13 @@
 import json
 import os
 import random
+import sqlite3
 import time
 from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from lutris.database.services import ServiceGameCollection
 from lutris.util import system
+from lutris.util.download_scheduler import PRIORITY_BACKGROUND
 from lutris.util.http import HTTPError, download_file
 from lutris.util.log import logger
 from lutris.util.portals import TrashPortal
@@ -128,6 +130,14 @@ class ServiceMedia:
         elif completion_function:
             completion_function()
 
+    @property
+    def json_path(self) -> Optional[str]:
+        """The JSON path of the media URL in the details of games, for SQLite to extract;
+        None if get_media_url() does more than format the api_field."""
+        if type(self).get_media_url is not ServiceMedia.get_media_url or not isinstance(self.api_field, str):
+            return None
+        return '$."%s"' % self.api_field
+
     def get_media_url(self, details: Dict[str, Any]) -> Optional[str]:
         if self.api_field not in details:
             logger.warning("No field '%s' in API game %s", self.api_field, details)
@@ -138,19 +148,7 @@ class ServiceMedia:
 
     def get_media_urls(self) -> Dict[str, str]:
         """Return URLs for icons and logos from a service"""
-        if self.source == "local":
-            return {}
-        service_games = ServiceGameCollection.get_for_service(self.service)
-        medias: Dict[str, str] = {}
-        for game in service_games:
-            if not game["details"]:
-                continue
-            details = json.loads(game["details"])
-            media_url = self.get_media_url(details)
-            if not media_url:
-                continue
-            medias[game["slug"]] = media_url
-        return medias
+        return get_media_urls([self])[self]
 
     def download(self, slug, url):
         """Downloads the banner if not present"""
@@ -166,7 +164,7 @@ class ServiceMedia:
                 return cache_path
             os.unlink(cache_path)
         try:
-            return download_file(url, cache_path, raise_errors=True)
+            return download_file(url, cache_path, raise_errors=True, priority=PRIORITY_BACKGROUND)
         except HTTPError as ex:
             logger.error("Failed to download %s: %s", url, ex)
 
@@ -186,3 +184,41 @@ class ServiceMedia:
 
     def render(self):
         """Used if the media requires extra processing"""
+
+
+def get_media_urls(service_medias: Iterable[ServiceMedia]) -> Dict[ServiceMedia, Dict[str, str]]:
+    """Return the URLs of the media of each of service_medias, by game slug. The games
+    of each service are read only once for all its medias. Media URLs that are a field
+    of the details are extracted by SQLite; the details are parsed, once per game, only
+    for medias that need more than that."""
+    media_urls: Dict[ServiceMedia, Dict[str, str]] = {}
+    medias_by_service: Dict[str, List[ServiceMedia]] = {}
+    for service_media in service_medias:
+        media_urls[service_media] = {}
+        if service_media.source != "local":
+            medias_by_service.setdefault(service_media.service, []).append(service_media)
+    for service, medias in medias_by_service.items():
+        json_medias = [service_media for service_media in medias if service_media.json_path]
+        if json_medias:
+            try:
+                rows = ServiceGameCollection.get_details_values(service, [media.json_path for media in json_medias])
+            except sqlite3.OperationalError as ex:
+                logger.warning("Unable to extract media URLs with SQLite: %s", ex)
+            else:
+                for slug, *values in rows:
+                    for service_media, value in zip(json_medias, values):
+                        if value:
+                            media_urls[service_media][slug] = service_media.url_pattern % value
+                medias = [service_media for service_media in medias if not service_media.json_path]
+        if not medias:
+            continue
+        service_games = ServiceGameCollection.get_for_service(service, compact=True)
+        for game in service_games:
+            if not game["details"]:
+                continue
+            details = json.loads(game["details"])
+            for service_media in medias:
+                media_url = service_media.get_media_url(details)
+                if media_url:
+                    media_urls[service_media][game["slug"]] = media_url
+    return media_urls
@@ -7,8 +7,7 @@ from gettext import gettext as _
 
 from lutris import settings
 from lutris.config import LutrisConfig, write_game_config
-from lutris.database import sql
-from lutris.database.games import add_game, get_game_by_field, get_games
+from lutris.database.games import add_game, get_game_by_field, get_games, update_game
 from lutris.database.services import ServiceGameCollection
 from lutris.game import Game
 from lutris.installer.installer_file import InstallerFile
@@ -96,11 +95,12 @@ class SteamService(BaseService):
         steam_games = get_steam_library(steamid)
         if not steam_games:
             raise RuntimeError(_("Failed to load games. Check that your profile is set to public during the sync."))
-        for steam_game in steam_games:
-            if steam_game["appid"] in self.excluded_appids:
-                continue
-            game = self.game_class.new_from_steam_game(steam_game)
-            game.save()
+        games = [
+            self.game_class.new_from_steam_game(steam_game)
+            for steam_game in steam_games
+            if steam_game["appid"] not in self.excluded_appids
+        ]
+        self.game_class.save_all(games)
         self.match_games()
         return steam_games
 
@@ -112,7 +112,7 @@ class SteamService(BaseService):
             for game in get_games(filters={"service": self.id, "service_id": service_game["appid"]}):
                 steam_game_playtime = json.loads(service_game["details"]).get("playtime_forever")
                 playtime = steam_game_playtime / 60
-                sql.db_update(settings.DB_PATH, "games", {"playtime": playtime}, conditions={"id": game["id"]})
+                update_game(game["id"], playtime=playtime)
 
     def get_installer_files(self, installer, _installer_file_id, _selected_extras):
         steam_uri = "$STEAM:%s:."
@@ -35,6 +35,7 @@ WINE_DIR: str = os.path.join(RUNNER_DIR, "wine")
 
 SHADER_CACHE_DIR = os.path.join(CACHE_DIR, "shaders")
 INSTALLER_CACHE_DIR = os.path.join(CACHE_DIR, "installer")
+THUMBNAIL_CACHE_DIR = os.path.join(CACHE_DIR, "thumbnails")
 BANNER_PATH = os.path.join(DATA_DIR, "banners")
 COVERART_PATH = os.path.join(DATA_DIR, "coverart")
 
@@ -0,0 +1,153 @@
+"""Measures the disk space used by folders, like 'du' does.
+
+Folders are scanned by several threads at once. What is found in each folder is cached
+on disk, with the folder's modification time, so measuring the same folder again only
+rescans the folders where files were added, removed or renamed since. A file modified
+in place does not change the time of its folder, so its new size is missed until then.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lutris import settings
+from lutris.util.log import logger
+
+DISK_SIZE_CACHE_DIR = os.path.join(settings.CACHE_DIR, "disk-sizes")
+
+# Scanning waits on the disk much more than on Python, so this can exceed the CPU count
+MAX_WORKERS = 8
+
+# st_blocks counts blocks of this size, whatever the file system
+STAT_BLOCK_SIZE = 512
+
+# Folders changed this recently could change again within the same time stamp, unnoticed
+RACY_SECONDS = 2
+
+
+class DiskSizeCalculator:
+    """Measures folders, using and updating the cache of each folder measured.
+
+    The cache of a folder maps the path of each folder inside it, relative to it, to
+    a list of the folder's modification time in nanoseconds, the disk space used by the
+    folder and its files, the names of its sub-folders, and the (device, inode, space)
+    of its files having several hard links; these are counted only once in total."""
+
+    def __init__(self, cache_dir=DISK_SIZE_CACHE_DIR, max_workers=MAX_WORKERS):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self._lock = threading.Lock()  # Only one folder is measured at a time
+
+    def get_cache_path(self, path):
+        path_hash = hashlib.sha1(path.encode("utf-8", "surrogateescape")).hexdigest()
+        return os.path.join(self.cache_dir, path_hash + ".json")
+
+    def _read_cache(self, path):
+        try:
+            with open(self.get_cache_path(path), encoding="utf-8") as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        # Different paths could share a hash, in theory
+        if not isinstance(cache, dict) or cache.get("path") != path:
+            return {}
+        return cache.get("folders") or {}
+
+    def _write_cache(self, path, folders):
+        cache_path = self.get_cache_path(path)
+        temp_path = cache_path + ".tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as cache_file:
+                json.dump({"path": path, "folders": folders}, cache_file, separators=(",", ":"))
+            os.replace(temp_path, cache_path)
+        except OSError as ex:
+            logger.warning("Unable to save the disk size cache for %s: %s", path, ex)
+
+    @staticmethod
+    def scan_folder(folder_path, mtime_ns, own_size):
+        """Return the cache entry for a folder, by listing its content"""
+        size = own_size
+        folders = []
+        links = []
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_symlink():
+                        continue
+                    if entry.is_dir():
+                        folders.append(entry.name)
+                        continue
+                    entry_stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue  # Deleted while scanning, most likely
+                usage = entry_stat.st_blocks * STAT_BLOCK_SIZE
+                if entry_stat.st_nlink > 1:
+                    links.append([entry_stat.st_dev, entry_stat.st_ino, usage])
+                else:
+                    size += usage
+        return [mtime_ns, size, folders, links]
+
+    def get_size(self, path, use_cache=True):
+        """Return the disk space used by a file or folder, in bytes; 0 if it does not exist."""
+        path = os.path.abspath(path)
+        try:
+            path_stat = os.stat(path)
+        except OSError:
+            return 0
+        if not os.path.isdir(path):
+            return path_stat.st_blocks * STAT_BLOCK_SIZE
+
+        with self._lock:
+            cache = self._read_cache(path) if use_cache else {}
+            new_cache = {}
+            racy_time_ns = time.time_ns() - RACY_SECONDS * 1_000_000_000
+            changed = False
+
+            def get_entry(relative_path):
+                folder_path = os.path.join(path, relative_path) if relative_path else path
+                try:
+                    folder_stat = os.stat(folder_path, follow_symlinks=False) if relative_path else path_stat
+                    entry = cache.get(relative_path)
+                    if entry and entry[0] == folder_stat.st_mtime_ns and entry[0] < racy_time_ns:
+                        return entry, False
+                    own_size = folder_stat.st_blocks * STAT_BLOCK_SIZE
+                    return self.scan_folder(folder_path, folder_stat.st_mtime_ns, own_size), True
+                except OSError as ex:
+                    logger.debug("Unable to measure %s: %s", folder_path, ex)
+                    return None, False
+
+            total_size = 0
+            linked_files = {}
+            level = [""]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while level:
+                    next_level = []
+                    for relative_path, (entry, scanned) in zip(level, executor.map(get_entry, level)):
+                        if not entry:
+                            continue
+                        changed = changed or scanned
+                        new_cache[relative_path] = entry
+                        _mtime_ns, size, folders, links = entry
+                        total_size += size
+                        for device, inode, usage in links:
+                            linked_files[(device, inode)] = usage
+                        next_level.extend(os.path.join(relative_path, name) for name in folders)
+                    level = next_level
+            total_size += sum(linked_files.values())
+
+            # Folders deleted since last time are left out of the new cache
+            if changed or len(new_cache) != len(cache):
+                self._write_cache(path, new_cache)
+            return total_size
+
+
+DISK_SIZE_CALCULATOR = DiskSizeCalculator()
+
+
+def get_disk_size(path: str) -> int:
+    """Return the disk space used by a file or folder, in bytes"""
+    return DISK_SIZE_CALCULATOR.get_size(path)
@@ -0,0 +1,155 @@
+"""Coordinates the downloads of Lutris, so they share the network sensibly"""
+
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from lutris.settings import read_setting
+from lutris.util.log import logger
+
+# Downloads waiting for a slot start in this order; lower goes first
+PRIORITY_INTERACTIVE = 0  # Something the user is waiting for, like an install
+PRIORITY_NORMAL = 10
+PRIORITY_BACKGROUND = 20  # Media and such, that nobody waits for
+
+MAX_DOWNLOADS = 8
+MAX_DOWNLOADS_PER_HOST = 5
+
+# Transfers seen over this many seconds give the current throughput
+THROUGHPUT_WINDOW = 5
+
+# With a bandwidth limit, downloads can go over it this many seconds' worth after being idle
+BURST_SECONDS = 0.5
+
+
+def _read_int_setting(key, default):
+    try:
+        return int(read_setting(key) or default)
+    except ValueError:
+        logger.warning("Invalid value for the %s setting: %s", key, read_setting(key))
+        return default
+
+
+class DownloadScheduler:
+    """Decides when downloads start, and how fast they go.
+
+    Each download must hold a slot while it runs; there are at most max_downloads slots,
+    and max_downloads_per_host for each host. Downloads waiting for a slot get it by
+    priority, then in the order they asked for it. If a bandwidth limit is set, in bytes
+    per second, downloads reporting their transfers are slowed down to stay under it.
+    """
+
+    def __init__(self, max_downloads=MAX_DOWNLOADS, max_downloads_per_host=MAX_DOWNLOADS_PER_HOST, bandwidth_limit=0):
+        self.max_downloads = max_downloads
+        self.max_downloads_per_host = max_downloads_per_host
+        self.bandwidth_limit = bandwidth_limit
+        self._condition = threading.Condition()
+        self._serial = 0
+        self._waiting = []  # (priority, serial number, host) of the downloads waiting for a slot
+        self._active_count = 0
+        self._active_by_host = Counter()
+        self._lock = threading.Lock()
+        self._transfers = deque()  # (time, byte count) over the throughput window
+        self._throttle_time = 0.0  # When the bytes transferred so far are allowed to be done
+        self.total_transferred = 0
+
+    @staticmethod
+    def get_host(url):
+        return urlparse(url).netloc
+
+    def _can_start(self, entry):
+        _priority, _serial, host = entry
+        if self._active_count >= self.max_downloads:
+            return False
+        if self._active_by_host[host] >= self.max_downloads_per_host:
+            return False
+        # Downloads waiting ahead of this one go first, unless their host is busy
+        for other in self._waiting:
+            if other < entry and self._active_by_host[other[2]] < self.max_downloads_per_host:
+                return False
+        return True
+
+    def acquire(self, url, priority=PRIORITY_NORMAL, is_cancelled=None):
+        """Wait for a slot to download from url; returns False, without a slot, if
+        is_cancelled() returns True before one is available."""
+        with self._condition:
+            self._serial += 1
+            entry = (priority, self._serial, self.get_host(url))
+            self._waiting.append(entry)
+            try:
+                while not self._can_start(entry):
+                    if is_cancelled and is_cancelled():
+                        return False
+                    # Cancelling doesn't notify us, so check it now and then
+                    self._condition.wait(timeout=1)
+            finally:
+                self._waiting.remove(entry)
+                self._condition.notify_all()
+            self._active_count += 1
+            self._active_by_host[entry[2]] += 1
+            return True
+
+    def release(self, url):
+        """Give back the slot of a download, once it is over"""
+        host = self.get_host(url)
+        with self._condition:
+            self._active_count -= 1
+            self._active_by_host[host] -= 1
+            if not self._active_by_host[host]:
+                del self._active_by_host[host]
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, url, priority=PRIORITY_NORMAL, is_cancelled=None):
+        """Hold a slot while in the block; the block gets True, or False if the download
+        was cancelled before a slot was available, in which case it must not download anything."""
+        if not self.acquire(url, priority, is_cancelled):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self.release(url)
+
+    def transferred(self, byte_count):
+        """Record bytes received by a download, and make it wait as long as needed
+        to stay under the bandwidth limit."""
+        now = time.monotonic()
+        delay = 0
+        with self._lock:
+            self.total_transferred += byte_count
+            self._transfers.append((now, byte_count))
+            while self._transfers[0][0] < now - THROUGHPUT_WINDOW:
+                self._transfers.popleft()
+            if self.bandwidth_limit > 0:
+                self._throttle_time = max(self._throttle_time, now - BURST_SECONDS) + byte_count / self.bandwidth_limit
+                delay = self._throttle_time - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def get_throughput(self):
+        """Return the bytes per second received by all downloads lately"""
+        now = time.monotonic()
+        with self._lock:
+            byte_count = sum(count for when, count in self._transfers if when >= now - THROUGHPUT_WINDOW)
+        return byte_count / THROUGHPUT_WINDOW
+
+    @property
+    def active_count(self):
+        """Number of downloads running"""
+        return self._active_count
+
+    @property
+    def waiting_count(self):
+        """Number of downloads waiting for a slot"""
+        return len(self._waiting)
+
+
+DOWNLOAD_SCHEDULER = DownloadScheduler(
+    max_downloads=_read_int_setting("max_downloads", MAX_DOWNLOADS),
+    max_downloads_per_host=_read_int_setting("max_downloads_per_host", MAX_DOWNLOADS_PER_HOST),
+    # The setting is in KiB/s, 0 for no limit
+    bandwidth_limit=_read_int_setting("download_bandwidth_limit", 0) * 1024,
+)
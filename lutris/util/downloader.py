@@ -1,13 +1,17 @@
 import bisect
+import hashlib
+import json
 import os
 import threading
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import requests
 
 from lutris import __version__
-from lutris.util import jobs
+from lutris.util import jobs, system
+from lutris.util.download_scheduler import DOWNLOAD_SCHEDULER, PRIORITY_INTERACTIVE
+from lutris.util.http import get_session
 from lutris.util.log import logger
 
 # `time.time` can skip ahead or even go backwards if the current
@@ -16,6 +20,25 @@ from lutris.util.log import logger
 # download speeds.
 get_time = time.monotonic
 
+# Size of the chunks read from the network and written to disk
+CHUNK_SIZE = 64 * 1024
+
+# A dropped connection is resumed this many times before the download fails
+MAX_RESUME_ATTEMPTS = 5
+
+# Files smaller than this are never split between several connections
+MIN_SEGMENT_SIZE = 32 * 1024 * 1024
+
+# During a segmented download, the progress of the segments is saved after this many bytes
+SAVE_STATE_INTERVAL = 16 * 1024 * 1024
+
+# Errors after which a download can be resumed
+RESUMABLE_ERRORS = (requests.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.Timeout)
+
+
+class RangeNotSatisfiedError(Exception):
+    """Raised when a server sends a whole file instead of the range requested"""
+
 
 class Downloader:
     """Non-blocking downloader.
@@ -23,6 +46,19 @@ class Downloader:
     Do start() then check_progress() at regular intervals.
     Download is done when check_progress() returns 1.0.
     Stop with cancel().
+
+    A dropped connection is resumed where it stopped, if the server supports ranges. If
+    'resume' is set, a download that failed, even in an earlier session, is also resumed when
+    started again; the progress is kept in a '.resume' file next to the destination until
+    the download completes. If 'connections' is more than 1, large files are downloaded in
+    that many segments at once, written in place in a preallocated file.
+
+    Downloads run when the DOWNLOAD_SCHEDULER gives them a slot, according to their
+    'priority'; until then, they are downloading but make no progress.
+
+    If 'hash_type' names a hashlib algorithm, the checksum of the file is computed as it
+    arrives, and is found in 'checksum' once the download completes. This is not possible
+    for segmented downloads, whose checksum is left as None.
     """
 
     (INIT, DOWNLOADING, CANCELLED, ERROR, COMPLETED) = list(range(5))
@@ -35,6 +71,10 @@ class Downloader:
         referer: Optional[str] = None,
         cookies: Any = None,
         headers: Dict[str, str] = None,
+        resume: bool = False,
+        connections: int = 1,
+        hash_type: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
     ) -> None:
         self.url: str = url
         self.dest: str = dest
@@ -42,8 +82,19 @@ class Downloader:
         self.headers = headers
         self.overwrite: bool = overwrite
         self.referer = referer
+        self.resume = resume
+        self.connections = connections
+        self.hash_type = hash_type
+        self.priority = priority
+        self.hasher = None
+        self.state_path = dest + ".resume"
         self.stop_request = None
         self.thread = None
+        self.lock = threading.Lock()
+
+        # [start, end, position] of each part of the file; end is None if the size is unknown
+        self.segments: List[List[Optional[int]]] = []
+        self.validator: Optional[str] = None  # ETag or Last-Modified of the file
 
         # Read these after a check_progress()
         self.state = self.INIT
@@ -60,6 +111,7 @@ class Downloader:
         self.speed_check_time = 0
         self.time_left_check_time = 0
         self.file_pointer = None
+        self.checksum: Optional[str] = None  # Hex digest of the file, if hash_type was given
         self.progress_event = threading.Event()
 
     def __repr__(self):
@@ -70,14 +122,22 @@ class Downloader:
         logger.debug("⬇ %s", self.url)
         self.state = self.DOWNLOADING
         self.last_check_time = get_time()
-        if self.overwrite and os.path.isfile(self.dest):
-            os.remove(self.dest)
-        self.file_pointer = open(self.dest, "wb")  # pylint: disable=consider-using-with
+        if self.resume and self.load_resume_state():
+            logger.info("Resuming download of %s at %s bytes", self.url, self.downloaded_size)
+            self.file_pointer = open(self.dest, "r+b")  # pylint: disable=consider-using-with
+        else:
+            self.remove_resume_state()
+            if self.overwrite and os.path.isfile(self.dest):
+                os.remove(self.dest)
+            self.file_pointer = open(self.dest, "wb")  # pylint: disable=consider-using-with
+        self.last_size = self.downloaded_size
+        # Created before the thread starts, as the download checks it right away
+        self.stop_request = threading.Event()
         self.thread = jobs.AsyncCall(self.async_download, None)
-        self.stop_request = self.thread.stop_request
 
     def reset(self):
-        """Reset the state of the downloader"""
+        """Reset the state of the downloader; if it resumes downloads, starting it again
+        resumes from where it stopped."""
         self.state = self.INIT
         self.error = None
         self.downloaded_size = 0  # Bytes
@@ -92,6 +152,10 @@ class Downloader:
         self.speed_check_time = 0
         self.time_left_check_time = 0
         self.file_pointer = None
+        self.segments = []
+        self.validator = None
+        self.hasher = None
+        self.checksum = None
 
     def check_progress(self, blocking=False):
         """Append last downloaded chunk to dest file and store stats.
@@ -133,43 +197,258 @@ class Downloader:
             self.file_pointer = None
         if os.path.isfile(self.dest):
             os.remove(self.dest)
+        self.remove_resume_state()
+
+    def get_headers(self) -> Dict[str, str]:
+        headers = requests.utils.default_headers()
+        headers["User-Agent"] = "Lutris/%s" % __version__
+        if self.referer:
+            headers["Referer"] = self.referer
+        if self.headers:
+            for key, value in self.headers.items():
+                headers[key] = value
+        # Sizes and ranges are those of the file as sent; they would not match the bytes
+        # we write if the server compressed it on the fly
+        headers["Accept-Encoding"] = "identity"
+        return headers
+
+    def request(self, url: str, segment=None) -> requests.Response:
+        """Send the request for the file, or for the rest of a segment of it."""
+        headers = self.get_headers()
+        if segment and (segment[2] or segment[1] is not None):
+            _start, end, position = segment
+            headers["Range"] = "bytes=%s-%s" % (position, "" if end is None else end - 1)
+            if self.validator:
+                # If the file has changed, we get the whole new file instead
+                headers["If-Range"] = self.validator
+        response = get_session().get(url, headers=headers, stream=True, timeout=30, cookies=self.cookies)
+        if response.status_code not in (200, 206):
+            logger.info("%s returned a %s error", url, response.status_code)
+        response.raise_for_status()
+        if "Range" in headers and response.status_code != 206:
+            response.close()
+            raise RangeNotSatisfiedError("%s did not send the range %s" % (url, headers["Range"]))
+        return response
+
+    @staticmethod
+    def get_full_size(response: requests.Response) -> int:
+        """Return the size of the whole file a response is for, or 0 if unknown"""
+        if response.headers.get("Content-Encoding", "identity").strip().casefold() != "identity":
+            # The server encoded the file anyway; its size is that of the decoded bytes, unknown
+            return 0
+        if response.status_code == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2].strip()
+            return int(total) if total.isdigit() else 0
+        return int(response.headers.get("Content-Length", "").strip() or 0)
+
+    def create_hasher(self, size=0):
+        """Return a hasher for the checksum of the file, fed with its first 'size' bytes,
+        or None if no checksum is wanted."""
+        if not self.hash_type:
+            return None
+        try:
+            hasher = hashlib.new(self.hash_type)
+        except ValueError:
+            logger.warning("Unsupported hash type %s, the checksum won't be computed", self.hash_type)
+            return None
+        if size:
+            system.update_hash_from_file(hasher, self.dest, size)
+        return hasher
 
     def async_download(self):
         try:
-            headers = requests.utils.default_headers()
-            headers["User-Agent"] = "Lutris/%s" % __version__
-            if self.referer:
-                headers["Referer"] = self.referer
-            if self.headers:
-                for key, value in self.headers.items():
-                    headers[key] = value
-            response = requests.get(self.url, headers=headers, stream=True, timeout=30, cookies=self.cookies)
-            if response.status_code != 200:
-                logger.info("%s returned a %s error", self.url, response.status_code)
-            response.raise_for_status()
-            self.full_size = int(response.headers.get("Content-Length", "").strip() or 0)
-            self.progress_event.set()
-            for chunk in response.iter_content(chunk_size=8192):
-                if not self.file_pointer:
-                    break
-                if chunk:
-                    self.downloaded_size += len(chunk)
-                    self.file_pointer.write(chunk)
-                self.progress_event.set()
+            with DOWNLOAD_SCHEDULER.slot(
+                self.url, self.priority, is_cancelled=lambda: self.state == self.CANCELLED
+            ) as started:
+                if not started:
+                    return
+                self.download()
             self.on_download_completed()
         except Exception as ex:
             logger.exception("Download failed: %s", ex)
             self.on_download_failed(ex)
 
+    def download(self):
+        """Download the file, or what remains of it"""
+        try:
+            if self.segments:
+                # Resuming; the part downloaded already is hashed again
+                self.hasher = self.create_hasher(self.segments[0][2]) if len(self.segments) == 1 else None
+                self.download_segments(self.url)
+            else:
+                self.download_file()
+        except RangeNotSatisfiedError as ex:
+            # The file changed since we started, or the server doesn't do ranges after all
+            logger.warning("Unable to resume download, restarting it: %s", ex)
+            with self.lock:
+                self.segments = []
+                self.validator = None
+                self.downloaded_size = 0
+            self.file_pointer.truncate(0)
+            self.download_file()
+
+    def download_file(self):
+        """Download the file from the start; large files are split into segments if
+        the server supports ranges and we're allowed several connections."""
+        response = self.request(self.url)
+        self.hasher = self.create_hasher()
+        self.full_size = self.get_full_size(response)
+        self.validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        self.progress_event.set()
+        supports_ranges = response.headers.get("Accept-Ranges", "").strip().casefold() == "bytes"
+        if self.connections > 1 and supports_ranges and self.full_size >= MIN_SEGMENT_SIZE:
+            response.close()
+            self.hasher = None  # segments arrive out of order
+            self.preallocate(self.full_size)
+            segment_size = -(-self.full_size // self.connections)  # rounded up
+            self.segments = [
+                [start, min(start + segment_size, self.full_size), start]
+                for start in range(0, self.full_size, segment_size)
+            ]
+            self.save_resume_state()
+            # Redirections have been followed already; no need to do them for each segment
+            self.download_segments(response.url)
+        else:
+            self.segments = [[0, self.full_size or None, 0]]
+            self.save_resume_state()
+            self.download_segment(self.url, self.segments[0], response)
+
+    def preallocate(self, size):
+        """Reserve the disk space for the whole file"""
+        try:
+            os.posix_fallocate(self.file_pointer.fileno(), 0, size)
+        except (AttributeError, OSError):
+            # Not all file systems can do that; the file will be sparse instead
+            self.file_pointer.truncate(size)
+
+    def download_segments(self, url):
+        """Download the incomplete segments, each over its own connection."""
+        errors = []
+        abort_request = threading.Event()
+
+        def download(segment):
+            try:
+                self.download_segment(url, segment, abort_request=abort_request)
+            except Exception as ex:  # pylint: disable=broad-except
+                errors.append(ex)
+                abort_request.set()  # no point downloading the other segments
+
+        threads = [
+            threading.Thread(target=download, args=(segment,), daemon=True)
+            for segment in self.segments
+            if segment[1] is None or segment[2] < segment[1]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def download_segment(self, url, segment, response=None, abort_request=None):
+        """Download a segment of the file and write it in place, resuming it
+        if the connection drops."""
+        end = segment[1]
+        attempts = 0
+        last_saved_size = self.downloaded_size
+        with open(self.dest, "r+b") as segment_file:
+            while end is None or segment[2] < end:
+                if not self.file_pointer or self.stop_request.is_set():
+                    return
+                if abort_request and abort_request.is_set():
+                    return
+                try:
+                    if not response:
+                        response = self.request(url, segment)
+                    segment_file.seek(segment[2])
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if not self.file_pointer:
+                            return
+                        if chunk:
+                            if end is not None:
+                                chunk = chunk[: end - segment[2]]
+                            segment_file.write(chunk)
+                            if self.hasher:
+                                self.hasher.update(chunk)
+                            with self.lock:
+                                segment[2] += len(chunk)
+                                self.downloaded_size += len(chunk)
+                            DOWNLOAD_SCHEDULER.transferred(len(chunk))
+                        self.progress_event.set()
+                        if end is not None and segment[2] >= end:
+                            break
+                    if end is None:
+                        return
+                    if segment[2] < end:
+                        raise requests.ConnectionError("Connection closed %s bytes short" % (end - segment[2]))
+                except RESUMABLE_ERRORS as ex:
+                    attempts += 1
+                    if attempts > MAX_RESUME_ATTEMPTS:
+                        raise
+                    logger.warning("Download of %s interrupted at byte %s, resuming: %s", url, segment[2], ex)
+                    segment_file.flush()
+                    if self.stop_request.wait(min(2**attempts, 30)):
+                        return
+                finally:
+                    if response:
+                        response.close()
+                        response = None
+                if len(self.segments) > 1 and self.downloaded_size - last_saved_size >= SAVE_STATE_INTERVAL:
+                    segment_file.flush()
+                    last_saved_size = self.downloaded_size
+                    self.save_resume_state()
+
+    def load_resume_state(self) -> bool:
+        """Read back the progress of an earlier attempt to download the file;
+        returns False if there's nothing to resume."""
+        if not os.path.isfile(self.dest):
+            return False
+        try:
+            with open(self.state_path, encoding="utf-8") as state_file:
+                state = json.load(state_file)
+            segments = state["segments"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if not segments:
+            return False
+        if len(segments) == 1:
+            # A single segment is written in order, so the file has it all
+            segments[0][2] = min(os.path.getsize(self.dest), segments[0][1] or os.path.getsize(self.dest))
+        self.segments = segments
+        self.validator = state.get("validator")
+        self.full_size = state.get("full_size") or 0
+        self.downloaded_size = sum(position - start for start, _end, position in segments)
+        return True
+
+    def save_resume_state(self):
+        """Record the progress of the download, so it can be resumed if it fails"""
+        if not self.resume:
+            return
+        with self.lock:
+            state = {"validator": self.validator, "full_size": self.full_size, "segments": self.segments}
+            try:
+                with open(self.state_path + ".tmp", "w", encoding="utf-8") as state_file:
+                    json.dump(state, state_file)
+                os.replace(self.state_path + ".tmp", self.state_path)
+            except OSError as ex:
+                logger.warning("Unable to save the progress of %s: %s", self.url, ex)
+
+    def remove_resume_state(self):
+        if os.path.isfile(self.state_path):
+            os.remove(self.state_path)
+
     def on_download_failed(self, error: Exception):
         # Cancelling closes the file, which can result in an
         # error. If so, we just remain cancelled.
         if self.state != self.CANCELLED:
             self.state = self.ERROR
             self.error = error
+            if self.segments:
+                self.save_resume_state()
         if self.file_pointer:
             self.file_pointer.close()
             self.file_pointer = None
+        self.progress_event.set()  # wake up join()
 
     def on_download_completed(self):
         if self.state == self.CANCELLED:
@@ -182,9 +461,13 @@ class Downloader:
         if not self.full_size:
             self.progress_fraction = 1.0
             self.progress_percentage = 100
+        if self.hasher:
+            self.checksum = self.hasher.hexdigest()
         self.state = self.COMPLETED
         self.file_pointer.close()
         self.file_pointer = None
+        self.remove_resume_state()
+        self.progress_event.set()  # wake up join()
 
     def get_stats(self):
         """Calculate and store download stats."""
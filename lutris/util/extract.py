@@ -1,24 +1,55 @@
 import gzip
 import os
 import shutil
+import stat
 import subprocess
 import tarfile
+import threading
+import time
 import uuid
+import zipfile
 import zlib
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 from lutris import settings
 from lutris.exceptions import MissingExecutableError
 from lutris.util import system
 from lutris.util.log import logger
 
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Zip archives with at least this many files are extracted by several threads
+PARALLEL_EXTRACT_MIN_FILES = 64
+EXTRACT_WORKERS = min(4, os.cpu_count() or 1)
+
+ZIP_SUPPORTED_COMPRESSION = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA)
+ZIP_ENCRYPTED_FLAG = 0x1
+ZIP_UNIX_SYSTEM = 3
+
 
 class ExtractError(Exception):
     """Exception raised when and archive fails to extract"""
 
 
-def extract_archive(path: str, to_directory: str = ".", merge_single: bool = True, extractor=None) -> Tuple[str, str]:
+def extract_archive(
+    path: str, to_directory: str = ".", merge_single: bool = True, extractor=None, progress_callback=None
+) -> Tuple[str, str]:
+    """Extract the archive at path into to_directory, replacing the files already there and
+    merging folders. With merge_single, an archive holding a single folder has its content
+    extracted rather than the folder itself. progress_callback, if given, is called from the
+    extracting thread with the fraction extracted so far, where this can be known."""
     path = os.path.abspath(path)
+    _extract_archive(path, to_directory, merge_single, extractor, progress_callback)
+    return path, to_directory
+
+
+def extract_archive_with_size(path: str, to_directory: str = ".", merge_single: bool = True, extractor=None) -> int:
+    """Extract an archive like extract_archive() does, and return the number of bytes extracted"""
+    return _extract_archive(os.path.abspath(path), to_directory, merge_single, extractor)
+
+
+def _extract_archive(path: str, to_directory: str, merge_single: bool, extractor, progress_callback=None) -> int:
     logger.debug("Extracting %s to %s", path, to_directory)
 
     if extractor is None:
@@ -26,10 +57,14 @@ def extract_archive(path: str, to_directory: str = ".", merge_single: bool = Tru
 
     opener, mode = _get_archive_opener(extractor)
 
-    temp_path = temp_dir = os.path.join(to_directory, ".extract-%s" % _random_id())
     try:
-        _do_extract(path, temp_path, opener, mode, extractor)
-    except (OSError, zlib.error, tarfile.ReadError, EOFError) as ex:
+        extracted_size = _extract_directly(path, to_directory, merge_single, opener, mode, progress_callback)
+        if extracted_size is not None:
+            logger.debug("Finished extracting %s to %s", path, to_directory)
+            return extracted_size
+        temp_path = temp_dir = os.path.join(to_directory, ".extract-%s" % _random_id())
+        extracted_size = _do_extract(path, temp_path, opener, mode, extractor, progress_callback)
+    except (OSError, zlib.error, tarfile.TarError, zipfile.BadZipFile, EOFError) as ex:
         logger.error("Extraction failed: %s", ex)
         raise ExtractError(str(ex)) from ex
     if merge_single:
@@ -48,31 +83,255 @@ def extract_archive(path: str, to_directory: str = ".", merge_single: bool = Tru
         shutil.move(temp_path, to_directory)
         os.removedirs(temp_dir)
     else:
-        for archive_file in os.listdir(temp_path):
-            source_path = os.path.join(temp_path, archive_file)
-            destination_path = os.path.join(to_directory, archive_file)
-            # logger.debug("Moving extracted files from %s to %s", source_path, destination_path)
-
-            if system.path_exists(destination_path):
-                logger.warning("Overwrite existing path %s", destination_path)
-                if os.path.isfile(destination_path):
-                    os.remove(destination_path)
-                    shutil.move(source_path, destination_path)
-                elif os.path.isdir(destination_path):
-                    try:
-                        system.merge_folders(source_path, destination_path)
-                    except OSError as ex:
-                        logger.error(
-                            "Failed to merge to destination %s: %s",
-                            destination_path,
-                            ex,
-                        )
-                        raise ExtractError(str(ex)) from ex
-            else:
-                shutil.move(source_path, destination_path)
+        # The temporary folder is inside to_directory, so its files are moved by renaming
+        # them; nothing is copied.
+        try:
+            system.move_folder_contents(temp_path, to_directory)
+        except OSError as ex:
+            logger.error("Failed to merge to destination %s: %s", to_directory, ex)
+            raise ExtractError(str(ex)) from ex
         system.delete_folder(temp_dir)
     logger.debug("Finished extracting %s to %s", path, to_directory)
-    return path, to_directory
+    return extracted_size
+
+
+def _extract_directly(
+    archive: str, dest: str, merge_single: bool, opener, mode: str, progress_callback
+) -> Optional[int]:
+    """Extract the archive straight into dest if its format allows it, and return the number
+    of bytes extracted; returns None, having extracted nothing, if it must be extracted into
+    a temporary folder instead."""
+    if opener == "gz":
+        return _decompress_gz(archive, dest, progress_callback)
+    if opener == "zip":
+        return _extract_zip(archive, dest, merge_single, progress_callback)
+    # Finding the folder to merge needs the whole list of members first, which
+    # means decompressing a compressed tar twice; extracting it once into
+    # a temporary folder and renaming from there is cheaper.
+    if opener is tarfile.open and (mode == "r:" or not merge_single):
+        return _extract_tar(archive, dest, mode, merge_single, progress_callback)
+    return None
+
+
+def _get_member_path(name: str) -> Optional[str]:
+    """Return the relative path of an archive member, or None for the archive's root.
+    Raises ExtractError for members that would end up outside the destination."""
+    path = os.path.normpath(name.lstrip("/"))
+    if path == ".":
+        return None
+    if path == ".." or path.startswith("../"):
+        raise ExtractError("Archive member %s is outside of the destination" % name)
+    return path
+
+
+def _get_single_folder(members: List[Tuple[str, bool]]) -> Optional[str]:
+    """Return the folder holding everything else, if the archive has only that at its
+    top level, or None. The members are tuples of their name, and whether they are folders."""
+    root = None
+    root_is_folder = False
+    for name, is_dir in members:
+        path = _get_member_path(name)
+        if not path:
+            continue
+        top, _separator, rest = path.partition("/")
+        if root is None:
+            root = top
+        elif top != root:
+            return None
+        root_is_folder = root_is_folder or is_dir or bool(rest)
+    return root if root_is_folder else None
+
+
+class _ArchiveWriter:
+    """Writes archive members into their destination, replacing what is in the way."""
+
+    def __init__(self, destination: str, single_folder: Optional[str] = None):
+        self.destination = os.path.abspath(destination)
+        self.single_folder = single_folder  # Folder whose content goes to destination, if any
+        self.symlinks = set()  # Relative paths of the links created
+        self.written_size = 0
+        self._lock = threading.Lock()
+
+    def get_path(self, name: str) -> Optional[str]:
+        """Return where the member called name goes, or None if it has nothing to extract"""
+        path = _get_member_path(name)
+        if path and self.single_folder:
+            path = path[len(self.single_folder) + 1 :]
+        if not path:
+            return None
+        if self.symlinks:
+            parts = path.split("/")
+            for index in range(1, len(parts)):
+                if "/".join(parts[:index]) in self.symlinks:
+                    raise ExtractError("Archive member %s is behind a symbolic link" % name)
+        return os.path.join(self.destination, path)
+
+    @staticmethod
+    def _clear_path(path: str) -> None:
+        if os.path.isdir(path) and not os.path.islink(path):
+            logger.warning("Replacing existing folder %s", path)
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.remove(path)
+
+    def make_dir(self, path: str) -> None:
+        if os.path.lexists(path) and not os.path.isdir(path):
+            os.remove(path)
+        os.makedirs(path, exist_ok=True)
+
+    def write_file(self, path: str, source, mode: int = 0, mtime: Optional[float] = None) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._clear_path(path)
+        with open(path, "wb") as dest_file:
+            shutil.copyfileobj(source, dest_file, COPY_BUFFER_SIZE)
+            with self._lock:
+                self.written_size += dest_file.tell()
+        if mode:
+            os.chmod(path, mode)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def make_symlink(self, path: str, target: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._clear_path(path)
+        os.symlink(target, path)
+        self.symlinks.add(os.path.relpath(path, self.destination))
+
+    def make_hardlink(self, path: str, target_path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._clear_path(path)
+        try:
+            os.link(target_path, path)
+        except OSError:
+            shutil.copy2(target_path, path)
+
+
+def _extract_tar(archive: str, dest: str, mode: str, merge_single: bool = False, progress_callback=None) -> int:
+    """Extract a tar archive into dest in a single pass, except that merge_single needs
+    a first pass to list the members. Returns the number of bytes extracted."""
+    archive_size = os.path.getsize(archive)
+    with open(archive, "rb") as archive_file:
+        single_folder = None
+        if merge_single:
+            with tarfile.open(fileobj=archive_file, mode=mode) as tar:
+                single_folder = _get_single_folder([(member.name, member.isdir()) for member in tar.getmembers()])
+            archive_file.seek(0)
+        writer = _ArchiveWriter(dest, single_folder)
+        # The stream mode reads the archive once, in order, however it is compressed
+        with tarfile.open(fileobj=archive_file, mode=mode.replace(":", "|")) as tar:
+            for member in tar:
+                path = writer.get_path(member.name)
+                if not path:
+                    continue
+                if member.isdir():
+                    writer.make_dir(path)
+                elif member.isreg():
+                    with tar.extractfile(member) as source:
+                        writer.write_file(path, source, member.mode & 0o777, member.mtime)
+                elif member.issym():
+                    writer.make_symlink(path, member.linkname)
+                elif member.islnk():
+                    target_path = writer.get_path(member.linkname)
+                    if target_path and os.path.isfile(target_path):
+                        writer.make_hardlink(path, target_path)
+                    else:
+                        logger.warning(
+                            "Skipping link %s to %s, outside of the extracted files", member.name, member.linkname
+                        )
+                else:
+                    logger.debug("Skipping special file %s", member.name)
+                if progress_callback and archive_size:
+                    progress_callback(min(archive_file.tell() / archive_size, 1.0))
+    return writer.written_size
+
+
+def _get_zip_member_name(member: zipfile.ZipInfo) -> str:
+    """Return the name of a zip member with '/' separators; archives made on Windows
+    can have backslashes instead."""
+    return member.filename.replace("\\", "/")
+
+
+def _get_zip_mtime(member: zipfile.ZipInfo) -> float:
+    return time.mktime(member.date_time + (0, 0, -1))
+
+
+def _extract_zip(archive: str, dest: str, merge_single: bool = True, progress_callback=None) -> Optional[int]:
+    """Extract a zip archive straight into dest, and return the number of bytes extracted;
+    large ones are extracted by several threads. Returns None, having extracted nothing, if
+    Python can't read the archive, or it uses encryption or compression methods only 7-zip
+    knows about."""
+    try:
+        with zipfile.ZipFile(archive) as zip_file:
+            members = zip_file.infolist()
+    except zipfile.BadZipFile as ex:
+        logger.debug("Using 7-zip for %s: %s", archive, ex)
+        return None
+    for member in members:
+        if member.flag_bits & ZIP_ENCRYPTED_FLAG or member.compress_type not in ZIP_SUPPORTED_COMPRESSION:
+            logger.debug("Using 7-zip for %s, which Python can't extract", archive)
+            return None
+
+    names = [_get_zip_member_name(member) for member in members]
+    single_folder = _get_single_folder([(name, name.endswith("/")) for name in names]) if merge_single else None
+    writer = _ArchiveWriter(dest, single_folder)
+    folders = []
+    files = {}  # path -> member; a later member with the same path replaces an earlier one
+    symlinks = {}
+    for member, name in zip(members, names):
+        path = writer.get_path(name)
+        if not path:
+            continue
+        # Archives made on Unix-like systems have the permissions in the high bits
+        unix_mode = member.external_attr >> 16 if member.create_system == ZIP_UNIX_SYSTEM else 0
+        if name.endswith("/"):
+            folders.append(path)
+        elif stat.S_ISLNK(unix_mode):
+            symlinks[path] = member
+        else:
+            files[path] = member
+
+    total_size = sum(member.file_size for member in files.values())
+    extracted_size = 0
+    lock = threading.Lock()
+    local = threading.local()
+    zip_files = []
+
+    def extract_file(entry):
+        nonlocal extracted_size
+        path, member = entry
+        # ZipFile objects can't be read by several threads at once, so each thread has its own
+        if not hasattr(local, "zip_file"):
+            local.zip_file = zipfile.ZipFile(archive)
+            zip_files.append(local.zip_file)
+        unix_mode = member.external_attr >> 16 if member.create_system == ZIP_UNIX_SYSTEM else 0
+        with local.zip_file.open(member) as source:
+            writer.write_file(path, source, unix_mode & 0o777, _get_zip_mtime(member))
+        if progress_callback and total_size:
+            with lock:
+                extracted_size += member.file_size
+                progress_callback(extracted_size / total_size)
+
+    for path in folders:
+        writer.make_dir(path)
+    try:
+        if len(files) >= PARALLEL_EXTRACT_MIN_FILES and EXTRACT_WORKERS > 1:
+            # Largest files first, so no thread is left with a big one at the end
+            entries = sorted(files.items(), key=lambda entry: entry[1].file_size, reverse=True)
+            with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
+                for _result in executor.map(extract_file, entries):
+                    pass
+        else:
+            for entry in files.items():
+                extract_file(entry)
+    finally:
+        for zip_file in zip_files:
+            zip_file.close()
+
+    # Links are made last, so no file can be written through them
+    with zipfile.ZipFile(archive) as zip_file:
+        for path, member in symlinks.items():
+            writer.make_symlink(path, zip_file.read(member).decode())
+    return writer.written_size
 
 
 def _guess_extractor(path):
@@ -89,6 +348,8 @@ def _guess_extractor(path):
         extractor = "tzst"
     elif path.endswith(".gz"):
         extractor = "gzip"
+    elif path.casefold().endswith(".zip"):
+        extractor = "zip"
     elif path.endswith(".exe"):
         extractor = "exe"
     elif path.endswith(".deb"):
@@ -115,6 +376,8 @@ def _get_archive_opener(extractor):
         opener, mode = tarfile.open, "r:zst"  # Note: not supported by tarfile yet
     elif extractor == "gzip":
         opener = "gz"
+    elif extractor == "zip":
+        opener = "zip"
     elif extractor == "gog":
         opener = "innoextract"
     elif extractor == "exe":
@@ -133,9 +396,11 @@ def _random_id():
     return str(uuid.uuid4())[:8]
 
 
-def _do_extract(archive: str, dest: str, opener, mode: str = None, extractor=None) -> None:
-    if opener == "gz":
-        _decompress_gz(archive, dest)
+def _do_extract(archive: str, dest: str, opener, mode: str = None, extractor=None, progress_callback=None) -> int:
+    """Extract an archive into the folder dest, and return the number of bytes extracted"""
+    if opener == "zip":
+        # Only for archives Python can't read
+        _extract_7zip(archive, dest, archive_type="zip")
     elif opener == "7zip":
         _extract_7zip(archive, dest, archive_type=extractor)
     elif opener == "exe":
@@ -147,23 +412,45 @@ def _do_extract(archive: str, dest: str, opener, mode: str = None, extractor=Non
     elif opener == "AppImage":
         _extract_AppImage(archive, dest)
     else:
-        handler = opener(archive, mode)
-        handler.extractall(dest)
-        handler.close()
+        return _extract_tar(archive, dest, mode, progress_callback=progress_callback)
+    return _get_folder_size(dest)
 
 
-def _decompress_gz(file_path: str, dest_path: str):
-    """Decompress a gzip file."""
+def _get_folder_size(path: str) -> int:
+    """Return the total size of the files in a folder"""
+    size = 0
+    for base, _dirs, files in os.walk(path):
+        for name in files:
+            size += os.lstat(os.path.join(base, name)).st_size
+    return size
+
+
+def _decompress_gz(file_path: str, dest_path: str, progress_callback=None) -> int:
+    """Decompress a gzip file, and return its decompressed size."""
     if dest_path:
         dest_filename = os.path.join(dest_path, os.path.basename(file_path[:-3]))
     else:
         dest_filename = file_path[:-3]
     os.makedirs(os.path.dirname(dest_filename), exist_ok=True)
-
-    with open(dest_filename, "wb") as dest_file:
-        gzipped_file = gzip.open(file_path, "rb")
-        dest_file.write(gzipped_file.read())
-        gzipped_file.close()
+    if os.path.isdir(dest_filename):
+        os.rename(dest_filename, dest_filename + _random_id())
+    elif os.path.lexists(dest_filename):
+        logger.warning("Overwrite existing file %s", dest_filename)
+        os.remove(dest_filename)
+
+    archive_size = os.path.getsize(file_path)
+    extracted_size = 0
+    with open(file_path, "rb") as archive_file, open(dest_filename, "wb") as dest_file:
+        with gzip.GzipFile(fileobj=archive_file) as gzipped_file:
+            while True:
+                chunk = gzipped_file.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                dest_file.write(chunk)
+                extracted_size += len(chunk)
+                if progress_callback and archive_size:
+                    progress_callback(min(archive_file.tell() / archive_size, 1.0))
+    return extracted_size
 
 
 def _extract_7zip(path: str, dest: str, archive_type: str = None) -> None:
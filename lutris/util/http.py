@@ -1,38 +1,96 @@
 """HTTP utilities"""
 
+import http.cookiejar
+import itertools
 import json
 import os
-import socket
+import random
 import ssl
-import urllib.error
+import threading
+import time
 import urllib.parse
-import urllib.request
-from ssl import CertificateError
+from concurrent.futures import ThreadPoolExecutor
 
 import certifi
+import requests
 
 from lutris.settings import PROJECT, SITE_URL, VERSION, read_setting
 from lutris.util import system
+from lutris.util.download_scheduler import DOWNLOAD_SCHEDULER, PRIORITY_NORMAL
 from lutris.util.log import logger
 
 DEFAULT_TIMEOUT = read_setting("default_http_timeout") or 30
 
+# Most connections kept open to each host, and number of hosts they are kept for
+POOL_MAXSIZE = 16
+POOL_CONNECTIONS = 16
+
+# Responses worth trying again after a while: rate limiting and server failures
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Seconds to wait before the first retry; each further one waits twice as long
+RETRY_BACKOFF = 1
+MAX_RETRY_DELAY = 30
+
+# Pages of a paginated API fetched at once
+MAX_PAGE_WORKERS = 4
+
 ssl._create_default_https_context = lambda: ssl.create_default_context(cafile=certifi.where())
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the requests session shared by the HTTP requests of Lutris, whatever the
+    thread they're made from. It keeps connections alive between requests, so that the
+    handful of hosts Lutris talks to don't need a new TCP and TLS handshake every time.
+
+    The session never stores cookies; requests needing some must pass them explicitly."""
+    global _session
+    with _session_lock:
+        if not _session:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            # Cookies set for one service must not leak into the requests of another
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            _session = session
+        return _session
+
 
 class HTTPError(Exception):
     """Exception raised on request failures"""
 
-    def __init__(self, message, code=None):
+    def __init__(self, message, code=None, retry_after=None):
         super().__init__(message)
         self.code = code
+        self.retry_after = retry_after  # Seconds the server asked us to wait, if it did
 
 
 class UnauthorizedAccessError(Exception):
     """Exception raised for 401 HTTP errors"""
 
 
+def _parse_retry_after(value):
+    """Return the seconds of a Retry-After header, or None if it is missing or a date"""
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
 class Request:
+    """HTTP request made through the shared session. The whole response is read into
+    'content', unless the request is made with stream=True; the body is then read with
+    iter_content() or write_to_file(), and the request should be closed afterwards, or used
+    as a context manager.
+
+    With retries, responses with a status in RETRY_STATUS_CODES are retried up to that
+    many times, waiting longer each time, or as long as the server asks; only use them
+    for requests that can be safely repeated."""
+
     def __init__(
         self,
         url,
@@ -41,6 +99,7 @@ class Request:
         headers=None,
         cookies=None,
         redacted_query_parameters=None,
+        retries=0,
     ):
         self.url = self._clean_url(url)
         self.status_code = None
@@ -53,17 +112,15 @@ class Request:
         self.headers = {"User-Agent": self.user_agent}
         self.response_headers = None
         self.info = None
+        self.response = None  # Response still to be read, when streaming
         self.redacted_query_parameters = redacted_query_parameters
         if headers is None:
             headers = {}
         if not isinstance(headers, dict):
             raise TypeError("HTTP headers needs to be a dict ({})".format(headers))
         self.headers.update(headers)
-        if cookies:
-            cookie_processor = urllib.request.HTTPCookieProcessor(cookies)
-            self.opener = urllib.request.build_opener(cookie_processor)
-        else:
-            self.opener = None
+        self.cookies = cookies
+        self.retries = retries
 
     @staticmethod
     def _clean_url(url):
@@ -109,95 +166,206 @@ class Request:
 
         return self.url
 
-    def _request(self, method, data=None):
+    def _request(self, method, data=None, stream=False):
+        attempt = 0
+        while True:
+            try:
+                return self._send(method, data, stream)
+            except HTTPError as ex:
+                if attempt >= self.retries or ex.code not in RETRY_STATUS_CODES:
+                    raise
+                if ex.retry_after is not None:
+                    delay = min(ex.retry_after, MAX_RETRY_DELAY)
+                else:
+                    # The jitter keeps requests failing together from retrying together
+                    delay = min(RETRY_BACKOFF * 2**attempt, MAX_RETRY_DELAY) * random.uniform(1, 1.5)
+                attempt += 1
+                logger.warning("%s for %s, retrying in %.1fs", ex, self.redacted_url, delay)
+                if self.stop_request:
+                    if self.stop_request.wait(delay):
+                        raise
+                else:
+                    time.sleep(delay)
+
+    def _send(self, method, data, stream):
         logger.debug("%s %s", method, self.redacted_url)
+        headers = self.headers
+        if data is not None and not any(key.lower() == "content-type" for key in headers):
+            # urllib used to send this by default, and some servers expect it
+            headers = dict(headers, **{"Content-Type": "application/x-www-form-urlencoded"})
         try:
-            req = urllib.request.Request(url=self.url, data=data, headers=self.headers, method=method)
-        except ValueError as ex:
+            response = get_session().request(
+                method,
+                self.url,
+                data=data,
+                headers=headers,
+                cookies=self.cookies,
+                timeout=self.timeout,
+                stream=True,
+            )
+        except (requests.exceptions.URLRequired, ValueError) as ex:
             raise HTTPError("Failed to create HTTP request to %s: %s" % (self.url, ex)) from ex
-        try:
-            if self.opener:
-                request = self.opener.open(req, timeout=self.timeout)
-            else:
-                request = urllib.request.urlopen(req, timeout=self.timeout)  # pylint: disable=consider-using-with
-        except urllib.error.HTTPError as error:
-            if error.code == 401:
-                raise UnauthorizedAccessError("Access to %s denied" % self.url) from error
-            raise HTTPError("%s" % error, code=error.code) from error
-        except CertificateError as error:
+        except requests.exceptions.SSLError as error:
             raise HTTPError("%s" % error, code=0) from error
-        except (socket.timeout, urllib.error.URLError) as error:
+        except requests.RequestException as error:
             raise HTTPError("Unable to connect to server %s: %s" % (self.url, error)) from error
 
-        self.response_headers = request.getheaders()
-        self.status_code = request.getcode()
-        if self.status_code > 299:
+        if isinstance(self.cookies, http.cookiejar.CookieJar):
+            # Keep the cookies set by the server, like a cookie processor would
+            for each_response in response.history + [response]:
+                requests.cookies.extract_cookies_to_jar(self.cookies, each_response.request, each_response.raw)
+
+        self.status_code = response.status_code
+        if self.status_code == 401:
+            response.close()
+            raise UnauthorizedAccessError("Access to %s denied" % self.url)
+        if self.status_code >= 400:
+            response.close()
+            raise HTTPError(
+                "HTTP Error %s: %s" % (self.status_code, response.reason),
+                code=self.status_code,
+                retry_after=_parse_retry_after(response.headers.get("Retry-After")),
+            )
+        if self.status_code > 299 and self.status_code != 304:  # 304 answers conditional requests
             logger.warning("Request responded with code %s", self.status_code)
 
+        self.response_headers = list(response.headers.items())
+        self.info = response.headers
         try:
-            self.total_size = int(request.info().get("Content-Length").strip())
-        except AttributeError:
+            self.total_size = int(response.headers.get("Content-Length", "").strip())
+        except ValueError:
             self.total_size = 0
 
-        self.content = b"".join(self._iter_chunks(request))
-        self.info = request.info()
-        request.close()
+        self.response = response
+        if not stream:
+            self.content = b"".join(self.iter_content())
         return self
 
-    def _iter_chunks(self, request):
-        while 1:
-            if self.stop_request and self.stop_request.is_set():
-                self.content = b""
-                return self
-            try:
-                chunk = request.read(self.buffer_size)
-            except (socket.timeout, ConnectionResetError) as err:
-                raise HTTPError("Request timed out") from err
-            self.downloaded_size += len(chunk)
-            if not chunk:
-                return
-            yield chunk
+    def _iter_chunks(self, response):
+        try:
+            for chunk in response.iter_content(chunk_size=self.buffer_size):
+                if self.stop_request and self.stop_request.is_set():
+                    self.content = b""
+                    return
+                self.downloaded_size += len(chunk)
+                yield chunk
+        except requests.RequestException as err:
+            raise HTTPError("Request timed out") from err
+
+    def iter_content(self):
+        """Yield the body of the response in chunks of up to buffer_size bytes. A streamed
+        response is read as it arrives, then closed; it can only be iterated once."""
+        if not self.response:
+            if self.content:
+                yield self.content
+            return
+        try:
+            yield from self._iter_chunks(self.response)
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the connection of a streamed response that won't be read to its end"""
+        if self.response:
+            self.response.close()
+            self.response = None
 
-    def get(self, data=None):
-        return self._request("GET", data)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _type, value, traceback):
+        self.close()
 
-    def post(self, data=None):
-        return self._request("POST", data)
+    def get(self, data=None, stream=False):
+        return self._request("GET", data, stream=stream)
+
+    def post(self, data=None, stream=False):
+        return self._request("POST", data, stream=stream)
 
     def delete(self, data=None):
         return self._request("DELETE", data)
 
-    def write_to_file(self, path):
-        content = self.content
+    def write_to_file(self, path, chunk_callback=None):
+        """Write the body of the response to a file; a streamed response is written as it
+        arrives, to a temporary file that replaces 'path' once complete. If given,
+        chunk_callback is called with the size of each chunk written."""
         logger.debug("Writing to %s", path)
-        if not content:
+        chunks = self.iter_content()
+        first_chunk = next(chunks, b"")
+        if not first_chunk:
             logger.warning("No content to write")
             return
         dirname = os.path.dirname(path)
         if not system.path_exists(dirname):
             os.makedirs(dirname)
-        with open(path, "wb") as dest_file:
-            dest_file.write(content)
+        temp_path = "%s.%s-%s.part" % (path, os.getpid(), threading.get_ident())
+        try:
+            with open(temp_path, "wb") as dest_file:
+                for chunk in itertools.chain([first_chunk], chunks):
+                    dest_file.write(chunk)
+                    if chunk_callback:
+                        chunk_callback(len(chunk))
+            os.replace(temp_path, path)
+        finally:
+            chunks.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def read(self):
+        """Return the whole body of the response; a streamed response is read to its end"""
+        if self.response:
+            self.content = b"".join(self.iter_content())
+        return self.content
 
     @property
     def json(self):
-        _raw_json = self.text
-        if _raw_json:
+        content = self.read()
+        if content:
             try:
-                return json.loads(_raw_json)
+                # Decoding the bytes directly saves a copy of the whole response as text
+                return json.loads(content)
             except json.decoder.JSONDecodeError as err:
-                raise ValueError(f"JSON response from {self.url} could not be decoded: '{_raw_json[:80]}'") from err
+                raise ValueError(f"JSON response from {self.url} could not be decoded: '{self.text[:80]}'") from err
         return {}
 
     @property
     def text(self):
-        if self.content:
-            return self.content.decode()
+        content = self.read()
+        if content:
+            return content.decode()
         return ""
 
 
-def download_file(url, dest, overwrite=False, raise_errors=False):
-    """Save a remote resource locally"""
+def fetch_pages(fetch_page, first_page=1, last_page=None, is_last_page=None, max_workers=MAX_PAGE_WORKERS):
+    """Return the results of fetch_page(page) for the pages of a paginated API, in page
+    order, fetching up to max_workers pages at once.
+
+    If the number of pages is known, give last_page and all pages are fetched at once.
+    Otherwise give is_last_page: pages are fetched max_workers at a time until it returns
+    True for the result of one, and the pages fetched after that one are dropped; last_page
+    then only limits how far this goes. The first error raised by fetch_page, in page order,
+    is raised again."""
+    if last_page is None and is_last_page is None:
+        raise ValueError("Either the last page or a way to recognize it is required")
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if not is_last_page:
+            return list(executor.map(fetch_page, range(first_page, last_page + 1)))
+        page = first_page
+        while last_page is None or page <= last_page:
+            window_end = page + max_workers
+            if last_page is not None:
+                window_end = min(window_end, last_page + 1)
+            for result in executor.map(fetch_page, range(page, window_end)):
+                results.append(result)
+                if is_last_page(result):
+                    return results
+            page = window_end
+    return results
+
+
+def download_file(url, dest, overwrite=False, raise_errors=False, priority=PRIORITY_NORMAL):
+    """Save a remote resource locally, once the DOWNLOAD_SCHEDULER lets us"""
     if system.path_exists(dest):
         if overwrite:
             os.remove(dest)
@@ -206,11 +374,12 @@ def download_file(url, dest, overwrite=False, raise_errors=False):
     if not url:
         return None
     try:
-        request = Request(url).get()
+        with DOWNLOAD_SCHEDULER.slot(url, priority):
+            with Request(url).get(stream=True) as request:
+                request.write_to_file(dest, chunk_callback=DOWNLOAD_SCHEDULER.transferred)
     except HTTPError as ex:
         if raise_errors:
             raise
         logger.error("Failed to get url %s: %s", url, ex)
         return None
-    request.write_to_file(dest)
     return dest
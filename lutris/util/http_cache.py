@@ -0,0 +1,194 @@
+"""Cache of the responses of web APIs, like those of the game stores.
+
+Responses are cached by URL and by scope, which tells apart the accounts the responses
+belong to; each scope has its own folder. A cached response is used as is for as long
+as its time to live; after that it is checked with a conditional request, if the server
+gave an ETag or a Last-Modified date, so an unchanged response needn't be sent again.
+The least recently used responses are dropped when the cache gets too large.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from lutris import settings
+from lutris.settings import read_setting
+from lutris.util.log import logger
+
+HTTP_CACHE_DIR = os.path.join(settings.CACHE_DIR, "api-responses")
+
+# Disk space the cached responses can use, in bytes
+MAX_CACHE_SIZE = 64 * 1024 * 1024
+
+# Lifetime of the cached responses of each kind, in seconds
+DEFAULT_TTLS = {
+    "library": 24 * 60 * 60,
+    "details": 60 * 60,
+}
+
+HTTP_NOT_MODIFIED = 304
+
+
+def get_cache_ttl(kind):
+    """Return the lifetime of cached responses of a kind; the setting 'api_cache_ttl_<kind>'
+    overrides the default, and 0 disables the cache for that kind."""
+    value = read_setting("api_cache_ttl_%s" % kind)
+    if value:
+        try:
+            return int(value)
+        except ValueError:
+            logger.warning("Invalid value for the api_cache_ttl_%s setting: %s", kind, value)
+    return DEFAULT_TTLS.get(kind, 0)
+
+
+def _hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Stores the bodies of responses along with their validators, in one file each"""
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, max_size=MAX_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._written_size = 0  # Bytes written since the last eviction check
+        self._evict_lock = threading.Lock()
+
+    def get_scope_dir(self, scope):
+        return os.path.join(self.cache_dir, _hash(scope))
+
+    def get_entry_path(self, scope, url):
+        return os.path.join(self.get_scope_dir(scope), _hash(url) + ".json")
+
+    def read(self, scope, url):
+        """Return the cached entry for a URL, or None"""
+        try:
+            with open(self.get_entry_path(scope, url), encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, json.JSONDecodeError):
+            return None
+        # Different URLs could share a hash, in theory
+        if not isinstance(entry, dict) or entry.get("url") != url:
+            return None
+        return entry
+
+    def write(self, scope, url, entry):
+        entry_path = self.get_entry_path(scope, url)
+        temp_path = "%s.%s.tmp" % (entry_path, threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as entry_file:
+                json.dump(entry, entry_file, separators=(",", ":"))
+            os.replace(temp_path, entry_path)
+            entry_size = os.path.getsize(entry_path)
+        except OSError as ex:
+            logger.warning("Unable to cache the response of %s: %s", url, ex)
+            return
+        # Checking the size of the cache takes a scan of it, so it's only done now and then
+        with self._lock:
+            self._written_size += entry_size
+            check_size = self._written_size > self.max_size // 8
+            if check_size:
+                self._written_size = 0
+        if check_size:
+            self.evict()
+
+    def get(self, request, scope, ttl, validate=None):
+        """Return the body of the response to a GET request, from the cache if it's
+        there and younger than ttl seconds. Otherwise the request is sent, conditionally
+        if possible, and the response stored. If given, validate(content) is called
+        on new responses, and should raise an exception for those not to be stored."""
+        if ttl <= 0:
+            request.get()
+            if validate:
+                validate(request.content)
+            return request.content
+        entry = self.read(scope, request.url)
+        if entry and time.time() - entry["stored_at"] < ttl:
+            self._touch(scope, request.url)
+            return entry["content"].encode("utf-8", "surrogateescape")
+        if entry:
+            if entry.get("etag"):
+                request.headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request.headers["If-Modified-Since"] = entry["last_modified"]
+        request.get()
+        if entry and request.status_code == HTTP_NOT_MODIFIED:
+            logger.debug("Cached response of %s is still valid", request.redacted_url)
+            entry["stored_at"] = time.time()
+            self.write(scope, request.url, entry)
+            return entry["content"].encode("utf-8", "surrogateescape")
+        if validate:
+            validate(request.content)
+        headers = request.info or {}
+        entry = {
+            "url": request.url,
+            "stored_at": time.time(),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content": request.content.decode("utf-8", "surrogateescape"),
+        }
+        self.write(scope, request.url, entry)
+        return request.content
+
+    def _touch(self, scope, url):
+        """Mark an entry as used, so it is evicted last"""
+        try:
+            os.utime(self.get_entry_path(scope, url))
+        except OSError:
+            pass
+
+    def expire(self, scope):
+        """Make the responses of a scope stale; they are checked again when next used,
+        which is cheap when they haven't changed."""
+        scope_dir = self.get_scope_dir(scope)
+        if not os.path.isdir(scope_dir):
+            return
+        for file_name in os.listdir(scope_dir):
+            if not file_name.endswith(".json"):
+                continue
+            entry_path = os.path.join(scope_dir, file_name)
+            try:
+                with open(entry_path, encoding="utf-8") as entry_file:
+                    entry = json.load(entry_file)
+                entry["stored_at"] = 0
+                self.write(scope, entry["url"], entry)
+            except (OSError, ValueError, KeyError, TypeError):
+                continue  # Unreadable entries are never used anyway
+
+    def clear(self, scope):
+        """Delete the responses of a scope, like when logging out of an account"""
+        shutil.rmtree(self.get_scope_dir(scope), ignore_errors=True)
+
+    def evict(self):
+        """Delete the least recently used responses until the cache fits in max_size"""
+        with self._evict_lock:
+            entries = []
+            total_size = 0
+            for root, _dirs, file_names in os.walk(self.cache_dir):
+                for file_name in file_names:
+                    entry_path = os.path.join(root, file_name)
+                    try:
+                        entry_stat = os.stat(entry_path)
+                    except OSError:
+                        continue
+                    entries.append((entry_stat.st_mtime, entry_stat.st_size, entry_path))
+                    total_size += entry_stat.st_size
+            if total_size <= self.max_size:
+                return
+            entries.sort()
+            for _mtime, size, entry_path in entries:
+                try:
+                    os.remove(entry_path)
+                except OSError:
+                    continue
+                total_size -= size
+                if total_size <= self.max_size:
+                    break
+
+
+RESPONSE_CACHE = ResponseCache()
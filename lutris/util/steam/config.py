@@ -3,10 +3,9 @@
 import os
 from collections import OrderedDict
 
-import requests
-
 from lutris import settings
 from lutris.util import system
+from lutris.util.http import get_session
 from lutris.util.log import logger
 from lutris.util.steam.steamid import SteamID
 from lutris.util.steam.vdfutils import vdf_parse
@@ -138,7 +137,7 @@ def get_steam_library(steamid):
         "?key={}&steamid={}&format=json&include_appinfo=1"
         "&include_played_free_games=1".format(settings.STEAM_API_KEY, steamid)
     )
-    response = requests.get(steam_games_url, timeout=30)
+    response = get_session().get(steam_games_url, timeout=30)
     if response.status_code > 400:
         logger.error("Invalid response from steam: %s", response)
         return []
@@ -1,5 +1,6 @@
 """System utilities"""
 
+import fcntl
 import hashlib
 import os
 import re
@@ -8,6 +9,7 @@ import signal
 import stat
 import string
 import subprocess
+import threading
 import zipfile
 from gettext import gettext as _
 from pathlib import Path
@@ -32,6 +34,15 @@ PROTECTED_HOME_FOLDERS = (
     _("Games"),
 )
 
+# Size of the reads done to compute the checksum of a file
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# ioctl cloning a file on copy-on-write file systems (Btrfs, XFS, bcachefs...)
+FICLONE = 0x40049409
+
+# Most data copied by each copy_file_range() call
+COPY_RANGE_SIZE = 1024 * 1024 * 1024
+
 
 def get_environment():
     """Return a safe to use copy of the system's environment.
@@ -221,13 +232,26 @@ def read_file_md5(filedesc):
     return md5.hexdigest()
 
 
+def update_hash_from_file(hasher, filename, size=None):
+    """Feed the first `size` bytes of a file, or all of it, to a hashlib hasher.
+    The file is read in large blocks into a single reused buffer."""
+    buffer = memoryview(bytearray(HASH_BUFFER_SIZE))
+    with open(filename, "rb", buffering=0) as input_file:
+        remaining = size
+        while remaining is None or remaining > 0:
+            block = buffer if remaining is None or remaining >= len(buffer) else buffer[:remaining]
+            length = input_file.readinto(block)
+            if not length:
+                break
+            hasher.update(block[:length])
+            if remaining is not None:
+                remaining -= length
+    return hasher
+
+
 def get_file_checksum(filename, hash_type):
     """Return the checksum of type `hash_type` for a given filename"""
-    hasher = hashlib.new(hash_type)
-    with open(filename, "rb") as input_file:
-        for chunk in iter(lambda: input_file.read(4096), b""):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+    return update_hash_from_file(hashlib.new(hash_type), filename).hexdigest()
 
 
 def is_executable(exec_path):
@@ -328,11 +352,12 @@ def substitute(string_template: str, variables):
 
 
 def merge_folders(source, destination):
-    """Merges the content of source to destination"""
+    """Merges the content of source to destination, and returns the number of bytes copied"""
     logger.debug("Merging %s into %s", source, destination)
     # We do not use shutil.copytree() here because that would copy
     # the file permissions, and we do not want them.
     source = os.path.abspath(source)
+    copied_size = 0
     for dirpath, dirnames, filenames in os.walk(source):
         source_relpath = dirpath[len(source) :].strip("/")
         dst_abspath = os.path.join(destination, source_relpath)
@@ -347,7 +372,110 @@ def merge_folders(source, destination):
             # logger.debug("Copying %s", filename)
             if not os.path.exists(dst_abspath):
                 os.makedirs(dst_abspath)
-            shutil.copy(os.path.join(dirpath, filename), os.path.join(dst_abspath, filename), follow_symlinks=False)
+            source_path = os.path.join(dirpath, filename)
+            copy_file(source_path, os.path.join(dst_abspath, filename), follow_symlinks=False)
+            copied_size += os.lstat(source_path).st_size
+    return copied_size
+
+
+def move_folder_contents(source, destination):
+    """Moves the content of source into destination, merging it with the folders
+    there and replacing files. Unlike merge_folders(), files are renamed rather than
+    copied when both folders are on the same file system; source is left empty."""
+    os.makedirs(destination, exist_ok=True)
+    for name in os.listdir(source):
+        source_path = os.path.join(source, name)
+        destination_path = os.path.join(destination, name)
+        if os.path.isdir(destination_path):
+            if os.path.isdir(source_path) and not os.path.islink(source_path):
+                move_folder_contents(source_path, destination_path)
+                continue
+        elif os.path.lexists(destination_path):
+            os.remove(destination_path)
+        shutil.move(source_path, destination_path)
+
+
+def reflink_file(source, destination):
+    """Create destination as a copy-on-write clone of source, sharing its data on disk
+    until either is modified. Returns False, and leaves destination as it was, if that
+    can't be done, like on file systems without clones. The clone is made under a temporary name, which replaces
+    destination only once it's complete."""
+    temp_path = "%s.%s-%s.reflink" % (destination, os.getpid(), threading.get_ident())
+    created = False
+    try:
+        with open(source, "rb") as source_file, open(temp_path, "xb") as temp_file:
+            created = True
+            cloned = _clone_file(source_file, temp_file)
+        if cloned:
+            os.replace(temp_path, destination)
+            return True
+    except OSError:
+        pass
+    if created and os.path.exists(temp_path):
+        os.remove(temp_path)
+    return False
+
+
+def copy_file(source, destination, follow_symlinks=True, preserve_metadata=False):
+    """Copy a file like shutil.copy() does, or like shutil.copy2() with preserve_metadata,
+    but without reading the data through Lutris when the kernel can copy it. The copy
+    is a copy-on-write clone where the file system can do it, and otherwise is done
+    by copy_file_range(), which some file systems and NFS do without moving the data.
+    Returns the path of the copy."""
+    if os.path.isdir(destination):
+        destination = os.path.join(destination, os.path.basename(source))
+    if not follow_symlinks and os.path.islink(source):
+        copy = shutil.copy2 if preserve_metadata else shutil.copy
+        return copy(source, destination, follow_symlinks=False)
+    # Opening destination for writing first would erase source
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        raise shutil.SameFileError("{!r} and {!r} are the same file".format(source, destination))
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        # Everything is written through this file, so that like shutil.copy(), this
+        # writes to the target of a symlink at destination rather than replacing it
+        if not _clone_file(source_file, destination_file):
+            _copy_file_range(source_file, destination_file)
+    if preserve_metadata:
+        shutil.copystat(source, destination)
+    else:
+        shutil.copymode(source, destination)
+    return destination
+
+
+def _clone_file(source_file, destination_file):
+    """Make the open destination_file a copy-on-write clone of source_file; returns False
+    if the file system can't do that."""
+    try:
+        fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    except OSError:
+        return False
+    return True
+
+
+def _copy_file_range(source_file, destination_file):
+    """Copy the data of an open file to another with copy_file_range(), or with
+    shutil.copyfileobj() where the kernel or file systems don't support it, like between
+    different file systems on older kernels."""
+    if hasattr(os, "copy_file_range"):
+        try:
+            size = os.fstat(source_file.fileno()).st_size
+            copied = 0
+            while True:
+                length = os.copy_file_range(source_file.fileno(), destination_file.fileno(), COPY_RANGE_SIZE)
+                if not length:
+                    break
+                copied += length
+            # copy_file_range() can return 0 before the end of the file on some
+            # file systems, like FUSE or network ones
+            if copied >= size:
+                return
+            logger.debug("copy_file_range() copied %s of %s bytes of %s", copied, size, source_file.name)
+        except OSError as ex:
+            logger.debug("Unable to copy %s with copy_file_range(): %s", source_file.name, ex)
+        source_file.seek(0)
+        destination_file.seek(0)
+        destination_file.truncate()
+    shutil.copyfileobj(source_file, destination_file)
 
 
 def remove_folder(
@@ -586,22 +714,6 @@ def update_desktop_icons():
         execute(["gtk-update-icon-cache", "-tf", os.path.join(settings.RUNTIME_DIR, "icons/hicolor")], quiet=True)
 
 
-def get_disk_size(path: str) -> int:
-    """Return the disk size in bytes of a file or folder"""
-
-    def get_file_size(file_path):
-        return os.stat(file_path).st_size
-
-    if os.path.isfile(path):
-        return get_file_size(path)
-
-    total_size = 0
-    for base, _dirs, files in os.walk(path):
-        paths = [os.path.join(base, f) for f in files]
-        total_size += sum(get_file_size(p) for p in paths if os.path.isfile(p) and not os.path.islink(p))
-    return total_size
-
-
 def get_locale_list():
     """Return list of available locales"""
     try:
@@ -1,7 +1,15 @@
+import hashlib
+import os
+import tempfile
 from unittest import TestCase
+from unittest.mock import patch
 
+from lutris import cache
 from lutris.installer.errors import ScriptingError
+from lutris.installer.installer_file import InstallerFile
 from lutris.installer.interpreter import ScriptInterpreter
+from lutris.installer.metrics import InstallMetrics, read_reports
+from lutris.util.downloader import Downloader
 
 TEST_INSTALLER = {
     "script": {"game": {"exe": "test"}},
@@ -58,3 +66,144 @@ class TestScriptInterpreter(TestCase):
         with self.assertRaises(ScriptingError) as ex:
             interpreter._map_command({"_substitute": "foo"})
         self.assertEqual(ex.exception.message, 'The command "substitute" does not exist.')
+
+    def test_get_pending_dependencies(self):
+        interpreter = MockInterpreter(TEST_INSTALLER, None)
+        interpreter.pending_files = {
+            "installer": {"installer": "/cache/setup.exe"},
+            "patch_files": {"patch1": "/cache/patch1.zip", "patch2": "/cache/patch2.zip"},
+            "setup-file": {"setup-file": "/cache/setup-1.0.exe"},
+        }
+        self.assertEqual(interpreter.get_pending_dependencies({"mkdir": "$GAMEDIR/saves"}), set())
+        self.assertEqual(interpreter.get_pending_dependencies({"extract": {"file": "installer"}}), {"installer"})
+        self.assertEqual(
+            interpreter.get_pending_dependencies({"execute": {"args": "/S $installer", "file": "wine"}}), {"installer"}
+        )
+        self.assertEqual(interpreter.get_pending_dependencies({"extract": {"file": "patch2"}}), {"patch_files"})
+        self.assertEqual(interpreter.get_pending_dependencies({"extract": {"file": "$setup-file"}}), {"setup-file"})
+        self.assertEqual(interpreter.get_pending_dependencies({"extract": {"file": "setup-file"}}), {"setup-file"})
+        self.assertEqual(
+            interpreter.get_pending_dependencies({"execute": {"file": "${setup-file}"}}),
+            {"setup-file"},
+        )
+        self.assertEqual(
+            interpreter.get_pending_dependencies({"copy": {"src": "/cache/patch1.zip", "dst": "$GAMEDIR"}}),
+            {"patch_files"},
+        )
+        self.assertEqual(
+            interpreter.get_pending_dependencies({"move": {"src": "$CACHE/data", "dst": "$GAMEDIR"}}),
+            {"installer", "patch_files", "setup-file"},
+        )
+
+
+class TestInstallMetrics(TestCase):
+    def test_report(self):
+        interpreter = MockInterpreter(TEST_INSTALLER, None)
+        self.assertEqual(interpreter._get_command_label({"task": {"name": "wineexec"}}), "task:wineexec")
+        metrics = InstallMetrics("doom", "doom-gzdoom")
+        metrics.start_command(0, "extract")
+        metrics.add_bytes_extracted(1000)
+        metrics.start_command(1, "merge")
+        metrics.add_bytes_copied(300)
+        metrics.finish_command(error=OSError())
+        metrics.add_bytes_copied(5000)  # No command running
+        report = metrics.get_report()
+        self.assertEqual([command["command"] for command in report["commands"]], ["extract", "merge"])
+        self.assertEqual([command["status"] for command in report["commands"]], ["completed", "failed"])
+        self.assertEqual(report["bytes_extracted"], 1000)
+        self.assertEqual(report["bytes_copied"], 300)
+
+    def test_save_report(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch("lutris.installer.metrics.INSTALL_METRICS_PATH", os.path.join(temp_dir, "metrics.json")):
+                with patch("lutris.installer.metrics.MAX_REPORTS", 2):
+                    for slug in ("doom", "quake", "hexen"):
+                        metrics = InstallMetrics(slug)
+                        metrics.start_command(0, "mkdir")
+                        metrics.save_report()
+                reports = read_reports()
+        self.assertEqual([report["game_slug"] for report in reports], ["quake", "hexen"])
+        self.assertEqual(reports[0]["commands"][0]["command"], "mkdir")
+
+
+class TestInstallerFile(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "game.zip")
+        with open(self.path, "wb") as game_file:
+            game_file.write(b"game data")
+        self.checksum = hashlib.md5(b"game data").hexdigest()
+        self.installer_file = InstallerFile(
+            "test", "game-file", {"url": "http://example.com/game.zip", "checksum": "md5:" + self.checksum}
+        )
+        self.installer_file.override_dest_file(self.path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_downloader(self, checksum):
+        downloader = Downloader("http://example.com/game.zip", self.path, hash_type="md5")
+        downloader.checksum = checksum
+        return downloader
+
+    def test_check_hash_uses_download_checksum(self):
+        self.assertEqual(self.installer_file.hash_type, "md5")
+        self.installer_file.remember_download_checksum(self.get_downloader(self.checksum))
+        with patch("lutris.util.system.get_file_checksum") as get_file_checksum:
+            self.installer_file.check_hash()
+        get_file_checksum.assert_not_called()
+
+    def test_check_hash_reads_changed_file(self):
+        self.installer_file.remember_download_checksum(self.get_downloader("0" * 32))
+        with open(self.path, "ab") as game_file:
+            game_file.write(b" modified")
+        with self.assertRaises(ScriptingError):
+            self.installer_file.check_hash()
+
+
+class TestContentStore(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = patch("lutris.cache.get_cache_path", return_value=self.temp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.checksum = "md5:" + hashlib.md5(b"redistributable").hexdigest()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_file(self, *parts):
+        path = os.path.join(self.temp_dir.name, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as cached_file:
+            cached_file.write(b"redistributable")
+        return path
+
+    def test_get_content_path(self):
+        self.assertIsNone(cache.get_content_path(None))
+        self.assertIsNone(cache.get_content_path("nohash"))
+        self.assertIsNone(cache.get_content_path("md5:../../etc"))
+        self.assertIsNone(cache.get_content_path("nosuchhash:abcd"))
+        self.assertEqual(
+            cache.get_content_path("MD5:ABCD"),
+            os.path.join(self.temp_dir.name, cache.CONTENT_STORE_DIR, "md5", "ab", "abcd"),
+        )
+
+    def test_identical_files_are_stored_once(self):
+        first_path = self.write_file("game-1", "redist", "redist.exe")
+        second_path = self.write_file("game-2", "redist", "redist.exe")
+        content_path = cache.add_to_content_store(first_path, self.checksum)
+        self.assertEqual(cache.find_cached_content(self.checksum), content_path)
+        self.assertEqual(cache.add_to_content_store(second_path, self.checksum), content_path)
+        self.assertTrue(os.path.samefile(first_path, second_path))
+        self.assertTrue(cache.is_content_stored(second_path, self.checksum))
+        stats = cache.get_content_store_stats()
+        self.assertEqual(stats, {"files": 1, "size": len(b"redistributable"), "saved": len(b"redistributable")})
+
+    def test_restore_from_content_store(self):
+        destination = os.path.join(self.temp_dir.name, "game-3", "redist", "redist.exe")
+        self.assertFalse(cache.restore_from_content_store(self.checksum, destination))
+        cache.add_to_content_store(self.write_file("game-1", "redist", "redist.exe"), self.checksum)
+        self.assertTrue(cache.restore_from_content_store(self.checksum, destination))
+        with open(destination, "rb") as restored_file:
+            self.assertEqual(restored_file.read(), b"redistributable")
@@ -1,10 +1,22 @@
+import json
 import os
+import threading
+import time
 import unittest
 from sqlite3 import OperationalError
+from unittest.mock import patch
 
 from lutris import settings
+from lutris.database import categories as categories_db
+from lutris.database import fulltext, schema, sql
 from lutris.database import games as games_db
-from lutris.database import schema, sql
+from lutris.database.catalogue import CATALOGUE
+from lutris.database.services import ServiceGameCollection
+from lutris.search import GameSearch, SearchResultCache
+from lutris.services import SERVICES
+from lutris.services.gog import GOGGame
+from lutris.services.service_game import ServiceGame, sync_service_library
+from lutris.services.service_media import ServiceMedia, get_media_urls
 from lutris.util.test_config import setup_test_environment
 
 setup_test_environment()
@@ -52,6 +64,149 @@ class TestPersonnalGameArchive(DatabaseTester):
         self.assertEqual(len(game_list), 1)
         self.assertEqual(game_list[0]["name"], "installed_game")
 
+    def test_add_games_bulk(self):
+        game_ids = games_db.add_games_bulk(
+            [{"name": "foo", "slug": "foo", "runner": "linux"}, {"name": "bar", "slug": "bar", "runner": "wine"}]
+        )
+        self.assertEqual(len(game_ids), 2)
+        self.assertEqual(games_db.get_game_by_field(game_ids[0], "id")["slug"], "foo")
+        self.assertEqual(games_db.get_game_by_field(game_ids[1], "id")["slug"], "bar")
+
+    def test_upsert_many(self):
+        sql.db_insert(settings.DB_PATH, "service_games", {"service": "gog", "appid": "1", "name": "old"})
+        sql.db_upsert_many(
+            settings.DB_PATH,
+            "service_games",
+            [
+                {"service": "gog", "appid": "1", "name": "updated"},
+                {"service": "gog", "appid": "2", "name": "new"},
+                {"service": "steam", "appid": "1", "name": "other service"},
+            ],
+            ("service", "appid"),
+        )
+        rows = sql.db_query(settings.DB_PATH, "select service, appid, name from service_games order by id")
+        self.assertEqual(
+            rows,
+            [
+                {"service": "gog", "appid": "1", "name": "updated"},
+                {"service": "gog", "appid": "2", "name": "new"},
+                {"service": "steam", "appid": "1", "name": "other service"},
+            ],
+        )
+
+    def test_sync(self):
+        sql.db_insert_many(
+            settings.DB_PATH,
+            "service_games",
+            [
+                {"service": "gog", "appid": "1", "name": "same", "content_hash": "a"},
+                {"service": "gog", "appid": "2", "name": "old", "content_hash": "b"},
+                {"service": "gog", "appid": "3", "name": "removed", "content_hash": "c"},
+                {"service": "gog", "appid": "3", "name": "duplicate", "content_hash": "c"},
+                {"service": "steam", "appid": "3", "name": "other service", "content_hash": "d"},
+            ],
+        )
+        counts = sql.db_sync(
+            settings.DB_PATH,
+            "service_games",
+            [
+                {"service": "gog", "appid": 1, "name": "same", "content_hash": "a"},
+                {"service": "gog", "appid": "2", "name": "updated", "content_hash": "e"},
+                {"service": "gog", "appid": "4", "name": "new", "content_hash": "f"},
+            ],
+            ("service", "appid"),
+            {"service": "gog"},
+            "content_hash",
+        )
+        self.assertEqual(counts, (1, 1, 2))
+        rows = sql.db_query(settings.DB_PATH, "select service, appid, name from service_games order by id")
+        self.assertEqual(
+            [(row["service"], row["appid"], row["name"]) for row in rows],
+            [("gog", "1", "same"), ("gog", "2", "updated"), ("steam", "3", "other service"), ("gog", "4", "new")],
+        )
+
+    def test_sync_service_library(self):
+        game = ServiceGame()
+        game.service = "gog"
+        game.appid = "1"
+        game.name = "Quake"
+        game.save()
+        with sync_service_library("gog"):
+            game.name = "Quake II"
+            game.save()
+            self.assertEqual(ServiceGameCollection.get_game("gog", "1")["name"], "Quake")
+        self.assertEqual(ServiceGameCollection.get_game("gog", "1")["name"], "Quake II")
+        with sync_service_library("gog"):
+            pass
+        self.assertEqual(ServiceGameCollection.get_for_service("gog"), [])
+
+    def test_service_game_columns(self):
+        details = {"worksOn": {"Windows": True, "Linux": False}, "releaseDate": {"date": "1996-06-22 00:00:00"}}
+        game = GOGGame()
+        game.appid = "1"
+        game.details = json.dumps(details)
+        game.save()
+        row = ServiceGameCollection.get_game("gog", "1")
+        self.assertEqual(row["release_date"], "1996-06-22")
+        self.assertEqual(json.loads(row["platforms"]), ["Windows"])
+        rows = sql.db_query(
+            settings.DB_PATH, "select json_extract(details, '$.worksOn.Windows') as windows from service_games"
+        )
+        self.assertEqual(rows, [{"windows": 1}])
+        # Rows saved by older versions have their details parsed instead
+        old_row = {"details": game.details, "platforms": None, "release_date": None}
+        self.assertEqual(GOGGame.get_row_platforms(old_row), ["Windows"])
+        self.assertEqual(GOGGame.get_row_release_date(old_row), "1996-06-22")
+
+    def test_get_media_urls(self):
+        class Banner(ServiceMedia):
+            service = "gog"
+            dest_path = None
+            api_field = "image"
+            url_pattern = "https:%s_banner.jpg"
+
+        class Icon(Banner):
+            url_pattern = "https:%s_icon.png"
+
+        class LocalIcon(Banner):
+            source = "local"
+
+        sql.db_insert_many(
+            settings.DB_PATH,
+            "service_games",
+            [
+                {"service": "gog", "slug": "quake", "details": '{"image": "//images/quake"}'},
+                {"service": "gog", "slug": "doom", "details": '{"image": ""}'},
+                {"service": "gog", "slug": "hexen", "details": ""},
+            ],
+        )
+
+        class Cover(Banner):
+            def get_media_url(self, details):
+                return details["image"] and "https:%s_cover.jpg" % details["image"]
+
+        medias = [Banner(), Icon(), LocalIcon(), Cover()]
+        with patch("lutris.services.service_media.json.loads", wraps=json.loads) as loads:
+            media_urls = get_media_urls(medias)
+        self.assertEqual(loads.call_count, 2)  # Only for Cover, once per game with details
+        self.assertEqual(media_urls[medias[3]], {"quake": "https://images/quake_cover.jpg"})
+        self.assertEqual(media_urls[medias[0]], {"quake": "https://images/quake_banner.jpg"})
+        self.assertEqual(media_urls[medias[1]], {"quake": "https://images/quake_icon.png"})
+        self.assertEqual(media_urls[medias[2]], {})
+        self.assertEqual(medias[1].get_media_urls(), {"quake": "https://images/quake_icon.png"})
+
+    def test_get_compact_rows(self):
+        games_db.add_game(name="LutrisTest", runner="Linux")
+        game = games_db.get_games(compact=True)[0]
+        self.assertIsInstance(game, sql.Row)
+        self.assertEqual(game["name"], "LutrisTest")
+        self.assertEqual(game.get("runner"), "Linux")
+        self.assertIsNone(game.get("not_a_column"))
+        self.assertIn("slug", game)
+        self.assertEqual(dict(game), games_db.get_games()[0])
+        with self.assertRaises(KeyError):
+            game["not_a_column"]
+
     def test_game_with_same_slug_is_updated(self):
         games_db.add_game(name="some game", runner="linux")
         game = games_db.get_game_by_field("some-game", "slug")
@@ -61,6 +216,309 @@ class TestPersonnalGameArchive(DatabaseTester):
         self.assertEqual(game["directory"], "/foo")
 
 
+class TestConnectionPool(DatabaseTester):
+    def test_connection_is_reused_in_thread(self):
+        with sql.db_cursor(settings.DB_PATH) as cursor:
+            first_connection = cursor.connection
+        with sql.db_cursor(settings.DB_PATH) as cursor:
+            self.assertIs(cursor.connection, first_connection)
+
+    def test_threads_get_their_own_connection(self):
+        connections = []
+
+        def get_connection():
+            with sql.db_cursor(settings.DB_PATH) as cursor:
+                connections.append(cursor.connection)
+
+        get_connection()
+        thread = threading.Thread(target=get_connection)
+        thread.start()
+        thread.join()
+        self.assertIsNot(connections[0], connections[1])
+
+    def test_nested_cursors_share_a_transaction(self):
+        with self.assertRaises(ValueError):
+            with sql.db_cursor(settings.DB_PATH):
+                games_db.add_game(name="LutrisTest", runner="Linux")
+                raise ValueError("Rollback")
+        self.assertEqual(games_db.get_games(), [])
+
+    def test_reconnects_when_database_is_replaced(self):
+        games_db.add_game(name="LutrisTest", runner="Linux")
+        os.remove(settings.DB_PATH)
+        schema.syncdb()
+        self.assertEqual(games_db.get_games(), [])
+
+
+class TestGameCatalogue(DatabaseTester):
+    def test_lookups(self):
+        game_id = games_db.add_game(name="LutrisTest", runner="wine", service="gog", service_id="123", installed=1)
+        games_db.add_game(name="Other", runner="linux")
+        self.assertEqual(games_db.get_game_by_field(game_id, "id")["name"], "LutrisTest")
+        self.assertEqual(games_db.get_game_by_field(str(game_id), "id")["name"], "LutrisTest")
+        self.assertEqual([g["id"] for g in games_db.get_games_by_slug("lutristest")], [game_id])
+        self.assertEqual([g["id"] for g in games_db.get_games_by_runner("wine")], [game_id])
+        self.assertEqual(games_db.get_game_for_service("gog", 123)["id"], game_id)
+        self.assertEqual(games_db.get_service_games("gog"), {"123"})
+        self.assertEqual(games_db.get_service_games("lutris"), {"lutristest"})
+
+    def test_service_installed_search(self):
+        games_db.add_game(name="LutrisTest", runner="wine", service="gog", service_id="123", installed=1)
+        service_games = [{"appid": str(appid), "name": "Game %s" % appid} for appid in range(120, 130)]
+        with patch.object(games_db, "get_service_games", wraps=games_db.get_service_games) as get_service_games:
+            search = GameSearch("installed:yes", service=SERVICES["gog"]())
+            self.assertEqual([game["appid"] for game in service_games if search.matches(game)], ["123"])
+        self.assertEqual(get_service_games.call_count, 1)
+        with patch.object(CATALOGUE, "_get_rows", side_effect=AssertionError):
+            self.assertEqual(games_db.get_service_games("gog"), {"123"})
+
+    def test_catalogue_follows_updates(self):
+        game_id = games_db.add_game(name="LutrisTest", runner="wine")
+        self.assertEqual(games_db.get_service_games("lutris"), set())
+        games_db.update_game(game_id, installed=1, runner="linux")
+        self.assertEqual(games_db.get_service_games("lutris"), {"lutristest"})
+        self.assertEqual(games_db.get_games_by_runner("wine"), [])
+        games_db.delete_game(game_id)
+        self.assertEqual(games_db.get_game_by_field(game_id, "id"), {})
+        self.assertEqual(games_db.get_games_by_slug("lutristest"), [])
+
+    def test_returned_rows_are_copies(self):
+        game_id = games_db.add_game(name="LutrisTest", runner="wine")
+        game = games_db.get_game_by_field(game_id, "id")
+        game["name"] = "Changed"
+        self.assertEqual(games_db.get_game_by_field(game_id, "id")["name"], "LutrisTest")
+
+
+class TestQueryPlans(DatabaseTester):
+    """Make sure the frequent queries are backed by indexes rather than full table scans"""
+
+    def assertUsesIndexes(self, query_function, *args, **kwargs):
+        with patch.object(sql, "db_query", wraps=sql.db_query) as db_query:
+            query_function(*args, **kwargs)
+        query, params = (db_query.call_args[0][1:] + ((),))[:2]
+        plan = sql.db_query(settings.DB_PATH, "EXPLAIN QUERY PLAN " + query, params)
+        for step in plan:
+            # Scans show as "SCAN games", or "SCAN games USING [COVERING] INDEX ..." when
+            # the index only saves sorting; lookups show as "SEARCH games USING ..."
+            self.assertFalse(step["detail"].startswith("SCAN "), "Full scan in: %s\n%s" % (query, step["detail"]))
+
+    def test_full_scans_are_detected(self):
+        with self.assertRaises(AssertionError):
+            self.assertUsesIndexes(games_db.get_games, filters={"name": "Quake"})
+        with self.assertRaises(AssertionError):
+            # A scan of a covering index still reads every row
+            self.assertUsesIndexes(lambda: sql.db_query(settings.DB_PATH, "SELECT service, appid FROM service_games"))
+
+    def test_game_queries_use_indexes(self):
+        self.assertUsesIndexes(games_db.get_games, filters={"service": "gog", "service_id": "123"})
+        self.assertUsesIndexes(games_db.get_games, filters={"installed": 1})
+        self.assertUsesIndexes(games_db.get_games, filters={"service": "steam", "installed": 1})
+        self.assertUsesIndexes(games_db.get_games, filters={"runner": "wine"})
+        self.assertUsesIndexes(games_db.get_games, filters={"slug": "quake"})
+        self.assertUsesIndexes(games_db.get_games_where, installed=1, runner="linux")
+        self.assertUsesIndexes(games_db.get_games_where, lastplayed__lessthan=1000)
+        self.assertUsesIndexes(games_db.get_games_where, id__in=[1, 2, 3])
+
+    def test_service_game_queries_use_indexes(self):
+        self.assertUsesIndexes(sql.filtered_query, settings.DB_PATH, "service_games", filters={"service": "gog"})
+        self.assertUsesIndexes(
+            sql.filtered_query, settings.DB_PATH, "service_games", filters={"service": "gog", "appid": "123"}
+        )
+
+    def test_category_joins_use_indexes(self):
+        self.assertUsesIndexes(categories_db.get_categories_in_game, 1)
+
+
+class TestSearchSQL(DatabaseTester):
+    """Searches translated to SQL must find the same games as the Python predicates"""
+
+    def setUp(self):
+        super().setUp()
+        now = time.time()
+        games_db.add_game(name="Quake", runner="linux", platform="Linux", installed=1, playtime=12.5)
+        games_db.add_game(name="Doom", runner="wine", platform="Windows", installed=1, lastplayed=now - 7200)
+        games_db.add_game(name="Zelda", runner="dolphin", platform="Nintendo GameCube", playtime=0.5)
+        games_db.add_game(name="Tetris", platform=None, installed=0)
+        categories_db.add_game_to_category(1, categories_db.add_category("shooters", no_signal=True))
+
+    def assertSameResults(self, text):
+        search = GameSearch(text)
+        expected = [game["name"] for game in games_db.get_games() if search.matches(game)]
+        condition, remaining_search = GameSearch(text).split_sql()
+        games = games_db.get_games(conditions=[condition] if condition else [])
+        actual = [game["name"] for game in games if remaining_search.matches(game)]
+        self.assertEqual(actual, expected, text)
+        return condition, remaining_search
+
+    def test_translated_searches(self):
+        for text in (
+            "installed:yes",
+            "installed:no",
+            "runner:wine",
+            "runner:Dolphin",
+            "platform:nintendo",
+            "playtime:>1h",
+            "playtime:<1h",
+            "lastplayed:<3h",
+            "lastplayed:>3h",
+            "category:shooters",
+            "-category:shooters",
+            "installed:yes OR platform:windows",
+        ):
+            condition, remaining_search = self.assertSameResults(text)
+            self.assertTrue(condition, text)
+            self.assertTrue(remaining_search.is_empty, text)
+
+    def test_partially_translated_searches(self):
+        condition, remaining_search = self.assertSameResults("installed:yes qua")
+        self.assertTrue(condition)
+        self.assertEqual(str(remaining_search.get_predicate()), "qua")
+        condition, remaining_search = self.assertSameResults("qua OR installed:no")
+        self.assertIsNone(condition)
+        self.assertSameResults("playtime:12h")
+
+
+class TestFullTextSearch(DatabaseTester):
+    def setUp(self):
+        super().setUp()
+        games_db.add_game(name="Half-Life 2", sortname="Half-Life 2", runner="linux")
+        games_db.add_game(name="Black Mesa", sortname="Half-Life Remake", runner="wine")
+        games_db.add_game(name="Pokémon Snap", runner="mupen64plus")
+        games_db.add_game(name="Quake", runner="linux")
+
+    def search(self, text, **kwargs):
+        return [game["name"] for game in fulltext.search_games(text, **kwargs)]
+
+    def test_match_query(self):
+        self.assertEqual(fulltext.get_match_query("half-life OR"), '"half"* "life"* "OR"*')
+        self.assertIsNone(fulltext.get_match_query(" - "))
+
+    def test_prefix_and_token_queries(self):
+        self.assertEqual(self.search("qua"), ["Quake"])
+        self.assertEqual(self.search("life hal"), ["Half-Life 2", "Black Mesa"])
+        self.assertEqual(self.search("pokemon"), ["Pokémon Snap"])
+        self.assertEqual(self.search("life", filters={"runner": "wine"}), ["Black Mesa"])
+        self.assertEqual(self.search("life", limit=1), ["Half-Life 2"])
+        self.assertEqual(self.search("uake"), [])
+
+    def test_index_follows_changes(self):
+        games_db.update_game(4, name="Quake II")
+        self.assertEqual(self.search("quake ii"), ["Quake II"])
+        games_db.delete_game(4)
+        self.assertEqual(self.search("quake"), [])
+        games_db.add_games_bulk([{"name": "Quake III Arena", "runner": "linux"}])
+        self.assertEqual(self.search("arena"), ["Quake III Arena"])
+
+    def test_service_games(self):
+        sql.db_upsert_many(
+            settings.DB_PATH,
+            "service_games",
+            [
+                {"service": "gog", "appid": "1", "name": "Quake"},
+                {"service": "steam", "appid": "2", "name": "Quake Champions"},
+            ],
+            ("service", "appid"),
+        )
+        games = fulltext.search_service_games("quake")
+        self.assertEqual([game["name"] for game in games], ["Quake", "Quake Champions"])
+        games = fulltext.search_service_games("quake", service="steam")
+        self.assertEqual([game["appid"] for game in games], ["2"])
+
+    def test_fallback_without_index(self):
+        with patch.object(fulltext, "has_full_text_index", return_value=False):
+            self.assertEqual(self.search("life"), ["Black Mesa", "Half-Life 2"])
+            self.assertEqual(self.search("uake"), ["Quake"])
+
+    def test_game_search(self):
+        games = games_db.get_games()
+        search = GameSearch("life installed:no", full_text=True)
+        self.assertEqual([game["name"] for game in games if search.matches(game)], ["Black Mesa", "Half-Life 2"])
+        search = GameSearch("-hal", full_text=True)
+        self.assertEqual([game["name"] for game in games if search.matches(game)], ["Pokémon Snap", "Quake"])
+        with patch.object(fulltext, "has_full_text_index", return_value=False):
+            search = GameSearch("uake", full_text=True)
+            self.assertEqual([game["name"] for game in games if search.matches(game)], ["Quake"])
+
+    def test_service_game_search(self):
+        sql.db_upsert_many(
+            settings.DB_PATH,
+            "service_games",
+            [
+                {"service": "steam", "appid": "1", "name": "Half-Life"},
+                {"service": "gog", "appid": "2", "name": "Half-Life"},
+            ],
+            ("service", "appid"),
+        )
+        service_games = sql.filtered_query(settings.DB_PATH, "service_games")
+        search = GameSearch("half", service=SERVICES["gog"](), full_text=True)
+        self.assertEqual([game["appid"] for game in service_games if search.matches(game)], ["2"])
+
+    def test_game_search_narrowing(self):
+        self.assertTrue(GameSearch("quake", full_text=True).narrows(GameSearch("Qua", full_text=True)))
+        self.assertTrue(GameSearch("half life", full_text=True).narrows(GameSearch("lif", full_text=True)))
+        self.assertFalse(GameSearch("aqua", full_text=True).narrows(GameSearch("qua", full_text=True)))
+        self.assertFalse(GameSearch("qua", full_text=True).narrows(GameSearch("quake", full_text=True)))
+        cache = SearchResultCache(games_db.get_games())
+        self.assertEqual(len(cache.filter([GameSearch("hal", full_text=True)])), 2)
+        with patch.object(fulltext, "search_games", side_effect=AssertionError):
+            # Searching again needs no full-text query
+            self.assertEqual(len(cache.filter([GameSearch("HAL", full_text=True)])), 2)
+
+
+class CountingGame(dict):
+    """A game dict that counts how often it is looked at"""
+
+    lookups = 0
+
+    def __getitem__(self, key):
+        CountingGame.lookups += 1
+        return super().__getitem__(key)
+
+
+class TestSearchResultCache(unittest.TestCase):
+    def setUp(self):
+        names = ["Quake", "Quake II", "Quantum Break", "Doom", "Half-Life", "Half-Life 2"]
+        self.games = [CountingGame(name=name) for name in names]
+        self.cache = SearchResultCache(self.games)
+
+    def search(self, text):
+        CountingGame.lookups = 0
+        results = self.cache.filter([GameSearch(text)])
+        self.lookups = CountingGame.lookups
+        return [game["name"] for game in results]
+
+    def test_narrowing(self):
+        self.assertTrue(GameSearch("quake").narrows(GameSearch("Qua")))
+        self.assertTrue(GameSearch("half life").narrows(GameSearch("half")))
+        self.assertTrue(GameSearch("quake directory:id").narrows(GameSearch("quake")))
+        self.assertTrue(GameSearch("quake").narrows(GameSearch("")))
+        self.assertTrue(GameSearch("quake").narrows(GameSearch("quake OR doom")))
+        self.assertTrue(GameSearch("quake OR quantum").narrows(GameSearch("qua")))
+        self.assertFalse(GameSearch("qua").narrows(GameSearch("quake")))
+        self.assertFalse(GameSearch("directory:quake").narrows(GameSearch("quake")))
+        self.assertFalse(GameSearch("quake OR doom").narrows(GameSearch("quake")))
+        self.assertFalse(GameSearch("-quake").narrows(GameSearch("-qua")))
+
+    def test_extended_search_tests_earlier_results(self):
+        self.assertEqual(self.search("qua"), ["Quake", "Quake II", "Quantum Break"])
+        self.assertEqual(self.lookups, len(self.games))
+        self.assertEqual(self.search("quake"), ["Quake", "Quake II"])
+        self.assertEqual(self.lookups, 3)
+        self.assertEqual(self.search("quake i"), ["Quake II"])
+        self.assertEqual(self.lookups, 2)
+
+    def test_repeated_search_is_cached(self):
+        self.assertEqual(self.search("half"), ["Half-Life", "Half-Life 2"])
+        self.assertEqual(self.search("half-life 2"), ["Half-Life 2"])
+        self.assertEqual(self.search("HALF"), ["Half-Life", "Half-Life 2"])
+        self.assertEqual(self.lookups, 0)
+
+    def test_unrelated_search_tests_all_candidates(self):
+        self.search("quake")
+        self.assertEqual(self.search("doom"), ["Doom"])
+        self.assertEqual(self.lookups, len(self.games))
+
+
 class TestDbCreator(DatabaseTester):
     def test_can_generate_fields(self):
         text_field = schema.field_to_string("name", "TEXT")
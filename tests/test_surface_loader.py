@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from gi.repository import GLib
+
+from lutris.gui.widgets.surface_loader import SurfaceLoader
+
+COVER_PATH = "/media/covers/quake.jpg"
+BANNER_PATH = "/media/banners/quake.jpg"
+
+
+class TestSurfaceLoader(unittest.TestCase):
+    def setUp(self):
+        self.loader = SurfaceLoader(max_workers=1)
+        self.gate = threading.Event()  # holds the slow load, so the others queue up
+        self.slow_load_started = threading.Event()
+        self.load_pixbuf = Mock(side_effect=self.fake_load_pixbuf)
+        self.loaded = []  # keys passed to the callback
+        self.callback_threads = []
+
+    def fake_load_pixbuf(self, path):
+        if path == "/media/slow.jpg":
+            self.slow_load_started.set()
+            self.assertTrue(self.gate.wait(5))
+        return "surface of %s" % path
+
+    def request(self, path, priority=0):
+        key = "widget", path, (128, 128), True
+        self.loader.request(key, lambda: self.load_pixbuf(path), priority, self.on_loaded)
+        return key
+
+    def on_loaded(self, keys):
+        self.callback_threads.append(threading.current_thread())
+        self.loaded.extend(keys)
+
+    def run_main_loop(self, expected_count):
+        """Runs the main loop until the callback got expected_count keys"""
+        loop = GLib.MainLoop()
+        deadline = time.monotonic() + 5
+
+        def check():
+            if len(self.loaded) >= expected_count or time.monotonic() > deadline:
+                loop.quit()
+                return False
+            return True
+
+        GLib.timeout_add(10, check)
+        loop.run()
+        self.assertEqual(len(self.loaded), expected_count)
+
+    def test_requests_for_same_path_are_merged(self):
+        slow_key = self.request("/media/slow.jpg")
+        cover_key = self.request(COVER_PATH, priority=5)
+        self.request(COVER_PATH, priority=5)
+        self.request(COVER_PATH, priority=1)  # more urgent, but still loaded once
+        self.request("/media/slow.jpg")  # loading already
+        self.gate.set()
+        self.run_main_loop(2)
+        self.assertEqual(self.loaded, [slow_key, cover_key])
+        self.assertEqual([call.args for call in self.load_pixbuf.call_args_list], [("/media/slow.jpg",), (COVER_PATH,)])
+        self.assertEqual(self.loader.take(cover_key), (True, "surface of %s" % COVER_PATH))
+        self.assertEqual(self.loader.take(cover_key), (False, None))
+
+    def test_cancelled_requests_are_dropped(self):
+        slow_key = self.request("/media/slow.jpg")
+        cover_key = self.request(COVER_PATH, priority=1)
+        banner_key = self.request(BANNER_PATH, priority=2)
+        self.assertTrue(self.slow_load_started.wait(5))
+        # The cover is cancelled before it's loaded, the slow one while it loads
+        self.loader.cancel([cover_key, slow_key])
+        self.assertFalse(self.loader.is_requested(cover_key))
+        self.gate.set()
+        self.run_main_loop(1)
+        self.assertEqual(self.loaded, [banner_key])
+        self.assertNotIn(COVER_PATH, [call.args[0] for call in self.load_pixbuf.call_args_list])
+        self.assertEqual(self.loader.take(slow_key), (False, None))
+        self.assertEqual(self.loader.take(banner_key), (True, "surface of %s" % BANNER_PATH))
+
+    def test_results_are_delivered_on_main_loop(self):
+        self.gate.set()
+        loaded_event = threading.Event()
+        self.load_pixbuf.side_effect = lambda path: loaded_event.set() or "surface"
+        key = self.request(COVER_PATH)
+        self.assertTrue(loaded_event.wait(5))
+        time.sleep(0.05)
+        self.assertEqual(self.loaded, [])  # not until the main loop runs
+        self.run_main_loop(1)
+        self.assertEqual(self.loaded, [key])
+        self.assertEqual(self.callback_threads, [threading.main_thread()])
@@ -1,8 +1,26 @@
+import gzip
+import hashlib
+import io
+import json
 import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+import zipfile
 from collections import OrderedDict
-from unittest import TestCase
-
-from lutris.util import fileio, strings, system
+from http.cookiejar import CookieJar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from lutris.util import fileio, http, strings, system
+from lutris.util.disk_size import DiskSizeCalculator
+from lutris.util.download_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, DownloadScheduler
+from lutris.util.downloader import Downloader
+from lutris.util.extract import ExtractError, extract_archive, extract_archive_with_size
+from lutris.util.http_cache import ResponseCache
 from lutris.util.steam import vdfutils
 from lutris.util.wine import wine
 
@@ -32,6 +50,87 @@ class TestFileUtils(TestCase):
         _files = {"foo-bar": "/foo/bar"}
         self.assertEqual(system.substitute(fileid, _files), "/foo/bar")
 
+    def test_copy_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, "game.exe")
+            with open(source, "wb") as source_file:
+                source_file.write(b"game" * 10000)
+            os.chmod(source, 0o750)
+            copy = system.copy_file(source, os.path.join(temp_dir, "copy.exe"))
+            with patch("lutris.util.system._clone_file", return_value=False):
+                with patch("os.copy_file_range", side_effect=OSError(18, "Invalid cross-device link"), create=True):
+                    fallback_copy = system.copy_file(source, os.path.join(temp_dir, "fallback.exe"))
+            for path in (copy, fallback_copy):
+                with open(path, "rb") as copied_file:
+                    self.assertEqual(copied_file.read(), b"game" * 10000)
+                self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o750)
+            with self.assertRaises(shutil.SameFileError):
+                system.copy_file(source, temp_dir)
+
+    def test_copy_file_to_symlink(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, "game.exe")
+            with open(source, "wb") as source_file:
+                source_file.write(b"game")
+            target = os.path.join(temp_dir, "target.exe")
+            with open(target, "wb") as target_file:
+                target_file.write(b"targetdata")
+            link = os.path.join(temp_dir, "link.exe")
+            os.symlink(target, link)
+            # Like shutil.copy(), the copy goes to the target of the link, even where
+            # the file system can't clone files
+            with patch("fcntl.ioctl", side_effect=OSError(95, "Operation not supported")):
+                system.copy_file(source, link)
+            self.assertTrue(os.path.islink(link))
+            with open(target, "rb") as target_file:
+                self.assertEqual(target_file.read(), b"game")
+
+    def test_failed_reflink_keeps_destination(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, "game.exe")
+            with open(source, "wb") as source_file:
+                source_file.write(b"game")
+            destination = os.path.join(temp_dir, "copy.exe")
+            with open(destination, "wb") as destination_file:
+                destination_file.write(b"old")
+            self.assertFalse(system.reflink_file(os.path.join(temp_dir, "missing.exe"), destination))
+            with patch("fcntl.ioctl", side_effect=OSError(95, "Operation not supported")):
+                self.assertFalse(system.reflink_file(source, destination))
+            with open(destination, "rb") as destination_file:
+                self.assertEqual(destination_file.read(), b"old")
+            self.assertEqual(sorted(os.listdir(temp_dir)), ["copy.exe", "game.exe"])
+
+    @skipUnless(hasattr(os, "copy_file_range"), "copy_file_range() is not available")
+    def test_copy_file_stopping_short(self):
+        copy_file_range = os.copy_file_range
+        lengths = []
+
+        def copy_one_block(source_fd, destination_fd, count):
+            # Like a file system reporting the end of the file after the first block
+            length = copy_file_range(source_fd, destination_fd, 1000) if not lengths else 0
+            lengths.append(length)
+            return length
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, "game.exe")
+            with open(source, "wb") as source_file:
+                source_file.write(b"game" * 10000)
+            with patch("lutris.util.system._clone_file", return_value=False):
+                with patch("os.copy_file_range", side_effect=copy_one_block):
+                    copy = system.copy_file(source, os.path.join(temp_dir, "copy.exe"))
+            self.assertEqual(lengths, [1000, 0])
+            with open(copy, "rb") as copied_file:
+                self.assertEqual(copied_file.read(), b"game" * 10000)
+
+    def test_file_checksum(self):
+        data = os.urandom(system.HASH_BUFFER_SIZE * 2 + 1234)
+        with tempfile.NamedTemporaryFile() as data_file:
+            data_file.write(data)
+            data_file.flush()
+            self.assertEqual(system.get_file_checksum(data_file.name, "sha256"), hashlib.sha256(data).hexdigest())
+            hasher = system.update_hash_from_file(hashlib.md5(), data_file.name, size=system.HASH_BUFFER_SIZE + 5)
+            self.assertEqual(hasher.hexdigest(), hashlib.md5(data[: system.HASH_BUFFER_SIZE + 5]).hexdigest())
+
 
 class TestSteamUtils(TestCase):
     def test_dict_to_vdf(self):
@@ -187,3 +286,504 @@ class TestSubstitute(TestCase):
     def test_can_sub_game_files_with_dashes_in_key(self):
         replacements = {"steam-data": "/tmp"}
         self.assertEqual(system.substitute("--path=$steam-data", replacements), "--path=/tmp")
+
+
+class TestDownloadScheduler(TestCase):
+    def start_waiting(self, scheduler, url, priority, started):
+        """Start a thread waiting for a slot, and wait until it is queued"""
+        waiting_count = scheduler.waiting_count
+
+        def download():
+            scheduler.acquire(url, priority)
+            started.append(url)
+
+        thread = threading.Thread(target=download, daemon=True)
+        thread.start()
+        while scheduler.waiting_count == waiting_count:
+            thread.join(0.01)
+        return thread
+
+    def test_limits_downloads_per_host(self):
+        scheduler = DownloadScheduler(max_downloads=3, max_downloads_per_host=1)
+        self.assertTrue(scheduler.acquire("https://a.example.com/1"))
+        self.assertTrue(scheduler.acquire("https://b.example.com/1"))
+        started = []
+        thread = self.start_waiting(scheduler, "https://a.example.com/2", PRIORITY_INTERACTIVE, started)
+        self.assertEqual(started, [])
+        scheduler.release("https://a.example.com/1")
+        thread.join()
+        self.assertEqual(started, ["https://a.example.com/2"])
+
+    def test_urgent_downloads_start_first(self):
+        scheduler = DownloadScheduler(max_downloads=1)
+        self.assertTrue(scheduler.acquire("https://example.com/running"))
+        started = []
+        threads = [
+            self.start_waiting(scheduler, "https://example.com/media", PRIORITY_BACKGROUND, started),
+            self.start_waiting(scheduler, "https://example.com/installer", PRIORITY_INTERACTIVE, started),
+        ]
+        scheduler.release("https://example.com/running")
+        threads[1].join()
+        self.assertEqual(started, ["https://example.com/installer"])
+        scheduler.release("https://example.com/installer")
+        threads[0].join()
+        self.assertEqual(started, ["https://example.com/installer", "https://example.com/media"])
+
+    def test_cancelled_download_gets_no_slot(self):
+        scheduler = DownloadScheduler(max_downloads=1)
+        with scheduler.slot("https://example.com/1") as started:
+            self.assertTrue(started)
+            with scheduler.slot("https://example.com/2", is_cancelled=lambda: True) as cancelled_started:
+                self.assertFalse(cancelled_started)
+        self.assertEqual(scheduler.active_count, 0)
+        self.assertEqual(scheduler.waiting_count, 0)
+
+    def test_throughput(self):
+        scheduler = DownloadScheduler()
+        scheduler.transferred(1000)
+        scheduler.transferred(4000)
+        self.assertEqual(scheduler.total_transferred, 5000)
+        self.assertGreater(scheduler.get_throughput(), 0)
+
+
+class FileRequestHandler(BaseHTTPRequestHandler):
+    """Serves the 'data' of its server, with ranges; if 'gzip' is set, whole files are
+    sent compressed to clients accepting it. If 'cut_at' is set, the first response
+    without a range stops there. POST requests get an empty JSON object back. If 'cookie'
+    is set, every response sets it."""
+
+    def send_response(self, code, message=None):
+        super().send_response(code, message)
+        if self.server.cookie:
+            self.send_header("Set-Cookie", self.server.cookie)
+
+    def do_POST(self):  # noqa: N802
+        self.server.requests.append(self.headers)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def do_GET(self):  # noqa: N802
+        server = self.server
+        server.requests.append(self.headers)
+        data = server.data
+        range_header = self.headers.get("Range")
+        if range_header:
+            start, end = range_header.split("=")[1].split("-")
+            end = int(end) + 1 if end else len(data)
+            body = data[int(start) : end]
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %s-%s/%s" % (start, end - 1, len(data)))
+        elif server.gzip and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(data)
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        if server.cut_at and not range_header:
+            server.cut_at, cut_at = None, server.cut_at
+            self.wfile.write(body[:cut_at])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalServerTestCase(TestCase):
+    """Runs a FileRequestHandler server for each test"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        patcher = patch.dict(os.environ, {"no_proxy": "127.0.0.1", "NO_PROXY": "127.0.0.1"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FileRequestHandler)
+        self.server.data = bytes(range(256)) * 258  # 66048 bytes
+        self.server.requests = []
+        self.server.gzip = False
+        self.server.cut_at = None
+        self.server.cookie = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = "http://127.0.0.1:%s/game.bin" % self.server.server_port
+        self.dest = os.path.join(self.temp_dir.name, "game.bin")
+
+
+class TestDownloader(LocalServerTestCase):
+    def download(self, **kwargs):
+        downloader = Downloader(self.url, self.dest, **kwargs)
+        downloader.start()
+        self.assertTrue(downloader.join())
+        with open(self.dest, "rb") as dest_file:
+            self.assertEqual(dest_file.read(), self.server.data)
+        return downloader
+
+    def test_download(self):
+        downloader = self.download(hash_type="md5")
+        self.assertEqual(downloader.full_size, len(self.server.data))
+        self.assertEqual(downloader.checksum, hashlib.md5(self.server.data).hexdigest())
+        self.assertEqual(self.server.requests[0]["Accept-Encoding"], "identity")
+
+    def test_encoded_response(self):
+        # Servers should not compress files when asked not to, but some do anyway
+        self.server.gzip = True
+        with patch.object(Downloader, "get_headers", lambda downloader: {"Accept-Encoding": "gzip"}):
+            downloader = self.download()
+        self.assertEqual(downloader.downloaded_size, len(self.server.data))
+        self.assertEqual(downloader.state, Downloader.COMPLETED)
+
+    @patch("lutris.util.downloader.CHUNK_SIZE", 1000)
+    def test_resume_dropped_connection(self):
+        self.server.cut_at = 10000
+        downloader = self.download(hash_type="md5")
+        self.assertEqual(self.server.requests[1]["Range"], "bytes=10000-66047")
+        self.assertEqual(self.server.requests[1]["If-Range"], '"v1"')
+        self.assertEqual(downloader.checksum, hashlib.md5(self.server.data).hexdigest())
+
+    def test_resume_earlier_download(self):
+        with open(self.dest, "wb") as dest_file:
+            dest_file.write(self.server.data[:5000])
+        with open(self.dest + ".resume", "w", encoding="utf-8") as state_file:
+            json.dump({"validator": '"v1"', "full_size": 66048, "segments": [[0, 66048, 0]]}, state_file)
+        self.download(resume=True)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.server.requests[0]["Range"], "bytes=5000-66047")
+        self.assertFalse(os.path.exists(self.dest + ".resume"))
+
+    @patch("lutris.util.downloader.MIN_SEGMENT_SIZE", 1024)
+    def test_segmented_download(self):
+        downloader = self.download(connections=4)
+        ranges = sorted(request["Range"] for request in self.server.requests if "Range" in request)
+        self.assertEqual(ranges, ["bytes=0-16511", "bytes=16512-33023", "bytes=33024-49535", "bytes=49536-66047"])
+        self.assertEqual(downloader.segments[-1], [49536, 66048, 66048])
+        self.assertIsNone(downloader.checksum)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.reason = "Reason"
+        self.headers = headers or {}
+        self.history = []
+
+    def iter_content(self, chunk_size):
+        yield b"{}"
+
+    def close(self):
+        pass
+
+
+class TestHTTP(TestCase):
+    def test_fetch_known_pages(self):
+        self.assertEqual(http.fetch_pages(lambda page: page * 10, first_page=2, last_page=5), [20, 30, 40, 50])
+        self.assertEqual(http.fetch_pages(lambda page: page, first_page=2, last_page=1), [])
+
+    def test_fetch_pages_until_last(self):
+        fetched = []
+
+        def fetch_page(page):
+            fetched.append(page)
+            return {"page": page, "items": [0] * (2 if page < 6 else 1)}
+
+        pages = http.fetch_pages(fetch_page, is_last_page=lambda result: len(result["items"]) < 2, max_workers=4)
+        self.assertEqual([result["page"] for result in pages], [1, 2, 3, 4, 5, 6])
+        self.assertLessEqual(max(fetched), 8)  # Only the window holding the last page goes past it
+        pages = http.fetch_pages(fetch_page, last_page=3, is_last_page=lambda result: False)
+        self.assertEqual([result["page"] for result in pages], [1, 2, 3])
+
+    def test_fetch_pages_error(self):
+        def fetch_page(page):
+            if page == 2:
+                raise http.HTTPError("Failed", code=404)
+            return page
+
+        with self.assertRaises(http.HTTPError):
+            http.fetch_pages(fetch_page, last_page=3)
+
+    @patch("lutris.util.http.time.sleep")
+    def test_retries(self, sleep):
+        responses = [FakeResponse(429, {"Retry-After": "2"}), FakeResponse(503), FakeResponse(200)]
+        with patch("lutris.util.http.get_session") as get_session:
+            get_session.return_value.request.side_effect = responses
+            request = http.Request("https://example.com/api", retries=2).get()
+        self.assertEqual(request.json, {})
+        self.assertEqual(sleep.call_args_list[0].args, (2,))
+        self.assertGreaterEqual(sleep.call_args_list[1].args[0], http.RETRY_BACKOFF * 2)
+
+        with patch("lutris.util.http.get_session") as get_session:
+            get_session.return_value.request.side_effect = [FakeResponse(500), FakeResponse(404)]
+            with self.assertRaises(http.HTTPError) as error:
+                http.Request("https://example.com/api", retries=2).get()
+        self.assertEqual(error.exception.code, 404)
+        with patch("lutris.util.http.get_session") as get_session:
+            get_session.return_value.request.side_effect = [FakeResponse(500)]
+            with self.assertRaises(http.HTTPError):
+                http.Request("https://example.com/api").get()
+
+
+class TestRequest(LocalServerTestCase):
+    def test_write_to_file(self):
+        with open(self.dest, "wb") as dest_file:
+            dest_file.write(b"old")
+        request = http.Request(self.url).get(stream=True)
+        request.buffer_size = 1000
+        with patch("lutris.util.http.os.replace", wraps=os.replace) as replace:
+            request.write_to_file(self.dest)
+        self.assertEqual(replace.call_args.args[1], self.dest)
+        with open(self.dest, "rb") as dest_file:
+            self.assertEqual(dest_file.read(), self.server.data)
+        self.assertEqual(os.listdir(self.temp_dir.name), ["game.bin"])
+
+    def test_write_to_file_error(self):
+        with open(self.dest, "wb") as dest_file:
+            dest_file.write(b"old")
+        self.server.cut_at = 10000
+        written = []
+        request = http.Request(self.url).get(stream=True)
+        request.buffer_size = 1000
+        with self.assertRaises(http.HTTPError):
+            request.write_to_file(self.dest, chunk_callback=written.append)
+        self.assertTrue(written)
+        with open(self.dest, "rb") as dest_file:
+            self.assertEqual(dest_file.read(), b"old")
+        self.assertEqual(os.listdir(self.temp_dir.name), ["game.bin"])
+
+    def test_stop_request(self):
+        stop_request = threading.Event()
+        request = http.Request(self.url, stop_request=stop_request).get(stream=True)
+        request.buffer_size = 1000
+        chunks = []
+        for chunk in request.iter_content():
+            chunks.append(chunk)
+            stop_request.set()
+        self.assertEqual(len(chunks), 1)
+        self.assertIsNone(request.response)
+
+    def test_cookies(self):
+        self.server.cookie = "session=1234; Path=/"
+        cookie_jar = CookieJar()
+        http.Request(self.url, cookies=cookie_jar).get()
+        self.assertEqual([cookie.value for cookie in cookie_jar], ["1234"])
+        # The shared session must not keep it for the requests of others
+        self.assertEqual(list(http.get_session().cookies), [])
+        http.Request(self.url).get()
+        self.assertNotIn("Cookie", self.server.requests[-1])
+        http.Request(self.url, cookies=cookie_jar).get()
+        self.assertEqual(self.server.requests[-1]["Cookie"], "session=1234")
+
+    def test_post_content_type(self):
+        http.Request(self.url).post(data=b"name=value")
+        self.assertEqual(self.server.requests[-1]["Content-Type"], "application/x-www-form-urlencoded")
+        http.Request(self.url, headers={"content-type": "application/json"}).post(data=b"{}")
+        self.assertEqual(self.server.requests[-1]["Content-Type"], "application/json")
+        http.Request(self.url).post()
+        self.assertNotIn("Content-Type", self.server.requests[-1])
+
+
+class TestResponseCache(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(self.temp_dir.name, max_size=10000)
+        self.responses = []
+        patcher = patch("lutris.util.http.get_session")
+        get_session = patcher.start()
+        self.addCleanup(patcher.stop)
+        get_session.return_value.request.side_effect = self.send
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def send(self, method, url, headers=None, **kwargs):
+        self.responses.append(dict(headers))
+        if headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(304)
+        return FakeResponse(200, {"ETag": '"v1"'})
+
+    def get(self, url, scope="account", ttl=60):
+        return self.cache.get(http.Request(url), scope, ttl)
+
+    def test_cached_responses(self):
+        self.assertEqual(self.get("https://example.com/api"), b"{}")
+        self.assertEqual(self.get("https://example.com/api"), b"{}")
+        self.assertEqual(len(self.responses), 1)
+        self.get("https://example.com/api", scope="other account")
+        self.get("https://example.com/api", ttl=0)
+        self.assertEqual(len(self.responses), 3)
+
+    def test_conditional_requests(self):
+        self.get("https://example.com/api")
+        self.cache.expire("account")
+        self.assertEqual(self.get("https://example.com/api"), b"{}")
+        self.assertEqual(self.responses[-1]["If-None-Match"], '"v1"')
+        self.get("https://example.com/api")
+        self.assertEqual(len(self.responses), 2)  # Revalidated by the 304 response
+        self.cache.clear("account")
+        self.get("https://example.com/api")
+        self.assertNotIn("If-None-Match", self.responses[-1])
+
+    def test_validation(self):
+        def validate(content):
+            raise ValueError("Invalid response")
+
+        with self.assertRaises(ValueError):
+            self.cache.get(http.Request("https://example.com/api"), "account", 60, validate=validate)
+        self.assertIsNone(self.cache.read("account", "https://example.com/api"))
+
+    def test_eviction(self):
+        for index in range(200):
+            self.get("https://example.com/api/%s" % index)
+        total_size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _dirs, names in os.walk(self.temp_dir.name)
+            for name in names
+        )
+        self.assertLessEqual(total_size, 10000 + 10000 // 8)
+        self.assertIsNotNone(self.cache.read("account", "https://example.com/api/199"))
+
+
+class TestExtract(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.temp_dir.name, "dest")
+        os.makedirs(os.path.join(self.dest, "data"))
+        with open(os.path.join(self.dest, "data", "save.dat"), "w", encoding="utf-8") as save_file:
+            save_file.write("save")
+        with open(os.path.join(self.dest, "game.exe"), "w", encoding="utf-8") as old_file:
+            old_file.write("old")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_tar(self, name, mode, files):
+        path = os.path.join(self.temp_dir.name, name)
+        with tarfile.open(path, mode) as tar:
+            for member_name, content in files.items():
+                member = tarfile.TarInfo(member_name)
+                member.size = len(content)
+                member.mode = 0o755
+                tar.addfile(member, io.BytesIO(content))
+        return path
+
+    def make_zip(self, files):
+        path = os.path.join(self.temp_dir.name, "game.zip")
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for member_name, content in files.items():
+                member = zipfile.ZipInfo(member_name)
+                member.create_system = 3
+                member.external_attr = (stat.S_IFREG | 0o755) << 16
+                zip_file.writestr(member, content)
+        return path
+
+    def read(self, *parts):
+        with open(os.path.join(self.dest, *parts), "rb") as extracted_file:
+            return extracted_file.read()
+
+    def check_merged(self):
+        self.assertEqual(self.read("game.exe"), b"new")
+        self.assertEqual(self.read("data", "level1.dat"), b"level")
+        self.assertEqual(self.read("data", "save.dat"), b"save")
+        self.assertEqual(sorted(os.listdir(self.dest)), ["data", "game.exe"])
+
+    def test_extract_tar_merging_single_folder(self):
+        files = {"game/game.exe": b"new", "game/data/level1.dat": b"level"}
+        for name, mode in (("game.tar", "w"), ("game.tar.gz", "w:gz")):
+            self.assertEqual(extract_archive_with_size(self.make_tar(name, mode, files), self.dest), 8)
+            self.check_merged()
+            self.assertTrue(os.access(os.path.join(self.dest, "game.exe"), os.X_OK))
+
+    def test_extract_zip_in_parallel(self):
+        files = {"game/game.exe": b"new", "game/data/level1.dat": b"level"}
+        files.update({"game/data/file%s.dat" % index: b"%d" % index for index in range(100)})
+        progress = []
+        extract_archive(self.make_zip(files), self.dest, progress_callback=progress.append)
+        self.assertEqual(self.read("game.exe"), b"new")
+        self.assertEqual(self.read("data", "file42.dat"), b"42")
+        self.assertEqual(self.read("data", "save.dat"), b"save")
+        self.assertTrue(os.access(os.path.join(self.dest, "game.exe"), os.X_OK))
+        self.assertEqual(progress[-1], 1.0)
+
+    def test_extract_without_merging(self):
+        extract_archive(self.make_zip({"game.exe": b"new", "data/level1.dat": b"level"}), self.dest, merge_single=False)
+        self.check_merged()
+
+    def test_extract_zip_with_windows_separators(self):
+        extract_archive(self.make_zip({"game\\game.exe": b"new", "game\\data\\level1.dat": b"level"}), self.dest)
+        self.check_merged()
+
+    def test_extract_file_replacing_folder(self):
+        extract_archive(self.make_zip({"data": b"data"}), self.dest, merge_single=False)
+        self.assertEqual(self.read("data"), b"data")
+        self.assertEqual(sorted(os.listdir(self.dest)), ["data", "game.exe"])
+
+    def test_extract_rejects_members_outside_destination(self):
+        with self.assertRaises(ExtractError):
+            extract_archive(self.make_tar("evil.tar", "w", {"../evil.txt": b"evil"}), self.dest)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, "evil.txt")))
+
+    def test_move_folder_contents(self):
+        source = os.path.join(self.temp_dir.name, "source")
+        os.makedirs(os.path.join(source, "data"))
+        for name, content in (("game.exe", "new"), ("data/level1.dat", "level")):
+            with open(os.path.join(source, name), "w", encoding="utf-8") as source_file:
+                source_file.write(content)
+        system.move_folder_contents(source, self.dest)
+        self.check_merged()
+        self.assertFalse(os.path.exists(os.path.join(source, "game.exe")))
+
+
+class TestDiskSize(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.game_dir = os.path.join(self.temp_dir.name, "game")
+        self.calculator = DiskSizeCalculator(cache_dir=os.path.join(self.temp_dir.name, "cache"), max_workers=2)
+        self.write_file("game.exe", 100000)
+        self.write_file("data/level1.dat", 50000)
+        os.link(os.path.join(self.game_dir, "game.exe"), os.path.join(self.game_dir, "data", "game-link.exe"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_file(self, name, size):
+        path = os.path.join(self.game_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as game_file:
+            game_file.write(os.urandom(size))
+
+    def get_du_size(self):
+        seen = set()
+        size = 0
+        for base, _folders, files in os.walk(self.game_dir):
+            for path in [base] + [os.path.join(base, name) for name in files]:
+                path_stat = os.stat(path)
+                if (path_stat.st_dev, path_stat.st_ino) not in seen:
+                    seen.add((path_stat.st_dev, path_stat.st_ino))
+                    size += path_stat.st_blocks * 512
+        return size
+
+    def test_get_size_counts_hard_links_once(self):
+        self.assertEqual(self.calculator.get_size(self.game_dir), self.get_du_size())
+        self.assertEqual(self.calculator.get_size(os.path.join(self.temp_dir.name, "missing")), 0)
+
+    def test_get_size_rescans_changed_folders(self):
+        size = self.calculator.get_size(self.game_dir)
+        with patch("lutris.util.disk_size.RACY_SECONDS", 0):
+            self.assertEqual(self.calculator.get_size(self.game_dir), size)
+            with patch.object(DiskSizeCalculator, "scan_folder") as scan_folder:
+                self.assertEqual(self.calculator.get_size(self.game_dir), size)
+            scan_folder.assert_not_called()
+            self.write_file("data/level2.dat", 200000)
+            # Coarse time stamps could leave the folder's time unchanged
+            data_dir = os.path.join(self.game_dir, "data")
+            os.utime(data_dir, (1, 1))
+            self.assertEqual(self.calculator.get_size(self.game_dir), self.get_du_size())
@@ -0,0 +1,64 @@
+"""Measure database queries per second with pooled connections, compared to
+opening a new connection for every query (the behavior before connection pooling).
+
+Usage: python3 utils/benchmark_db.py [number of games] [number of queries]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from lutris.database import sql
+
+
+def create_database(db_path, game_count):
+    with sql.db_cursor(db_path) as cursor:
+        cursor.execute(
+            "CREATE TABLE games (id INTEGER PRIMARY KEY, name TEXT, slug TEXT, runner TEXT, installed INTEGER)"
+        )
+        cursor.executemany(
+            "INSERT INTO games (name, slug, runner, installed) VALUES (?, ?, ?, ?)",
+            [("Game %s" % i, "game-%s" % i, "wine", i % 2) for i in range(game_count)],
+        )
+
+
+def unpooled_select(db_path, slug):
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+    cursor.execute("SELECT * FROM games WHERE slug=?", (slug,))
+    rows = cursor.fetchall()
+    connection.commit()
+    connection.close()
+    return rows
+
+
+def pooled_select(db_path, slug):
+    return sql.db_select(db_path, "games", condition=("slug", slug))
+
+
+def benchmark(name, func, db_path, game_count, query_count):
+    start = time.perf_counter()
+    for i in range(query_count):
+        func(db_path, "game-%s" % (i % game_count))
+    elapsed = time.perf_counter() - start
+    print("%-30s %10.0f queries/s" % (name, query_count / elapsed))
+
+
+def main():
+    game_count = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "pga.db")
+        create_database(db_path, game_count)
+        print("%s games, %s queries" % (game_count, query_count))
+        benchmark("connection per query (before)", unpooled_select, db_path, game_count, query_count)
+        benchmark("pooled connection (after)", pooled_select, db_path, game_count, query_count)
+        sql.close_connections()
+
+
+if __name__ == "__main__":
+    main()